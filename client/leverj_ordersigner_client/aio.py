@@ -0,0 +1,367 @@
+# coding=utf-8
+"""
+Client for applications that use asyncio (or uvloop) instead of Twisted.
+
+Requires Python 3.7 or later.
+"""
+import asyncio
+import typing
+from collections import OrderedDict, deque
+from itertools import count
+
+from ujson import dumps, loads
+
+from leverj_ordersigner_client.common import DEFAULT_INTERFACE, DELIMITER, \
+    NonSuccessResponse, ProtocolConstants, _parse_interface, \
+    _parse_response, _with_options
+
+__all__ = [
+    'AsyncioOrderSignerClient',
+    'create_client',
+]
+
+# Batch responses can be much longer than ``StreamReader``'s default limit.
+READ_LIMIT = 1024 * 1024
+
+
+async def create_client(
+        interface: str = DEFAULT_INTERFACE,
+        max_in_flight: typing.Optional[int] = None,
+) -> 'AsyncioOrderSignerClient':
+    """
+    Creates a new client instance and establishes a connection to the daemon.
+
+    :param interface: Interface to connect to.  This should match the interface
+    that you specified when starting the daemon.  Only ``unix:`` and ``tcp:``
+    interfaces are supported, e.g.:
+
+    - ``unix:/tmp/leverj-ordersigner-daemon.sock``
+    - ``tcp:host=127.0.0.1:port=12345`` (or ``tcp:127.0.0.1:12345``)
+
+    :param max_in_flight: Max number of requests that the client will send
+    before it has to wait for responses.  If ``None``, there is no limit.
+    """
+    scheme, args = _parse_interface(interface)
+
+    if scheme == 'unix':
+        reader, writer = await asyncio.open_unix_connection(
+            args.get('path') or args[0],
+            limit=READ_LIMIT,
+        )
+    elif scheme == 'tcp':
+        reader, writer = await asyncio.open_connection(
+            args.get('host') or args[0],
+            int(args.get('port') or args[1]),
+            limit=READ_LIMIT,
+        )
+    else:
+        raise ValueError(
+            'Unsupported interface {interface!r} '
+            '(must start with "unix:" or "tcp:").'.format(interface=interface),
+        )
+
+    return AsyncioOrderSignerClient(reader, writer, max_in_flight)
+
+
+class AsyncioOrderSignerClient(ProtocolConstants):
+    """
+    Interface for requesting transaction signatures from the OrderSigner
+    daemon, using asyncio streams.
+
+    Requests are pipelined: each ``sign_*`` method sends its request right
+    away and returns a future, so you can send many requests before waiting
+    for any of the responses, e.g.::
+
+        signatures = await asyncio.gather(*(
+            client.sign_spot(order, 'LEVETH', signer)
+            for order in orders
+        ))
+
+    Use :py:func:`create_client` to create instances of this class.
+    """
+    delimiter = DELIMITER
+
+    def __init__(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter,
+            max_in_flight: typing.Optional[int] = None,
+    ) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.max_in_flight = max_in_flight
+
+        # Futures for requests that are still waiting for a response, keyed
+        # by request ID.
+        self._pending: typing.MutableMapping[int, asyncio.Future] = \
+            OrderedDict()
+        self._ids = count()
+
+        # Requests that haven't been sent yet, as ``(payload, future)``.
+        self._backlog: typing.Deque[typing.Tuple[dict, asyncio.Future]] = \
+            deque()
+
+        self._read_task = asyncio.ensure_future(self._read_responses())
+
+    @property
+    def outstanding(self) -> int:
+        """
+        Number of requests that are waiting to be sent or waiting for a
+        response.
+        """
+        return len(self._pending) + len(self._backlog)
+
+    async def close(self) -> None:
+        """
+        Closes the connection to the daemon.
+
+        Any requests that are still waiting for a response will fail with
+        :py:class:`ConnectionError`.
+        """
+        self.writer.close()
+        await self._read_task
+
+    def register_instrument(self, instrument: dict) -> asyncio.Future:
+        """
+        Registers an instrument with the daemon.
+
+        See :py:meth:`OrderSignerClient.register_instrument`.
+
+        :return: A future that will resolve with ``None`` once the daemon has
+        registered the instrument.
+        """
+        return self._send({
+            'type': self.TYPE_INSTRUMENT,
+            'instrument': instrument,
+        })
+
+    def sign_futures(
+            self,
+            order: dict,
+            instrument: typing.Union[dict, str],
+            signer: str,
+            priority: typing.Optional[int] = None,
+            ttl_ms: typing.Optional[int] = None,
+    ) -> asyncio.Future:
+        """
+        Sends a request to sign a futures order.
+
+        See :py:meth:`OrderSignerClient.sign_futures`.
+
+        :return: A future that will resolve with the signature.
+        """
+        return self._send(_with_options(
+            {
+                'type': self.TYPE_FUTURES,
+                'instrument': instrument,
+                'order': order,
+                'signer': signer,
+            },
+
+            priority=priority,
+            ttl_ms=ttl_ms,
+        ))
+
+    def sign_spot(
+            self,
+            order: dict,
+            instrument: typing.Union[dict, str],
+            signer: str,
+            priority: typing.Optional[int] = None,
+            ttl_ms: typing.Optional[int] = None,
+    ) -> asyncio.Future:
+        """
+        Sends a request to sign a spot order.
+
+        See :py:meth:`OrderSignerClient.sign_spot`.
+
+        :return: A future that will resolve with the signature.
+        """
+        return self._send(_with_options(
+            {
+                'type': self.TYPE_SPOT,
+                'instrument': instrument,
+                'order': order,
+                'signer': signer,
+            },
+
+            priority=priority,
+            ttl_ms=ttl_ms,
+        ))
+
+    def sign_many(
+            self,
+            orders: typing.List[dict],
+            priority: typing.Optional[int] = None,
+            ttl_ms: typing.Optional[int] = None,
+    ) -> asyncio.Future:
+        """
+        Sends a request to sign a batch of orders.
+
+        See :py:meth:`OrderSignerClient.sign_many`.
+
+        :return: A future that will resolve with a list of ``(success,
+        result)`` tuples.
+        """
+        return self._send(_with_options(
+            {
+                'type': self.TYPE_BATCH,
+                'orders': orders,
+            },
+
+            priority=priority,
+            ttl_ms=ttl_ms,
+        ))
+
+    async def _read_responses(self) -> None:
+        """
+        Reads responses from the daemon until the connection is closed.
+        """
+        try:
+            while True:
+                try:
+                    line = await self.reader.readuntil(self.delimiter)
+                except asyncio.IncompleteReadError:
+                    break
+
+                self._response_received(line[:-len(self.delimiter)])
+        except (ConnectionError, asyncio.LimitOverrunError) as e:
+            self._fail_all(e)
+        except Exception as e:
+            # Don't leave requests waiting for responses that will never be
+            # read.
+            self.writer.close()
+            self._fail_all(e)
+        else:
+            self._fail_all(ConnectionError('Connection to daemon closed.'))
+
+    def _response_received(self, line: bytes) -> None:
+        """
+        Resolves the future for the request that a response belongs to.
+        """
+        try:
+            decoded = loads(line.decode('utf-8'))
+        except ValueError:
+            decoded = None
+
+        future = self._pop_pending(decoded)
+
+        if future is None:
+            return
+
+        try:
+            result = _parse_response(decoded, line)
+        except NonSuccessResponse as e:
+            self._resolve(future, exception=e)
+        except Exception as e:
+            # Only the request that the response belongs to is affected, so
+            # keep reading the other responses.
+            self._resolve(future, exception=e)
+        else:
+            self._resolve(future, result)
+
+        # Now that there is room in the window, send any requests that were
+        # held back.
+        self._send_backlog()
+
+    def _send(self, payload: dict) -> asyncio.Future:
+        """
+        Sends a request to the daemon, or holds it back until there is room.
+        """
+        future = asyncio.get_event_loop().create_future()
+
+        if self._read_task.done():
+            future.set_exception(ConnectionError('Connection to daemon closed.'))
+        elif self._backlog or not self._can_send():
+            self._backlog.append((payload, future))
+        else:
+            self._write(payload, future)
+
+        return future
+
+    def _can_send(self) -> bool:
+        """
+        Returns whether the client can send another request right now.
+        """
+        return (
+            self.max_in_flight is None
+            or len(self._pending) < self.max_in_flight
+        )
+
+    def _send_backlog(self) -> None:
+        """
+        Sends held-back requests, for as long as there is room.
+        """
+        while self._backlog and self._can_send():
+            payload, future = self._backlog.popleft()
+
+            # Don't send requests that were cancelled (e.g., by
+            # :py:func:`asyncio.wait_for`) while they were held back.
+            if not future.done():
+                self._write(payload, future)
+
+    def _write(self, payload: dict, future: asyncio.Future) -> None:
+        """
+        Writes a request to the stream.
+        """
+        request_id = next(self._ids)
+        payload['id'] = request_id
+        self._pending[request_id] = future
+
+        self.writer.write(dumps(payload).encode('utf-8') + self.delimiter)
+
+    def _pop_pending(
+            self,
+            decoded: typing.Any,
+    ) -> typing.Optional[asyncio.Future]:
+        """
+        Finds the future for the request that a response belongs to.
+        """
+        request_id = decoded.get('id') if isinstance(decoded, dict) else None
+
+        if request_id is None:
+            # If the response has no ID (e.g., the daemon could not parse the
+            # request), then it belongs to the oldest request.
+            if self._pending:
+                return self._pending.popitem(last=False)[1]
+
+            return None
+
+        # The client only sends integer IDs (anything else, e.g. a list,
+        # might not even be hashable).  Responses with unknown IDs are
+        # ignored, rather than handed to a request they don't belong to.
+        if type(request_id) is int:
+            return self._pending.pop(request_id, None)
+
+        return None
+
+    def _fail_all(self, error: Exception) -> None:
+        """
+        Fails every request that is still waiting, e.g. because the
+        connection was closed.
+        """
+        pending = list(self._pending.values())
+        pending.extend(future for _, future in self._backlog)
+
+        self._pending.clear()
+        self._backlog.clear()
+
+        for future in pending:
+            self._resolve(future, exception=error)
+
+    @staticmethod
+    def _resolve(
+            future: asyncio.Future,
+            result: typing.Any = None,
+            exception: typing.Optional[Exception] = None,
+    ) -> None:
+        """
+        Resolves a future, unless the caller has already cancelled it.
+        """
+        if future.done():
+            return
+
+        if exception is None:
+            future.set_result(result)
+        else:
+            future.set_exception(exception)
@@ -0,0 +1,47 @@
+# coding=utf-8
+"""
+Client for the daemon's binary protocol, which is cheaper to encode and
+decode than JSON.
+
+Each request and response is a msgpack-encoded map, prefixed with its length
+as a 32-bit big-endian unsigned int.  Signatures are returned as raw
+(65-byte) binary strings instead of hex.
+
+Requires the ``binary`` extra (``pip install leverj-ordersigner-client[binary]``).
+"""
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import msgpack
+from twisted.protocols import basic
+
+from leverj_ordersigner_client.client import BaseOrderSignerClient
+
+__all__ = [
+    'BinaryOrderSignerClient',
+]
+
+
+class BinaryOrderSignerClient(BaseOrderSignerClient, basic.Int32StringReceiver):
+    """
+    Sends requests to the daemon's binary interface.
+
+    Use :py:func:`leverj_ordersigner_client.async_create_client` to connect
+    to the daemon, passing ``client_type=BinaryOrderSignerClient``.
+    """
+
+    # Leave enough room for batch responses.
+    MAX_LENGTH = 1024 * 1024
+
+    def stringReceived(self, data):
+        # type: (bytes) -> None
+        try:
+            decoded = msgpack.unpackb(data, raw=False)
+        except (ValueError, TypeError, msgpack.UnpackException):
+            decoded = None
+
+        self._response_received(decoded, data)
+
+    def _send_payload(self, payload):
+        # type: (dict) -> None
+        self.sendString(msgpack.packb(payload, use_bin_type=True))
@@ -0,0 +1,446 @@
+# coding=utf-8
+"""
+Blocking client for threaded applications (e.g., Django views or Celery
+tasks) that don't run an event loop.
+"""
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import socket
+import threading
+from contextlib import contextmanager
+from itertools import count
+
+from ujson import dumps, loads
+
+from leverj_ordersigner_client.common import DEFAULT_INTERFACE, DELIMITER, \
+    ProtocolConstants, _parse_interface, _parse_response, _with_options
+
+try:
+    from time import monotonic
+except ImportError:
+    # Python 2
+    from time import time as monotonic
+
+__all__ = [
+    'BlockingClientPool',
+    'BlockingOrderSignerClient',
+]
+
+
+def connect(interface=DEFAULT_INTERFACE, timeout=None):
+    # type: (str, Optional[float]) -> socket.socket
+    """
+    Opens a socket to the daemon.
+
+    :param interface: Interface to connect to.  Only ``unix:`` and ``tcp:``
+    interfaces are supported (see
+    :py:func:`leverj_ordersigner_client.aio.create_client`).
+
+    :param timeout: Timeout (in seconds) for connecting and for each request.
+    """
+    scheme, args = _parse_interface(interface)
+
+    if scheme == 'unix':
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+
+        try:
+            sock.connect(args.get('path') or args[0])
+        except Exception:
+            sock.close()
+            raise
+
+        return sock
+
+    if scheme == 'tcp':
+        return socket.create_connection(
+            (args.get('host') or args[0], int(args.get('port') or args[1])),
+            timeout,
+        )
+
+    raise ValueError(
+        'Unsupported interface {interface!r} '
+        '(must start with "unix:" or "tcp:").'.format(interface=interface),
+    )
+
+
+class BlockingOrderSignerClient(ProtocolConstants):
+    """
+    Sends requests to the daemon over a plain socket, and waits for each
+    response before returning.
+
+    Instances are not thread-safe; use :py:class:`BlockingClientPool` to share
+    connections between threads.
+    """
+    delimiter = DELIMITER
+
+    def __init__(self, interface=DEFAULT_INTERFACE, timeout=None, sock=None):
+        # type: (str, Optional[float], Optional[socket.socket]) -> None
+        """
+        :param interface: Interface to connect to.
+
+        :param timeout: Timeout (in seconds) for connecting and for each
+        request.  If a request times out, the connection is closed (the
+        response might still arrive later, which would confuse the next
+        request).
+
+        :param sock: Allows injecting an already-connected socket (e.g., for
+        unit tests).
+        """
+        self.sock = sock or connect(interface, timeout)
+        self._file = self.sock.makefile('rb')
+        self._ids = count()
+
+    @property
+    def closed(self):
+        # type: () -> bool
+        return self._file is None
+
+    def close(self):
+        # type: () -> None
+        """
+        Closes the connection to the daemon.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self.sock.close()
+
+    def register_instrument(self, instrument):
+        # type: (dict) -> None
+        """
+        Registers an instrument with the daemon.
+
+        See :py:meth:`OrderSignerClient.register_instrument`.
+        """
+        self._request({
+            'type': self.TYPE_INSTRUMENT,
+            'instrument': instrument,
+        })
+
+    def sign_futures(
+            self,
+            order,
+            instrument,
+            signer,
+            priority=None,
+            ttl_ms=None,
+    ):
+        # type: (dict, Union[dict, str], str, Optional[int], Optional[int]) -> str
+        """
+        Requests a signature for a futures order.
+
+        See :py:meth:`OrderSignerClient.sign_futures`.
+
+        :raise ErrorResponse: if the daemon could not sign the order.
+        """
+        return self._request(_with_options(
+            {
+                'type': self.TYPE_FUTURES,
+                'instrument': instrument,
+                'order': order,
+                'signer': signer,
+            },
+
+            priority=priority,
+            ttl_ms=ttl_ms,
+        ))
+
+    def sign_spot(
+            self,
+            order,
+            instrument,
+            signer,
+            priority=None,
+            ttl_ms=None,
+    ):
+        # type: (dict, Union[dict, str], str, Optional[int], Optional[int]) -> str
+        """
+        Requests a signature for a spot order.
+
+        See :py:meth:`OrderSignerClient.sign_spot`.
+
+        :raise ErrorResponse: if the daemon could not sign the order.
+        """
+        return self._request(_with_options(
+            {
+                'type': self.TYPE_SPOT,
+                'instrument': instrument,
+                'order': order,
+                'signer': signer,
+            },
+
+            priority=priority,
+            ttl_ms=ttl_ms,
+        ))
+
+    def sign_many(self, orders, priority=None, ttl_ms=None):
+        # type: (list, Optional[int], Optional[int]) -> list
+        """
+        Requests signatures for a batch of orders.
+
+        See :py:meth:`OrderSignerClient.sign_many`.
+
+        :return: A list of ``(success, result)`` tuples.
+        """
+        return self._request(_with_options(
+            {
+                'type': self.TYPE_BATCH,
+                'orders': orders,
+            },
+
+            priority=priority,
+            ttl_ms=ttl_ms,
+        ))
+
+    def _request(self, payload):
+        # type: (dict) -> Any
+        """
+        Sends a request and waits for the response.
+        """
+        if self.closed:
+            raise socket.error('Connection to daemon is closed.')
+
+        payload['id'] = next(self._ids)
+
+        try:
+            self.sock.sendall(dumps(payload).encode('utf-8') + self.delimiter)
+            line = self._file.readline()
+        except Exception:
+            # We can't tell whether the daemon received the request, so the
+            # connection can't be used safely anymore.
+            self.close()
+            raise
+
+        if not line:
+            self.close()
+            raise socket.error('Connection to daemon closed.')
+
+        line = line.rstrip(self.delimiter)
+
+        try:
+            decoded = loads(line.decode('utf-8'))
+        except ValueError:
+            decoded = None
+
+        return _parse_response(decoded, line)
+
+
+class BlockingClientPool(object):
+    """
+    Thread-safe pool of :py:class:`BlockingOrderSignerClient` connections.
+
+    Each request borrows a connection from the pool (opening a new one if
+    necessary), so threads can reuse connections instead of reconnecting for
+    every request.
+    """
+
+    def __init__(
+            self,
+            interface=DEFAULT_INTERFACE,
+            max_size=10,
+            timeout=None,
+            client_factory=None,
+    ):
+        # type: (str, int, Optional[float], Optional[Callable]) -> None
+        """
+        :param interface: Interface to connect to.
+
+        :param max_size: Max number of connections to open.  If every
+        connection is in use, requests wait for one to become available.
+
+        :param timeout: Timeout (in seconds) for connecting and for each
+        request.
+
+        :param client_factory: Allows injecting a different way to create
+        clients (e.g., for unit tests).
+        """
+        self.interface = interface
+        self.max_size = max_size
+        self.timeout = timeout
+
+        self.client_factory = client_factory or (
+            lambda: BlockingOrderSignerClient(self.interface, self.timeout)
+        )
+
+        # Used as a stack, so that idle connections beyond what is needed
+        # stay idle.
+        self._idle = []  # type: List[BlockingOrderSignerClient]
+        self._size = 0
+        self._closed = False
+
+        # Guards the idle connections and the number of open connections, and
+        # wakes up requests that are waiting for a connection when either
+        # changes.
+        self._condition = threading.Condition()
+
+    def close(self):
+        # type: () -> None
+        """
+        Closes all idle connections, and stops the pool from lending out any
+        more.
+
+        Connections that are in use are closed when they are returned.
+        """
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+
+            # Requests that are waiting for a connection would never get one.
+            self._condition.notify_all()
+
+        for client in idle:
+            self._discard(client)
+
+    @contextmanager
+    def connection(self):
+        # type: () -> Generator[BlockingOrderSignerClient]
+        """
+        Borrows a connection from the pool, e.g.::
+
+            with pool.connection() as client:
+                client.register_instrument(instrument)
+                signature = client.sign_spot(order, 'LEVETH', signer)
+        """
+        client = self._acquire()
+
+        try:
+            yield client
+        finally:
+            self._release(client)
+
+    def register_instrument(self, instrument):
+        # type: (dict) -> None
+        """
+        Registers an instrument with the daemon.
+        """
+        with self.connection() as client:
+            client.register_instrument(instrument)
+
+    def sign_futures(
+            self,
+            order,
+            instrument,
+            signer,
+            priority=None,
+            ttl_ms=None,
+    ):
+        # type: (dict, Union[dict, str], str, Optional[int], Optional[int]) -> str
+        """
+        Requests a signature for a futures order.
+        """
+        with self.connection() as client:
+            return client.sign_futures(
+                order,
+                instrument,
+                signer,
+                priority,
+                ttl_ms,
+            )
+
+    def sign_spot(
+            self,
+            order,
+            instrument,
+            signer,
+            priority=None,
+            ttl_ms=None,
+    ):
+        # type: (dict, Union[dict, str], str, Optional[int], Optional[int]) -> str
+        """
+        Requests a signature for a spot order.
+        """
+        with self.connection() as client:
+            return client.sign_spot(
+                order,
+                instrument,
+                signer,
+                priority,
+                ttl_ms,
+            )
+
+    def sign_many(self, orders, priority=None, ttl_ms=None):
+        # type: (list, Optional[int], Optional[int]) -> list
+        """
+        Requests signatures for a batch of orders.
+        """
+        with self.connection() as client:
+            return client.sign_many(orders, priority, ttl_ms)
+
+    def _acquire(self):
+        # type: () -> BlockingOrderSignerClient
+        """
+        Returns an idle connection, opening a new one if there aren't any
+        (and the pool isn't full).
+        """
+        deadline = None if self.timeout is None else monotonic() + self.timeout
+
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise socket.error('Connection pool is closed.')
+
+                if self._idle:
+                    return self._idle.pop()
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+
+                # Wait until a connection is returned, or one is discarded
+                # (so that there's room to open a new one).
+                if deadline is None:
+                    self._condition.wait()
+                else:
+                    remaining = deadline - monotonic()
+
+                    if remaining <= 0:
+                        raise socket.timeout(
+                            'Timed out waiting for a connection from the '
+                            'pool.',
+                        )
+
+                    self._condition.wait(remaining)
+
+        # Connect without holding the lock, so that other requests don't have
+        # to wait for it.
+        try:
+            return self.client_factory()
+        except Exception:
+            self._remove()
+            raise
+
+    def _release(self, client):
+        # type: (BlockingOrderSignerClient) -> None
+        """
+        Returns a borrowed connection to the pool, unless it was closed (e.g.,
+        after an error), or the pool was.
+        """
+        with self._condition:
+            if not (client.closed or self._closed):
+                self._idle.append(client)
+                self._condition.notify()
+                return
+
+        self._discard(client)
+
+    def _discard(self, client):
+        # type: (BlockingOrderSignerClient) -> None
+        """
+        Closes a connection and removes it from the pool.
+        """
+        client.close()
+        self._remove()
+
+    def _remove(self):
+        # type: () -> None
+        """
+        Frees up the space in the pool for a connection that was closed (or
+        could not be opened).
+        """
+        with self._condition:
+            self._size -= 1
+
+            # A request that is waiting can open a new connection instead.
+            self._condition.notify()
@@ -0,0 +1,540 @@
+# coding=utf-8
+"""
+Clients for applications that use Twisted.
+"""
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from collections import OrderedDict, deque
+from itertools import count
+
+from twisted.internet import base, defer, endpoints, interfaces, protocol
+from twisted.protocols import basic
+from ujson import dumps, loads
+from zope.interface import implementer
+
+from leverj_ordersigner_client.common import DEFAULT_INTERFACE, \
+    NonSuccessResponse, ProtocolConstants, _parse_response, _with_options
+
+__all__ = [
+    'async_create_client',
+    'BaseOrderSignerClient',
+    'OrderSignerClient',
+]
+
+
+def async_create_client(
+        use_reactor=None,
+        interface=DEFAULT_INTERFACE,
+        max_in_flight=None,
+        client_type=None,
+        timeout=None,
+):
+    # type: (Optional[base.ReactorBase], str, Optional[int], Optional[type], Optional[float]) -> defer.Deferred
+    """
+    Asynchronously creates a new client instance and establishes a connection
+    to the daemon.
+
+    Note that this function returns a :py:cls:`defer.Deferred` instance, so
+    you'll need to attach a callback to send requests once the connection is
+    established.
+
+    .. important::
+        The client will not connect to the daemon until you start the reactor.
+
+    Refer to the project ``README`` for more information and examples.
+
+    :param use_reactor: The reactor (event loop) to use.  Unless you are trying
+    to accomplish something very specific, you can probably keep the default
+    value (the global reactor).
+
+    :param interface: Interface to connect to.  This should match the interface
+    that you specified when starting the daemon.  Use ``embedded:`` to sign
+    orders in this process instead of connecting to the daemon (see
+    :py:func:`leverj_ordersigner_client.embedded.create_embedded_client`), or
+    ``shm:`` to connect via shared memory (see
+    :py:func:`leverj_ordersigner_client.shm.async_create_shm_client`).
+
+    :param max_in_flight: Max number of requests that the client will send
+    before it has to wait for responses (see :py:cls:`OrderSignerClient`).
+
+    :param client_type: The client class to use (e.g.,
+    :py:cls:`leverj_ordersigner_client.binary.BinaryOrderSignerClient` to
+    connect to the daemon's binary interface).  Defaults to
+    :py:cls:`OrderSignerClient`.
+
+    :param timeout: Default number of seconds to wait for each response (see
+    :py:cls:`BaseOrderSignerClient`).
+
+    :return: A deferred that will resolve with the client instance.
+    """
+    if interface.startswith('embedded:'):
+        # Signs orders in this process instead (requires the ``embedded``
+        # extra); see :py:mod:`leverj_ordersigner_client.embedded`.
+        from leverj_ordersigner_client.embedded import create_embedded_client
+        return defer.succeed(
+            create_embedded_client(interface, max_in_flight, timeout),
+        )
+
+    if use_reactor is None:
+        # Importing the reactor installs it, so we only do that if it's
+        # actually needed (e.g., not if you only use the asyncio client).
+        from twisted.internet import reactor as use_reactor
+
+    if interface.startswith('shm:'):
+        # Requests and responses go through shared memory instead (see
+        # :py:mod:`leverj_ordersigner_client.shm`).
+        from leverj_ordersigner_client.shm import async_create_shm_client
+
+        return async_create_shm_client(
+            use_reactor,
+            interface,
+            max_in_flight,
+            client_type,
+            timeout,
+        )
+
+    client = endpoints.clientFromString(use_reactor, interface)
+
+    return endpoints.connectProtocol(
+        client,
+
+        (client_type or OrderSignerClient)(
+            max_in_flight=max_in_flight,
+            timeout=timeout,
+            clock=use_reactor,
+        ),
+    )
+
+
+# :kludge: Twisted's BaseProtocol class is an old-style class in Python 2, so
+# we need a new-style base class (``ProtocolConstants`` derives from
+# ``object``).
+# https://stackoverflow.com/a/18392639
+@implementer(interfaces.IPushProducer)
+class BaseOrderSignerClient(ProtocolConstants):
+    """
+    Interface for requesting transaction signatures from the OrderSigner
+    daemon, independently of how requests and responses are encoded.
+
+    Subclasses must mix in a Twisted protocol that splits incoming data into
+    responses (and call :py:meth:`_response_received` for each one), and
+    implement :py:meth:`_send_payload`.
+
+    To keep memory usage bounded under load, requests are held back locally
+    (in the order they were made) when either:
+
+    - ``max_in_flight`` requests have already been sent to the daemon and are
+      still waiting for responses, or
+    - the transport's write buffer is full (the client registers itself as a
+      producer with the transport, which pauses it).
+
+    So that callers never hang (and requests don't pile up) when the daemon
+    stalls, requests can be given a ``timeout``, after which they fail with
+    :py:class:`defer.TimeoutError`.  Requests can also be cancelled (via
+    :py:meth:`defer.Deferred.cancel`); requests that haven't been sent yet
+    are dropped, and the responses to requests that have are ignored.  If
+    the connection is lost, every request that is still waiting fails.
+    """
+
+    def __init__(self, max_in_flight=None, timeout=None, clock=None):
+        # type: (Optional[int], Optional[float], Optional[base.ReactorBase]) -> None
+        """
+        :param max_in_flight: Max number of requests that can be waiting for
+        a response from the daemon at any one time.  If ``None``, there is no
+        limit.
+
+        :param timeout: Default number of seconds to wait for each response
+        (including time spent waiting to be sent), for requests that don't
+        specify their own.  If ``None``, requests wait indefinitely.
+
+        :param clock: The reactor, for timing out requests (defaults to the
+        global reactor).
+        """
+        super(BaseOrderSignerClient, self).__init__()
+
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.clock = clock
+
+        # Deferreds for requests that are still waiting for a response, keyed
+        # by request ID.  Requests that were cancelled after they were sent
+        # keep their place (with ``None`` instead of a deferred) until the
+        # daemon responds, so that the window and the matching of responses
+        # without IDs stay correct.
+        self._pending = OrderedDict()  # type: OrderedDict
+        self._ids = count()
+
+        # Requests that haven't been sent yet, as ``(payload, deferred)``.
+        self._backlog = deque()  # type: deque
+        self._paused = False
+
+        # Set once the connection is lost, so that new requests fail
+        # immediately.
+        self._lost_reason = None  # type: Optional[failure.Failure]
+
+    def connectionMade(self):
+        # type: () -> None
+        self.transport.registerProducer(self, True)
+
+    def connectionLost(self, reason=protocol.connectionDone):
+        # type: (failure.Failure) -> None
+        # Twisted doesn't reset this flag, but pools need it to know which
+        # connections are still usable.
+        self.connected = 0
+
+        super(BaseOrderSignerClient, self).connectionLost(reason)
+
+        # No more responses will arrive on this connection.
+        self._fail_all(reason)
+
+    def pauseProducing(self):
+        # type: () -> None
+        """
+        Called by the transport when its write buffer is full.
+        """
+        self._paused = True
+
+    def resumeProducing(self):
+        # type: () -> None
+        """
+        Called by the transport when its write buffer has drained.
+        """
+        self._paused = False
+        self._send_backlog()
+
+    def stopProducing(self):
+        # type: () -> None
+        """
+        Called by the transport when the connection is closing.
+        """
+        self._paused = True
+
+    @property
+    def outstanding(self):
+        # type: () -> int
+        """
+        Number of requests that are waiting to be sent or waiting for a
+        response.
+        """
+        return len(self._pending) + len(self._backlog)
+
+    def register_instrument(self, instrument):
+        # type: (dict) -> defer.Deferred
+        """
+        Registers an instrument with the daemon.
+
+        Once an instrument has been registered, orders can refer to it by its
+        symbol (e.g., ``instrument='LEVETH'``) instead of sending the full
+        instrument with every request.
+
+        :return: A deferred that will resolve with ``None`` once the daemon
+        has registered the instrument.
+        """
+        return self._send({
+            'type': self.TYPE_INSTRUMENT,
+            'instrument': instrument,
+        })
+
+    def sign_futures(
+            self,
+            order,
+            instrument,
+            signer,
+            priority=None,
+            ttl_ms=None,
+            timeout=None,
+    ):
+        # type: (dict, Union[dict, str], str, Optional[int], Optional[int], Optional[float]) -> defer.Deferred
+        """
+        Sends a request to sign a futures order.
+
+        :param instrument: The instrument, or its symbol if it has been
+        registered via :py:meth:`register_instrument`.
+
+        :param priority: One of the ``PRIORITY_*`` constants.  If not set,
+        the daemon treats the request as ``PRIORITY_NORMAL``.
+
+        :param ttl_ms: If set, the daemon gives up on the request (and it
+        fails with :py:class:`DeadlineExceeded`) if it hasn't started signing
+        the order this many milliseconds after the request arrived.
+
+        :param timeout: Number of seconds to wait for the response, after
+        which the request fails with :py:class:`defer.TimeoutError`
+        (defaults to the client's ``timeout``).
+        """
+        return self._send(_with_options(
+            {
+                'type': self.TYPE_FUTURES,
+                'instrument': instrument,
+                'order': order,
+                'signer': signer,
+            },
+
+            priority=priority,
+            ttl_ms=ttl_ms,
+        ), timeout)
+
+    def sign_spot(
+            self,
+            order,
+            instrument,
+            signer,
+            priority=None,
+            ttl_ms=None,
+            timeout=None,
+    ):
+        # type: (dict, Union[dict, str], str, Optional[int], Optional[int], Optional[float]) -> defer.Deferred
+        """
+        Sends a request to sign a spot order.
+
+        :param instrument: The instrument, or its symbol if it has been
+        registered via :py:meth:`register_instrument`.
+
+        :param priority: One of the ``PRIORITY_*`` constants.  If not set,
+        the daemon treats the request as ``PRIORITY_NORMAL``.
+
+        :param ttl_ms: If set, the daemon gives up on the request (and it
+        fails with :py:class:`DeadlineExceeded`) if it hasn't started signing
+        the order this many milliseconds after the request arrived.
+
+        :param timeout: Number of seconds to wait for the response, after
+        which the request fails with :py:class:`defer.TimeoutError`
+        (defaults to the client's ``timeout``).
+        """
+        return self._send(_with_options(
+            {
+                'type': self.TYPE_SPOT,
+                'instrument': instrument,
+                'order': order,
+                'signer': signer,
+            },
+
+            priority=priority,
+            ttl_ms=ttl_ms,
+        ), timeout)
+
+    def sign_many(self, orders, priority=None, ttl_ms=None, timeout=None):
+        # type: (list, Optional[int], Optional[int], Optional[float]) -> defer.Deferred
+        """
+        Sends a request to sign a batch of orders.
+
+        :param orders: List of dicts, each with the keys ``type`` (``futures``
+        or ``spot``), ``order``, ``instrument`` and ``signer``.
+
+        :param priority: Priority of the whole batch (see
+        :py:meth:`sign_spot`).
+
+        :param ttl_ms: Time limit for the whole batch (see
+        :py:meth:`sign_spot`).
+
+        :param timeout: Number of seconds to wait for the response (see
+        :py:meth:`sign_spot`).
+
+        :return: A deferred that will resolve with a list of ``(success,
+        result)`` tuples (one for each order, in the same order), like
+        :py:class:`defer.DeferredList`.  ``result`` is either the signature,
+        or an :py:class:`ErrorResponse` if the order could not be signed.
+        """
+        return self._send(_with_options(
+            {
+                'type': self.TYPE_BATCH,
+                'orders': orders,
+            },
+
+            priority=priority,
+            ttl_ms=ttl_ms,
+        ), timeout)
+
+    def _response_received(self, decoded, raw):
+        # type: (Any, bytes) -> None
+        """
+        Called when the daemon sends a response back to the client.
+
+        :param decoded: The decoded response (or ``None`` if it could not be
+        decoded).
+
+        :param raw: The response as it was received, for error reporting.
+        """
+        d = self._pop_pending(decoded)
+
+        # If the request was cancelled, nobody is waiting for the response.
+        if d is not None:
+            try:
+                result = _parse_response(decoded, raw)
+            except NonSuccessResponse as e:
+                d.errback(e)
+            else:
+                d.callback(result)
+
+        # Now that there is room in the window, send any requests that were
+        # held back.
+        self._send_backlog()
+
+    def _send(self, payload, timeout=None):
+        # type: (dict, Optional[float]) -> defer.Deferred
+        """
+        Sends a request to the daemon, or holds it back until there is room.
+
+        :param timeout: Number of seconds to wait for the response (defaults
+        to :py:attr:`timeout`).
+        """
+        if self._lost_reason is not None:
+            return defer.fail(self._lost_reason)
+
+        d = defer.Deferred(lambda d_: self._cancel(payload, d_))
+
+        # If other requests are already waiting, this one has to wait its
+        # turn.
+        if self._backlog or not self._can_send():
+            self._backlog.append((payload, d))
+        else:
+            self._write(payload, d)
+
+        if timeout is None:
+            timeout = self.timeout
+
+        if timeout is not None and not d.called:
+            d.addTimeout(timeout, self._clock())
+
+        return d
+
+    def _cancel(self, payload, d):
+        # type: (dict, defer.Deferred) -> None
+        """
+        Forgets a request whose deferred was cancelled (e.g., because it timed
+        out).
+        """
+        request_id = payload.get('id')
+
+        if request_id is None:
+            # The request hasn't been sent yet, so it never will be.  Requests
+            # usually time out in the order they were made, so the search
+            # stops near the front of the backlog.
+            for i, (_, queued) in enumerate(self._backlog):
+                if queued is d:
+                    del self._backlog[i]
+                    break
+        elif request_id in self._pending:
+            # The daemon will still respond, so keep the request's place.
+            self._pending[request_id] = None
+
+    def _clock(self):
+        # type: () -> base.ReactorBase
+        """
+        Returns the reactor to use for timeouts.
+        """
+        if self.clock is None:
+            # Only import the reactor when it's needed, as importing it
+            # installs it.
+            from twisted.internet import reactor
+            self.clock = reactor
+
+        return self.clock
+
+    def _can_send(self):
+        # type: () -> bool
+        """
+        Returns whether the client can send another request right now.
+        """
+        return not self._paused and (
+            self.max_in_flight is None
+            or len(self._pending) < self.max_in_flight
+        )
+
+    def _send_backlog(self):
+        # type: () -> None
+        """
+        Sends held-back requests, for as long as there is room.
+        """
+        while self._backlog and self._can_send():
+            self._write(*self._backlog.popleft())
+
+    def _write(self, payload, d):
+        # type: (dict, defer.Deferred) -> None
+        """
+        Writes a request to the transport.
+        """
+        # The daemon echoes the ID back in the response, so that we can match
+        # each response to its request, even if they arrive out of order.
+        request_id = next(self._ids)
+        payload['id'] = request_id
+        self._pending[request_id] = d
+
+        self._send_payload(payload)
+
+    def _send_payload(self, payload):
+        # type: (dict) -> None
+        """
+        Encodes a request and writes it to the transport.
+        """
+        raise NotImplementedError(
+            'Not implemented in {cls}.'.format(cls=type(self).__name__),
+        )
+
+    def _pop_pending(self, decoded):
+        # type: (dict) -> Optional[defer.Deferred]
+        """
+        Finds the deferred for the request that a response belongs to.
+
+        Returns ``None`` if nobody is waiting for the response anymore (e.g.,
+        the request was cancelled), or if the response doesn't belong to any
+        request that is still waiting.
+        """
+        request_id = decoded.get('id') if isinstance(decoded, dict) else None
+
+        if request_id is None:
+            # If the response has no ID (e.g., the daemon could not parse the
+            # request), then it belongs to the oldest request; the daemon
+            # answers requests without IDs in the order they were received.
+            if self._pending:
+                return self._pending.popitem(last=False)[1]
+
+            return None
+
+        # The client only sends integer IDs (anything else, e.g. a list,
+        # might not even be hashable).  Responses with unknown IDs are
+        # ignored, rather than handed to a request they don't belong to.
+        if type(request_id) is int:
+            return self._pending.pop(request_id, None)
+
+        return None
+
+    def _fail_all(self, reason):
+        # type: (failure.Failure) -> None
+        """
+        Fails every request that is still waiting, and any that are made
+        later, e.g. because the connection was lost.
+        """
+        self._lost_reason = reason
+
+        waiting = [d for d in self._pending.values() if d is not None]
+        waiting.extend(d for _, d in self._backlog)
+
+        self._pending.clear()
+        self._backlog.clear()
+
+        for d in waiting:
+            d.errback(reason)
+
+
+class OrderSignerClient(BaseOrderSignerClient, basic.LineOnlyReceiver):
+    """
+    Sends requests to the daemon as newline-delimited JSON.
+    """
+
+    # Leave enough room for batch responses.
+    MAX_LENGTH = 1024 * 1024
+
+    def lineReceived(self, line):
+        # type: (bytes) -> None
+        try:
+            decoded = loads(line.decode('utf-8'))  # type: dict
+        except ValueError:
+            decoded = None
+
+        self._response_received(decoded, line)
+
+    def _send_payload(self, payload):
+        # type: (dict) -> None
+        self.sendLine(dumps(payload).encode('utf-8'))
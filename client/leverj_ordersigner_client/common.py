@@ -0,0 +1,203 @@
+# coding=utf-8
+"""
+Parts of the protocol that every client shares, regardless of which event
+loop (if any) it uses.
+
+This module must not import Twisted, so that the asyncio and blocking
+clients don't have to pay for importing it.
+"""
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+__all__ = [
+    'DEFAULT_INTERFACE',
+    'DELIMITER',
+    'DeadlineExceeded',
+    'ErrorResponse',
+    'NonSuccessResponse',
+    'Overloaded',
+    'ProtocolConstants',
+    'UnprocessableResponse',
+]
+
+DEFAULT_INTERFACE = 'unix:/tmp/leverj-ordersigner-daemon.sock'
+
+# Separates requests (and responses) in the JSON protocol.
+DELIMITER = b'\r\n'
+
+
+class ProtocolConstants(object):
+    """
+    Values that clients put in their requests.
+    """
+    TYPE_BATCH = 'batch'
+    TYPE_FUTURES = 'futures'
+    TYPE_INSTRUMENT = 'instrument'
+    TYPE_SPOT = 'spot'
+
+    # Requests with a lower priority value are signed first, when more
+    # requests are waiting than the daemon can sign at once.
+    PRIORITY_HIGH = 0
+    PRIORITY_NORMAL = 1
+    PRIORITY_LOW = 2
+
+
+class NonSuccessResponse(ValueError):
+    """
+    Base class that indicates that the client received a non-success response
+    from the daemon.
+    """
+
+
+class ErrorResponse(NonSuccessResponse):
+    """
+    Indicates that the client received an error response from the daemon.
+    """
+
+    # noinspection PyShadowingBuiltins
+    def __init__(self, type, message, context):
+        # type: (str, str, dict) -> None
+        super(ErrorResponse, self).__init__(
+            'Daemon sent {type}: {message}'.format(
+                type=type,
+                message=message,
+            )
+        )
+
+        self.type = type
+        self.message = message
+        self.context = context
+
+
+class DeadlineExceeded(ErrorResponse):
+    """
+    Indicates that the daemon dropped the request, because its ``ttl_ms``
+    passed before the daemon got around to signing it.
+    """
+
+
+class Overloaded(ErrorResponse):
+    """
+    Indicates that the daemon rejected the request, because too many requests
+    were already waiting to be signed.  Try again later (ideally after a
+    backoff).
+    """
+
+
+class UnprocessableResponse(NonSuccessResponse):
+    """
+    Indicates that the client received a response that does not conform to the
+    protocol (e.g., not valid JSON, has unexpected structure, etc.).
+
+    This can happen if, for example, the client accidentally connected to the
+    wrong unix socket (e.g., it got back a message from a very confused
+    Postgres server).
+    """
+
+    def __init__(self, line):
+        # type: (bytes) -> None
+        super(UnprocessableResponse, self).__init__(
+            'Daemon sent unprocessable response: {line!r}'.format(line=line)
+        )
+
+        self.line = line
+
+
+def _parse_response(decoded, raw):
+    # type: (Any, bytes) -> Any
+    """
+    Extracts the result from a decoded response.
+
+    :param decoded: The decoded response (or ``None`` if it could not be
+    decoded).
+
+    :param raw: The response as it was received, for error reporting.
+
+    :raise NonSuccessResponse: if the response indicates an error, or if it
+    does not conform to the protocol.
+    """
+    if not isinstance(decoded, dict):
+        raise UnprocessableResponse(raw)
+
+    if decoded.get('ok', False):
+        if 'results' in decoded:
+            try:
+                return [
+                    _unpack_result(result)
+                    for result in decoded['results']
+                ]
+            except (KeyError, TypeError, AttributeError):
+                raise UnprocessableResponse(raw)
+
+        return decoded.get('signature')
+
+    try:
+        error = _error_response(decoded['error'])
+    except (KeyError, TypeError, AttributeError):
+        error = UnprocessableResponse(raw)
+
+    raise error
+
+
+def _unpack_result(result):
+    # type: (dict) -> tuple
+    """
+    Converts the result for a single order in a batch response.
+
+    :raise KeyError, TypeError, AttributeError: if the result does not
+    conform to the protocol.
+    """
+    if result.get('ok', False):
+        return True, result['signature']
+
+    return False, _error_response(result['error'])
+
+
+def _error_response(error):
+    # type: (dict) -> ErrorResponse
+    """
+    Converts an error from the daemon into an exception, using a more specific
+    class for errors that callers are likely to handle (e.g., by retrying).
+    """
+    return _ERROR_TYPES.get(error.get('type'), ErrorResponse)(**error)
+
+
+_ERROR_TYPES = {
+    'DeadlineExceeded': DeadlineExceeded,
+    'Overloaded': Overloaded,
+}
+
+
+def _with_options(payload, **options):
+    # type: (dict, **Optional[int]) -> dict
+    """
+    Adds optional fields (e.g., ``priority``) to a request, skipping any that
+    weren't specified (so that the daemon applies its defaults).
+    """
+    for key, value in options.items():
+        if value is not None:
+            payload[key] = value
+
+    return payload
+
+
+def _parse_interface(interface):
+    # type: (str) -> Tuple[str, dict]
+    """
+    Splits an interface description (in the same format that Twisted's
+    ``clientFromString`` uses) into its scheme and arguments.
+
+    Positional arguments are stored by index, and keyword arguments by name.
+    """
+    scheme, _, rest = interface.partition(':')
+
+    args = {}
+    for i, arg in enumerate(rest.split(':')):
+        key, sep, value = arg.partition('=')
+
+        if sep:
+            args[key] = value
+        else:
+            args[i] = arg
+
+    return scheme, args
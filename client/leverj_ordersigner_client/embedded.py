@@ -0,0 +1,162 @@
+# coding=utf-8
+"""
+Embedded client, which signs orders inside the application's own process
+instead of sending them to the daemon.
+
+Requires Python 3.8 or later, and the ``embedded`` extra (which installs the
+daemon package, whose code is used to process requests).
+"""
+import typing
+
+from ordersigner_daemon.embedded import EmbeddedSigningProtocol
+from ordersigner_daemon.keystore import Keystore
+from ordersigner_daemon.protocol import SigningProtocolFactory
+from twisted.internet import error, protocol
+from twisted.python import failure
+
+from leverj_ordersigner_client.client import BaseOrderSignerClient
+from leverj_ordersigner_client.common import _parse_interface
+
+__all__ = [
+    'EmbeddedOrderSignerClient',
+    'create_embedded_client',
+]
+
+
+def create_embedded_client(
+        interface: str = 'embedded:',
+        max_in_flight: typing.Optional[int] = None,
+        timeout: typing.Optional[float] = None,
+) -> 'EmbeddedOrderSignerClient':
+    """
+    Creates an embedded client from an interface description, so that
+    applications can switch between the daemon and the embedded client by
+    changing their config.
+
+    :param interface: ``embedded:``, optionally followed by
+    ``key=value`` options, separated by colons, e.g.
+    ``embedded:workers=4:keystore=/etc/leverj/keys.json``:
+
+    - ``workers``: number of worker processes to sign orders in (default 0).
+    - ``threaded``: if ``1`` (and ``workers`` is 0), sign orders in a
+      background thread instead of on the reactor thread.
+    - ``keystore``: path to a keystore file (see the daemon's
+      ``--keystore`` option).
+    - ``result_cache_size`` and ``result_cache_ttl``: see the daemon's
+      ``--result-cache-size`` and ``--result-cache-ttl`` options.
+
+    :param max_in_flight: Max number of requests that can be waiting for a
+    result at any one time (see :py:class:`BaseOrderSignerClient`).
+
+    :param timeout: Default number of seconds to wait for each result (see
+    :py:class:`BaseOrderSignerClient`).
+    """
+    scheme, args = _parse_interface(interface)
+
+    if scheme != 'embedded':
+        raise ValueError(
+            'Unsupported interface {interface!r} '
+            '(must start with "embedded:").'.format(interface=interface),
+        )
+
+    keystore = args.get('keystore')
+
+    factory = SigningProtocolFactory(
+        workers=int(args.get('workers', 0)),
+        keystore=Keystore.load(keystore) if keystore else None,
+        result_cache_size=int(args.get('result_cache_size', 0)),
+        result_cache_ttl=float(args.get('result_cache_ttl', 60.0)),
+        threaded=args.get('threaded', '0') not in ('', '0'),
+    )
+
+    return EmbeddedOrderSignerClient(factory, max_in_flight, timeout)
+
+
+class EmbeddedOrderSignerClient(BaseOrderSignerClient):
+    """
+    Signs orders inside the application's process (on the reactor thread, in
+    a background thread, or in a pool of worker processes), without a socket
+    in between.
+
+    Has the same methods as :py:class:`OrderSignerClient`, and returns the
+    same results and errors, so that applications can switch to it without
+    changing any code.
+    """
+
+    def __init__(
+            self,
+            factory: SigningProtocolFactory,
+            max_in_flight: typing.Optional[int] = None,
+            timeout: typing.Optional[float] = None,
+    ) -> None:
+        """
+        :param factory: Holds the order signer, worker pool and registered
+        instruments.  Clients that share a factory share its workers and
+        instruments.
+
+        :param max_in_flight: Max number of requests that can be waiting for
+        a result at any one time.  If ``None``, there is no limit.
+
+        :param timeout: Default number of seconds to wait for each result.
+        If ``None``, requests wait indefinitely.
+        """
+        super().__init__(max_in_flight, timeout)
+
+        self.factory = factory
+        self.factory.doStart()
+
+        self.transport = EmbeddedTransport(self)
+
+        self._server: EmbeddedSigningProtocol = \
+            self.factory.share(EmbeddedSigningProtocol).buildProtocol(None)
+
+        # There's no point buffering responses when there's no socket to
+        # write them to.
+        self._server.flush_size = 0
+
+        self._server.makeConnection(self.transport)
+        self.connected = 1
+
+    def close(self) -> None:
+        """
+        Stops the client (and the worker pool, once every client that shares
+        the factory has been closed).
+        """
+        self.transport.loseConnection()
+
+    def _send_payload(self, payload: dict) -> None:
+        self._server.requestReceived(payload)
+
+
+class EmbeddedTransport(object):
+    """
+    Connects an :py:class:`EmbeddedOrderSignerClient` to its
+    :py:class:`EmbeddedSigningProtocol`, delivering results straight to the
+    client.
+    """
+
+    def __init__(self, client: EmbeddedOrderSignerClient) -> None:
+        self.client = client
+
+    def writeSequence(self, results: typing.Iterable[dict]) -> None:
+        for result in results:
+            self.client._response_received(result, result)
+
+    def loseConnection(self) -> None:
+        """
+        Disconnects the client from the signing protocol.
+        """
+        if not self.client.connected:
+            return
+
+        self.client.connected = 0
+
+        # noinspection PyProtectedMember
+        self.client._server.connectionLost(protocol.connectionDone)
+
+        # Results for orders that are still being signed would never be
+        # delivered.
+        # noinspection PyProtectedMember
+        self.client._fail_all(failure.Failure(error.ConnectionDone()))
+
+        self.client.factory.doStop()
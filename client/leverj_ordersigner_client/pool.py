@@ -0,0 +1,227 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from twisted.internet import base, defer, error
+
+from leverj_ordersigner_client.client import async_create_client
+from leverj_ordersigner_client.common import DEFAULT_INTERFACE
+
+__all__ = [
+    'async_create_client_pool',
+    'OrderSignerClientPool',
+]
+
+
+def async_create_client_pool(
+        use_reactor=None,
+        interfaces=(DEFAULT_INTERFACE,),
+        connections_per_interface=1,
+        max_in_flight=None,
+        client_type=None,
+        timeout=None,
+):
+    # type: (Optional[base.ReactorBase], Iterable[str], int, Optional[int], Optional[type], Optional[float]) -> defer.Deferred
+    """
+    Asynchronously creates a pool of clients, connected to one or more
+    daemons.
+
+    :param use_reactor: The reactor (event loop) to use (defaults to the global
+    reactor).
+
+    :param interfaces: Interfaces to connect to (e.g., the unix sockets of
+    several daemon processes, or TCP endpoints on different hosts).
+
+    :param connections_per_interface: Number of connections to open to each
+    interface.
+
+    :param max_in_flight: Max number of requests that each connection will
+    send before it has to wait for responses (see
+    :py:cls:`OrderSignerClient`).
+
+    :param client_type: The client class to use for each connection (see
+    :py:func:`async_create_client`).
+
+    :param timeout: Default number of seconds to wait for each response (see
+    :py:cls:`OrderSignerClient`).
+
+    :return: A deferred that will resolve with the
+    :py:cls:`OrderSignerClientPool` instance once every connection is
+    established.  If any connection fails, the others are closed.
+    """
+    d = defer.DeferredList(
+        [
+            async_create_client(
+                use_reactor,
+                interface,
+                max_in_flight,
+                client_type,
+                timeout,
+            )
+            for interface in interfaces
+            for _ in range(connections_per_interface)
+        ],
+
+        consumeErrors=True,
+    )
+
+    d.addCallback(_clients_connected)
+    return d
+
+
+def _clients_connected(results):
+    # type: (List[Tuple[bool, Any]]) -> OrderSignerClientPool
+    """
+    Creates the pool once every connection attempt has finished.
+    """
+    clients = [result for success, result in results if success]
+
+    for success, result in results:
+        if not success:
+            for client in clients:
+                client.transport.loseConnection()
+
+            # Returning the failure causes the deferred's errbacks to run.
+            return result
+
+    return OrderSignerClientPool(clients)
+
+
+class OrderSignerClientPool(object):
+    """
+    Spreads requests across multiple connections to one or more daemons.
+
+    Each request is sent to the connection that has the fewest outstanding
+    requests, so that slow or busy daemons receive less work.
+    """
+
+    def __init__(self, clients):
+        # type: (Iterable[BaseOrderSignerClient]) -> None
+        self.clients = list(clients)  # type: List[BaseOrderSignerClient]
+
+    @property
+    def outstanding(self):
+        # type: () -> int
+        """
+        Number of requests that are waiting to be sent or waiting for a
+        response, across all connections.
+        """
+        return sum(client.outstanding for client in self.clients)
+
+    def close(self):
+        # type: () -> None
+        """
+        Closes every connection in the pool.
+        """
+        for client in self.clients:
+            if client.connected:
+                client.transport.loseConnection()
+
+    def register_instrument(self, instrument):
+        # type: (dict) -> defer.Deferred
+        """
+        Registers an instrument with every daemon in the pool (each daemon has
+        its own registry).
+
+        :return: A deferred that will resolve with ``None`` once every daemon
+        has registered the instrument.
+        """
+        d = defer.gatherResults(
+            [
+                client.register_instrument(instrument)
+                for client in self._connected()
+            ],
+
+            consumeErrors=True,
+        )
+
+        d.addCallbacks(
+            lambda _: None,
+
+            # Unwrap the ``FirstError`` so that callers see the exception that
+            # actually occurred.
+            lambda failure_: failure_.value.subFailure,
+        )
+
+        return d
+
+    def sign_futures(
+            self,
+            order,
+            instrument,
+            signer,
+            priority=None,
+            ttl_ms=None,
+            timeout=None,
+    ):
+        # type: (dict, Union[dict, str], str, Optional[int], Optional[int], Optional[float]) -> defer.Deferred
+        """
+        Sends a request to sign a futures order.
+
+        See :py:meth:`OrderSignerClient.sign_futures`.
+        """
+        return self._call(
+            'sign_futures',
+            order,
+            instrument,
+            signer,
+            priority,
+            ttl_ms,
+            timeout,
+        )
+
+    def sign_spot(
+            self,
+            order,
+            instrument,
+            signer,
+            priority=None,
+            ttl_ms=None,
+            timeout=None,
+    ):
+        # type: (dict, Union[dict, str], str, Optional[int], Optional[int], Optional[float]) -> defer.Deferred
+        """
+        Sends a request to sign a spot order.
+
+        See :py:meth:`OrderSignerClient.sign_spot`.
+        """
+        return self._call(
+            'sign_spot',
+            order,
+            instrument,
+            signer,
+            priority,
+            ttl_ms,
+            timeout,
+        )
+
+    def sign_many(self, orders, priority=None, ttl_ms=None, timeout=None):
+        # type: (list, Optional[int], Optional[int], Optional[float]) -> defer.Deferred
+        """
+        Sends a request to sign a batch of orders.
+
+        See :py:meth:`OrderSignerClient.sign_many`.
+        """
+        return self._call('sign_many', orders, priority, ttl_ms, timeout)
+
+    def _call(self, method, *args):
+        # type: (str, *Any) -> defer.Deferred
+        """
+        Sends a request using the least busy connection.
+        """
+        clients = self._connected()
+
+        if not clients:
+            return defer.fail(
+                error.ConnectError('No connections in the pool are open.'),
+            )
+
+        client = min(clients, key=lambda c: c.outstanding)
+        return getattr(client, method)(*args)
+
+    def _connected(self):
+        # type: () -> List[BaseOrderSignerClient]
+        """
+        Returns the clients whose connections are still open.
+        """
+        return [client for client in self.clients if client.connected]
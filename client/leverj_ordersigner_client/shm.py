@@ -0,0 +1,463 @@
+# coding=utf-8
+"""
+Shared-memory transport, for applications that run on the same host as the
+daemon.
+
+Requests and responses are copied through a pair of ring buffers in shared
+memory, instead of being sent through a socket.  The daemon must be listening
+on a shared-memory interface (see the daemon's ``--shm-interface`` option).
+"""
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from collections import deque
+
+from twisted.internet import base, endpoints
+from twisted.protocols import policies
+from ujson import dumps
+
+from leverj_ordersigner_client.client import OrderSignerClient
+from leverj_ordersigner_client.common import _parse_interface
+
+__all__ = [
+    'CorruptRingBuffer',
+    'RingBuffer',
+    'ShmClientProtocol',
+    'async_create_shm_client',
+]
+
+DEFAULT_CAPACITY = 1024 * 1024
+
+# Shared memory files are created here (if it exists), so that they are never
+# written to disk.
+SHM_DIR = '/dev/shm'
+
+# Used as a memory barrier (see ``RingBuffer.sleep``).
+_barrier = threading.Lock()
+
+
+def async_create_shm_client(
+        use_reactor,
+        interface,
+        max_in_flight=None,
+        client_type=None,
+        timeout=None,
+):
+    # type: (base.ReactorBase, str, Optional[int], Optional[type], Optional[float]) -> defer.Deferred
+    """
+    Connects to the daemon using the shared-memory transport.
+
+    :param interface: ``shm:`` followed by the path of the daemon's
+    shared-memory socket, and optionally ``:capacity=<bytes>`` (the size of
+    each ring buffer; default 1 MiB), e.g.
+    ``shm:/tmp/leverj-ordersigner-daemon-shm.sock:capacity=4194304``.
+
+    :param max_in_flight: See :py:cls:`BaseOrderSignerClient`.
+
+    :param client_type: The client class to use.  Must use the JSON protocol
+    (defaults to :py:cls:`OrderSignerClient`).
+
+    :param timeout: See :py:cls:`BaseOrderSignerClient`.
+
+    :return: A deferred that will resolve with the client instance.
+    """
+    scheme, args = _parse_interface(interface)
+
+    if scheme != 'shm':
+        raise ValueError(
+            'Unsupported interface {interface!r} '
+            '(must start with "shm:").'.format(interface=interface),
+        )
+
+    client = (client_type or OrderSignerClient)(
+        max_in_flight=max_in_flight,
+        timeout=timeout,
+        clock=use_reactor,
+    )
+
+    wrapper = ShmClientProtocol(
+        client,
+        int(args.get('capacity', DEFAULT_CAPACITY)),
+        use_reactor,
+    )
+
+    d = endpoints.connectProtocol(
+        endpoints.UNIXClientEndpoint(
+            use_reactor,
+            args.get('path') or args[0],
+        ),
+
+        wrapper,
+    )
+
+    d.addCallback(lambda _: client)
+    return d
+
+
+class CorruptRingBuffer(ValueError):
+    """
+    Indicates that a ring buffer's counters are inconsistent.
+    """
+
+
+class RingBuffer(object):
+    """
+    Single-producer, single-consumer ring buffer of bytes, in shared memory.
+
+    The layout must match ``ordersigner_daemon.shm.RingBuffer``: a header
+    with two counters (total bytes written and read, each on its own cache
+    line), followed by the data.  Only the producer updates ``head`` and only
+    the consumer updates ``tail``, so no locks are needed.  The consumer also
+    sets a flag before it waits for more data, so that the producer only has
+    to wake it up when it is actually waiting.
+    """
+    HEADER_SIZE = 128
+
+    _HEAD = 0
+    _TAIL = 64
+    _SLEEPING = 72
+    _COUNTER = struct.Struct(str('<Q'))
+
+    def __init__(self, buffer, offset, capacity):
+        # type: (mmap.mmap, int, int) -> None
+        """
+        :param buffer: Shared memory that contains the ring.
+
+        :param offset: Position of the ring's header in ``buffer``.
+
+        :param capacity: Number of bytes of data that the ring can hold.
+        """
+        self.buffer = buffer
+        self.offset = offset
+        self.capacity = capacity
+
+        self._data = offset + self.HEADER_SIZE
+
+    @classmethod
+    def size(cls, capacity):
+        # type: (int) -> int
+        """
+        Returns the number of bytes of shared memory that a ring needs.
+        """
+        return cls.HEADER_SIZE + capacity
+
+    def write(self, data):
+        # type: (bytes) -> int
+        """
+        Copies as much of ``data`` into the ring as will fit.
+
+        :return: Number of bytes written.
+        """
+        head = self._load(self._HEAD)
+        size = min(
+            len(data),
+            self.capacity - self._used(head, self._load(self._TAIL)),
+        )
+
+        if size:
+            start = head % self.capacity
+            first = min(size, self.capacity - start)
+
+            self.buffer[self._data + start:self._data + start + first] = \
+                data[:first]
+
+            if first < size:
+                # Wrap around to the start of the ring.
+                self.buffer[self._data:self._data + size - first] = \
+                    data[first:size]
+
+            # Only publish the data once it has been copied in full.
+            self._store(self._HEAD, head + size)
+
+        return size
+
+    def read(self):
+        # type: () -> bytes
+        """
+        Removes and returns everything that is waiting to be read.
+        """
+        tail = self._load(self._TAIL)
+        size = self._used(self._load(self._HEAD), tail)
+
+        if not size:
+            return b''
+
+        start = tail % self.capacity
+        first = min(size, self.capacity - start)
+
+        data = self.buffer[self._data + start:self._data + start + first]
+
+        if first < size:
+            data += self.buffer[self._data:self._data + size - first]
+
+        self._store(self._TAIL, tail + size)
+        return data
+
+    def sleep(self):
+        # type: () -> bool
+        """
+        Called by the consumer once it has read everything, to ask the
+        producer to ring the doorbell when it writes more data.
+
+        :return: Whether the consumer can wait for the doorbell (if not, more
+        data arrived in the meantime).
+        """
+        self._store(self._SLEEPING, 1)
+
+        # Make sure that either we see the producer's new data, or the
+        # producer sees the flag.
+        with _barrier:
+            pass
+
+        return self._used(self._load(self._HEAD), self._load(self._TAIL)) == 0
+
+    def needs_doorbell(self):
+        # type: () -> bool
+        """
+        Called by the producer after writing data; returns whether the
+        consumer is waiting to be woken up (and clears the flag, so that the
+        doorbell is only rung once).
+        """
+        with _barrier:
+            pass
+
+        if not self._load(self._SLEEPING):
+            return False
+
+        self._store(self._SLEEPING, 0)
+        return True
+
+    def _used(self, head, tail):
+        # type: (int, int) -> int
+        """
+        Returns the number of bytes between ``tail`` and ``head``, after
+        checking that the ring could actually hold that many (the daemon
+        shares the memory, so it could have written anything).
+        """
+        size = head - tail
+
+        if not 0 <= size <= self.capacity:
+            raise CorruptRingBuffer(
+                'Ring buffer counters are out of range '
+                '(head={head}, tail={tail}).'.format(head=head, tail=tail),
+            )
+
+        return size
+
+    def _load(self, field):
+        # type: (int) -> int
+        return self._COUNTER.unpack_from(self.buffer, self.offset + field)[0]
+
+    def _store(self, field, value):
+        # type: (int, int) -> None
+        self._COUNTER.pack_into(self.buffer, self.offset + field, value)
+
+
+class ShmClientProtocol(policies.ProtocolWrapper):
+    """
+    Moves requests and responses for the wrapped client through shared
+    memory, instead of through the socket.
+
+    When the connection is made, the wrapper creates the shared memory and
+    sends its file descriptor to the daemon.  After that, the socket is only
+    used to wake up the other side, when it is waiting for new data in a ring
+    (one byte means "there is new data in the ring").
+    """
+    # Number of seconds to wait before trying again, if the daemon hasn't
+    # made room in the request ring yet.
+    retry_delay = 0.001
+
+    # Byte sent over the socket to wake up the other side.
+    DOORBELL = b'\x01'
+
+    def __init__(self, wrappedProtocol, capacity, clock):
+        # type: (BaseOrderSignerClient, int, base.ReactorBase) -> None
+        """
+        :param wrappedProtocol: The client to wrap.
+
+        :param capacity: Number of bytes that each ring can hold.
+
+        :param clock: The reactor, for retrying when the request ring is
+        full.
+        """
+        # The factory only keeps track of connected protocols; connections
+        # are made via :py:func:`endpoints.connectProtocol` instead.
+        policies.ProtocolWrapper.__init__(
+            self,
+            policies.WrappingFactory(None),
+            wrappedProtocol,
+        )
+
+        self.capacity = capacity
+        self.clock = clock
+
+        self.requests = None  # type: Optional[RingBuffer]
+        self.responses = None  # type: Optional[RingBuffer]
+
+        self._fd = None  # type: Optional[int]
+        self._memory = None  # type: Optional[mmap.mmap]
+
+        # Requests that don't fit in the ring yet.
+        self._backlog = deque()  # type: deque
+        self._retry_call = None  # type: Optional[base.DelayedCall]
+        self._producer = None  # type: Optional[interfaces.IPushProducer]
+        self._producer_paused = False
+
+    def makeConnection(self, transport):
+        # type: (interfaces.IUNIXTransport) -> None
+        self._create_memory()
+
+        # The daemon maps the shared memory via the descriptor, so that it
+        # never has to open files by name on behalf of clients.
+        transport.sendFileDescriptor(self._fd)
+        transport.write(
+            dumps({'capacity': self.capacity}).encode('utf-8') + b'\n',
+        )
+
+        policies.ProtocolWrapper.makeConnection(self, transport)
+
+    def dataReceived(self, data):
+        # type: (bytes) -> None
+        # Every byte is a wake-up call; read whatever is in the ring (which
+        # may include responses written after the doorbell rang).
+        try:
+            self._read_responses()
+        except CorruptRingBuffer:
+            self.transport.loseConnection()
+
+    def write(self, data):
+        # type: (bytes) -> None
+        self.writeSequence((data,))
+
+    def writeSequence(self, data):
+        # type: (Iterable[bytes]) -> None
+        self._backlog.extend(data)
+        self._send_backlog()
+
+    def registerProducer(self, producer, streaming):
+        # type: (interfaces.IPushProducer, bool) -> None
+        # The client is paused while the request ring is full, instead of
+        # while the socket's buffer is full.
+        self._producer = producer
+
+    def unregisterProducer(self):
+        # type: () -> None
+        self._producer = None
+
+    def connectionLost(self, reason):
+        # type: (failure.Failure) -> None
+        if self._retry_call and self._retry_call.active():
+            self._retry_call.cancel()
+
+        self._retry_call = None
+        self._producer = None
+
+        policies.ProtocolWrapper.connectionLost(self, reason)
+
+        self.requests = None
+        self.responses = None
+        self._backlog.clear()
+
+        if self._memory is not None:
+            self._memory.close()
+            self._memory = None
+
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _create_memory(self):
+        # type: () -> None
+        """
+        Creates the shared memory for the rings.
+        """
+        size = RingBuffer.size(self.capacity)
+
+        self._fd, path = tempfile.mkstemp(
+            prefix='leverj-ordersigner-',
+            dir=SHM_DIR if os.path.isdir(SHM_DIR) else None,
+        )
+
+        # The daemon maps the file via its descriptor, so it doesn't need a
+        # name (and won't be left behind if either process crashes).
+        os.unlink(path)
+        os.ftruncate(self._fd, 2 * size)
+
+        self._memory = mmap.mmap(self._fd, 2 * size)
+        self.requests = RingBuffer(self._memory, 0, self.capacity)
+        self.responses = RingBuffer(self._memory, size, self.capacity)
+
+        # Nothing has been sent yet, so wait for the first responses.
+        self.responses.sleep()
+
+    def _read_responses(self):
+        # type: () -> None
+        """
+        Passes responses to the client until the ring is empty, then goes to
+        sleep until the daemon rings the doorbell.
+        """
+        while self.responses is not None:
+            data = self.responses.read()
+
+            if data:
+                self.wrappedProtocol.dataReceived(data)
+            elif self.responses.sleep():
+                break
+
+    def _send_backlog(self):
+        # type: () -> None
+        """
+        Copies as many requests into the ring as will fit, and wakes up the
+        daemon if it is waiting for them.
+        """
+        if self._retry_call and self._retry_call.active():
+            self._retry_call.cancel()
+
+        self._retry_call = None
+
+        if self.requests is None:
+            return
+
+        written = False
+
+        while self._backlog:
+            chunk = self._backlog[0]
+
+            try:
+                size = self.requests.write(chunk)
+            except CorruptRingBuffer:
+                # The requests fail when the connection is lost.
+                self.transport.loseConnection()
+                return
+
+            if size:
+                written = True
+
+            if size < len(chunk):
+                self._backlog[0] = chunk[size:]
+                break
+
+            self._backlog.popleft()
+
+        if written and self.requests.needs_doorbell():
+            self.transport.write(self.DOORBELL)
+
+        if self._backlog:
+            # The ring is full; hold back new requests until the daemon
+            # catches up.
+            if self._producer and not self._producer_paused:
+                self._producer_paused = True
+                self._producer.pauseProducing()
+
+            self._retry_call = self.clock.callLater(
+                self.retry_delay,
+                self._send_backlog,
+            )
+        elif self._producer_paused:
+            self._producer_paused = False
+            self._producer.resumeProducing()
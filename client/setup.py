@@ -14,6 +14,16 @@ with open('README.rst', 'r', 'utf-8') as f:
 
 setup(
     extras_require={
+        # msgpack v1 dropped support for Python 2.
+        'binary': [
+            'msgpack~=0.6; python_version < "3"',
+            'msgpack~=1.0; python_version >= "3"',
+        ],
+        # The embedded client uses the daemon's code to sign orders
+        # in-process (Python 3 only).
+        'embedded': [
+            'leverj-ordersigner-daemon~=1.0rc0; python_version >= "3"',
+        ],
         'dev': [
             'sphinx~=3.2',
             'sphinx-rtd-theme~=0.5',
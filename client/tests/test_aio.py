@@ -0,0 +1,302 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import os
+import subprocess
+import sys
+
+from twisted.trial import unittest
+from ujson import dumps, loads
+
+from leverj_ordersigner_client import ErrorResponse, UnprocessableResponse
+
+if sys.version_info >= (3, 7):
+    import asyncio
+    from unittest import mock
+
+    from leverj_ordersigner_client.aio import AsyncioOrderSignerClient, \
+        _parse_interface
+
+
+class MockWriter(object):
+    """
+    Stands in for :py:class:`asyncio.StreamWriter`.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.data = b''
+
+    def write(self, data):
+        self.data += data
+
+    def close(self):
+        self.reader.feed_eof()
+
+
+class AsyncioClientTest(unittest.TestCase):
+    if sys.version_info < (3, 7):
+        skip = 'The asyncio client requires Python 3.7 or later.'
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        self.reader = asyncio.StreamReader()
+        self.writer = MockWriter(self.reader)
+
+        self.client = AsyncioOrderSignerClient(self.reader, self.writer)
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.client.close())
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def sent(self):
+        """
+        Returns the requests that the client sent.
+        """
+        return [loads(line) for line in self.writer.data.splitlines()]
+
+    def receive(self, payload):
+        """
+        Simulates a response from the daemon.
+        """
+        self.reader.feed_data(dumps(payload).encode('utf-8') + b'\r\n')
+
+    def wait(self, future):
+        return self.loop.run_until_complete(future)
+
+    def test_spot_happy_path(self):
+        """
+        Sending a valid spot transaction for signing.
+        """
+        future = self.client.sign_spot(
+            instrument={'symbol': 'LEVETH'},
+            order={'side': 'buy'},
+            signer='0x1337',
+        )
+
+        self.assertEqual(self.sent(), [{
+            'type': self.client.TYPE_SPOT,
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+            'id': 0,
+        }])
+
+        self.receive({'id': 0, 'ok': True, 'signature': '0xb4dc0de'})
+
+        self.assertEqual(self.wait(future), '0xb4dc0de')
+
+    def test_pipelining(self):
+        """
+        Sending several requests before any responses arrive; responses can
+        arrive in any order.
+        """
+        futures = [
+            self.client.sign_futures({'side': 'buy'}, 'LEVETH', '0x1337'),
+            self.client.sign_futures({'side': 'sell'}, 'LEVETH', '0x1337'),
+        ]
+
+        self.assertEqual([r['id'] for r in self.sent()], [0, 1])
+
+        self.receive({'id': 1, 'ok': True, 'signature': '0xdeadbeef'})
+        self.receive({'id': 0, 'ok': True, 'signature': '0xb4dc0de'})
+
+        self.assertEqual(
+            self.wait(asyncio.gather(*futures)),
+            ['0xb4dc0de', '0xdeadbeef'],
+        )
+
+    def test_max_in_flight(self):
+        """
+        Requests beyond ``max_in_flight`` are held back until a response is
+        received.
+        """
+        self.client.max_in_flight = 1
+
+        futures = [
+            self.client.register_instrument({'symbol': 'LEVETH'}),
+            self.client.register_instrument({'symbol': 'LEVBTC'}),
+        ]
+
+        self.assertEqual(len(self.sent()), 1)
+
+        self.receive({'id': 0, 'ok': True})
+        self.wait(futures[0])
+
+        self.assertEqual(len(self.sent()), 2)
+
+        self.receive({'id': 1, 'ok': True})
+        self.assertIsNone(self.wait(futures[1]))
+
+    def test_cancel_held_back(self):
+        """
+        Requests that are cancelled while they are held back are never sent.
+        """
+        self.client.max_in_flight = 1
+
+        first = self.client.register_instrument({'symbol': 'LEVETH'})
+        second = self.client.register_instrument({'symbol': 'LEVBTC'})
+        second.cancel()
+
+        self.receive({'id': 0, 'ok': True})
+        self.wait(first)
+
+        self.assertEqual(len(self.sent()), 1)
+
+    def test_sign_many(self):
+        """
+        Sending a batch of orders.
+        """
+        future = self.client.sign_many([])
+
+        self.receive({
+            'id': 0,
+            'ok': True,
+            'results': [
+                {'ok': True, 'signature': '0xb4dc0de'},
+                {
+                    'ok': False,
+                    'error': {
+                        'type': 'ValueError',
+                        'message': 'Invalid signer.',
+                        'context': {},
+                    },
+                },
+            ],
+        })
+
+        (ok1, sig), (ok2, error) = self.wait(future)
+
+        self.assertTrue(ok1)
+        self.assertEqual(sig, '0xb4dc0de')
+        self.assertFalse(ok2)
+        self.assertIsInstance(error, ErrorResponse)
+
+    def test_error_response(self):
+        """
+        The daemon sends back an error response.
+        """
+        future = self.client.sign_spot({'side': 'buy'}, 'LEVETH', '0x1337')
+
+        self.receive({
+            'id': 0,
+            'ok': False,
+            'error': {
+                'type': 'ValueError',
+                'message': 'Invalid signer.',
+                'context': {},
+            },
+        })
+
+        with self.assertRaises(ErrorResponse) as context:
+            self.wait(future)
+
+        self.assertEqual(context.exception.message, 'Invalid signer.')
+
+    def test_unprocessable_response(self):
+        """
+        The daemon sends back something that isn't JSON.
+        """
+        future = self.client.sign_spot({'side': 'buy'}, 'LEVETH', '0x1337')
+
+        self.reader.feed_data(b'Hello, world!\r\n')
+
+        with self.assertRaises(UnprocessableResponse):
+            self.wait(future)
+
+    def test_malformed_response(self):
+        """
+        The daemon sends back responses that are valid JSON, but don't
+        conform to the protocol.
+        """
+        batch = self.client.sign_many([{'type': 'spot'}])
+        spot = self.client.sign_spot({'side': 'buy'}, 'LEVETH', '0x1337')
+        futures = self.client.sign_futures({'side': 'sell'}, 'BTC', '0x1337')
+
+        # Batch result that is missing its signature.
+        self.receive({'id': 0, 'ok': True, 'results': [{'ok': True}]})
+
+        # IDs that aren't even hashable, or that don't belong to any pending
+        # request, are ignored.
+        self.receive({'id': [1], 'ok': False})
+        self.receive({'id': 42, 'ok': False})
+
+        with self.assertRaises(UnprocessableResponse):
+            self.wait(batch)
+
+        self.assertFalse(spot.done())
+
+        # Responses without IDs are matched to the oldest request.
+        self.receive({'ok': False})
+
+        with self.assertRaises(UnprocessableResponse):
+            self.wait(spot)
+
+        # The client keeps reading responses for the other requests.
+        self.receive({'id': 2, 'ok': True, 'signature': '0xs3ll'})
+        self.assertEqual(self.wait(futures), '0xs3ll')
+
+    def test_response_error(self):
+        """
+        Something goes wrong while processing a response.
+        """
+        spot = self.client.sign_spot({'side': 'buy'}, 'LEVETH', '0x1337')
+        futures = self.client.sign_futures({'side': 'sell'}, 'BTC', '0x1337')
+
+        with mock.patch(
+                'leverj_ordersigner_client.aio._parse_response',
+                side_effect=RuntimeError('Oops.'),
+        ):
+            self.receive({'id': 0, 'ok': True, 'signature': '0xb0y'})
+
+            with self.assertRaises(RuntimeError):
+                self.wait(spot)
+
+        # Only the request that the response belongs to failed.
+        self.receive({'id': 1, 'ok': True, 'signature': '0xs3ll'})
+        self.assertEqual(self.wait(futures), '0xs3ll')
+
+    def test_connection_closed(self):
+        """
+        Pending requests fail if the connection is closed.
+        """
+        future = self.client.sign_spot({'side': 'buy'}, 'LEVETH', '0x1337')
+
+        self.reader.feed_eof()
+
+        with self.assertRaises(ConnectionError):
+            self.wait(future)
+
+    def test_no_twisted(self):
+        """
+        Importing the asyncio client doesn't import Twisted.
+        """
+        subprocess.check_call(
+            [
+                sys.executable,
+                '-c',
+                'import sys, leverj_ordersigner_client.aio; '
+                'assert "twisted" not in sys.modules, "Twisted was imported."',
+            ],
+
+            # Trial runs tests in a temporary directory.
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+        )
+
+    def test_parse_interface(self):
+        """
+        Parsing interface descriptions.
+        """
+        self.assertEqual(
+            _parse_interface('unix:/tmp/leverj-ordersigner-daemon.sock'),
+            ('unix', {0: '/tmp/leverj-ordersigner-daemon.sock'}),
+        )
+
+        self.assertEqual(
+            _parse_interface('tcp:host=127.0.0.1:port=12345'),
+            ('tcp', {'host': '127.0.0.1', 'port': '12345'}),
+        )
@@ -0,0 +1,93 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import struct
+
+import msgpack
+from twisted.internet import testing
+from twisted.trial import unittest
+
+from leverj_ordersigner_client import ErrorResponse, UnprocessableResponse
+from leverj_ordersigner_client.binary import BinaryOrderSignerClient
+
+
+class BinaryClientTest(unittest.TestCase):
+    def setUp(self):
+        self.transport = testing.StringTransport()
+
+        self.client = BinaryOrderSignerClient()
+        self.client.makeConnection(self.transport)
+
+    def receive(self, payload):
+        """
+        Simulates a response from the daemon.
+        """
+        frame = msgpack.packb(payload, use_bin_type=True)
+        self.client.dataReceived(struct.pack('!I', len(frame)) + frame)
+
+    def test_spot_happy_path(self):
+        """
+        Sending a valid spot transaction for signing.
+        """
+        d = self.client.sign_spot(
+            instrument={'symbol': 'LEVETH'},
+            order={'side': 'buy'},
+            signer='0x1337',
+        )
+
+        # Check that correct request was sent by client.
+        data = self.transport.value()
+        length, = struct.unpack('!I', data[:4])
+
+        self.assertEqual(len(data), 4 + length)
+        self.assertEqual(
+            msgpack.unpackb(data[4:], raw=False),
+
+            {
+                'type': self.client.TYPE_SPOT,
+                'instrument': {'symbol': 'LEVETH'},
+                'order': {'side': 'buy'},
+                'signer': '0x1337',
+                'id': 0,
+            },
+        )
+
+        # Signatures are sent as raw bytes.
+        expected = b'\xb4\xdc\x0d\xe5' * 16 + b'\x1b'
+        self.receive({'id': 0, 'ok': True, 'signature': expected})
+
+        d.addCallback(self.assertEqual, expected)
+        return d
+
+    def test_error_response(self):
+        """
+        The daemon sends back an error response.
+        """
+        d = self.client.sign_futures(
+            instrument={'symbol': 'LEVETH'},
+            order={'side': 'buy'},
+            signer='0x1337',
+        )
+
+        self.receive({
+            'id': 0,
+            'ok': False,
+            'error': {
+                'type': 'ValueError',
+                'message': 'Invalid signer.',
+                'context': {},
+            },
+        })
+
+        return self.assertFailure(d, ErrorResponse)
+
+    def test_unprocessable_response(self):
+        """
+        The daemon sends back something that isn't msgpack.
+        """
+        d = self.client.register_instrument({'symbol': 'LEVETH'})
+
+        self.client.dataReceived(b'\x00\x00\x00\x01\xc1')
+
+        return self.assertFailure(d, UnprocessableResponse)
@@ -0,0 +1,270 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import socket
+import threading
+
+from twisted.trial import unittest
+from ujson import dumps, loads
+
+from leverj_ordersigner_client import ErrorResponse, UnprocessableResponse
+from leverj_ordersigner_client.blocking import BlockingClientPool, \
+    BlockingOrderSignerClient
+
+
+class BlockingClientTest(unittest.TestCase):
+    def setUp(self):
+        self.sock, self.daemon = socket.socketpair()
+        self.daemon.settimeout(1)
+
+        self.client = BlockingOrderSignerClient(sock=self.sock)
+
+    def tearDown(self):
+        self.client.close()
+        self.daemon.close()
+
+    def respond(self, *payloads):
+        """
+        Queues up responses from the daemon.
+        """
+        for payload in payloads:
+            self.daemon.sendall(dumps(payload).encode('utf-8') + b'\r\n')
+
+    def requests(self):
+        """
+        Returns the requests that the client sent.
+        """
+        return [loads(line) for line in self.daemon.recv(65536).splitlines()]
+
+    def test_spot_happy_path(self):
+        """
+        Requesting a signature for a spot order.
+        """
+        self.respond({'id': 0, 'ok': True, 'signature': '0xb4dc0de'})
+
+        signature = self.client.sign_spot(
+            instrument={'symbol': 'LEVETH'},
+            order={'side': 'buy'},
+            signer='0x1337',
+        )
+
+        self.assertEqual(signature, '0xb4dc0de')
+
+        self.assertEqual(self.requests(), [{
+            'type': self.client.TYPE_SPOT,
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+            'id': 0,
+        }])
+
+    def test_priority(self):
+        """
+        Requesting a signature for a batch of orders, with a priority.
+        """
+        self.respond({'id': 0, 'ok': True, 'results': []})
+
+        self.client.sign_many([], priority=self.client.PRIORITY_LOW)
+
+        self.assertEqual(self.requests(), [{
+            'type': self.client.TYPE_BATCH,
+            'orders': [],
+            'priority': 2,
+            'id': 0,
+        }])
+
+    def test_sign_many(self):
+        """
+        Requesting signatures for a batch of orders.
+        """
+        self.respond({
+            'id': 0,
+            'ok': True,
+            'results': [
+                {'ok': True, 'signature': '0xb4dc0de'},
+                {
+                    'ok': False,
+                    'error': {
+                        'type': 'ValueError',
+                        'message': 'Invalid signer.',
+                        'context': {},
+                    },
+                },
+            ],
+        })
+
+        (ok1, signature), (ok2, error) = self.client.sign_many([{}, {}])
+
+        self.assertTrue(ok1)
+        self.assertEqual(signature, '0xb4dc0de')
+        self.assertFalse(ok2)
+        self.assertIsInstance(error, ErrorResponse)
+
+    def test_error_response(self):
+        """
+        The daemon sends back an error response.
+        """
+        self.respond({
+            'id': 0,
+            'ok': False,
+            'error': {
+                'type': 'ValueError',
+                'message': 'Invalid signer.',
+                'context': {},
+            },
+        })
+
+        with self.assertRaises(ErrorResponse):
+            self.client.sign_futures({'side': 'buy'}, 'LEVETH', '0x1337')
+
+        # The connection can still be used.
+        self.assertFalse(self.client.closed)
+
+    def test_unprocessable_response(self):
+        """
+        The daemon sends back something that isn't JSON.
+        """
+        self.daemon.sendall(b'Hello, world!\r\n')
+
+        with self.assertRaises(UnprocessableResponse):
+            self.client.register_instrument({'symbol': 'LEVETH'})
+
+    def test_connection_closed(self):
+        """
+        The daemon closes the connection before responding.
+        """
+        self.daemon.close()
+
+        with self.assertRaises(socket.error):
+            self.client.sign_spot({'side': 'buy'}, 'LEVETH', '0x1337')
+
+        self.assertTrue(self.client.closed)
+
+
+class BlockingClientPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.daemons = []
+
+        def client_factory():
+            sock, daemon = socket.socketpair()
+            self.daemons.append(daemon)
+            return BlockingOrderSignerClient(sock=sock)
+
+        self.pool = BlockingClientPool(max_size=2, client_factory=client_factory)
+
+    def tearDown(self):
+        self.pool.close()
+
+        for daemon in self.daemons:
+            daemon.close()
+
+    def test_reuse_connection(self):
+        """
+        Connections are returned to the pool after each request.
+        """
+        with self.pool.connection() as client:
+            pass
+
+        with self.pool.connection() as client_:
+            self.assertIs(client_, client)
+
+        self.assertEqual(len(self.daemons), 1)
+
+    def test_concurrent_connections(self):
+        """
+        Borrowing more than one connection at once.
+        """
+        with self.pool.connection() as client1:
+            with self.pool.connection() as client2:
+                self.assertIsNot(client1, client2)
+
+        self.assertEqual(len(self.daemons), 2)
+
+    def test_pool_full(self):
+        """
+        Every connection is in use.
+        """
+        self.pool.timeout = 0.01
+
+        with self.pool.connection():
+            with self.pool.connection():
+                with self.assertRaises(socket.timeout):
+                    with self.pool.connection():
+                        pass
+
+    def test_discard_closed_connection(self):
+        """
+        Connections that are closed (e.g., after an error) are not returned to
+        the pool.
+        """
+        with self.pool.connection() as client:
+            client.close()
+
+        with self.pool.connection() as client_:
+            self.assertIsNot(client_, client)
+
+        self.assertEqual(len(self.daemons), 2)
+
+    def test_close_in_use(self):
+        """
+        Closing the pool while a connection is in use.
+        """
+        with self.pool.connection() as client:
+            self.pool.close()
+
+        self.assertTrue(client.closed)
+
+        with self.assertRaises(socket.error):
+            with self.pool.connection():
+                pass
+
+    def test_wait_for_discarded_connection(self):
+        """
+        A request is waiting for a connection, when a connection that is in
+        use gets discarded (which makes room to open a new one).
+        """
+        self.pool.timeout = 5
+        borrowed = []
+
+        def borrow():
+            with self.pool.connection() as client_:
+                borrowed.append(client_)
+
+        with self.pool.connection():
+            with self.pool.connection() as client:
+                thread = threading.Thread(target=borrow)
+                thread.start()
+
+                client.close()
+
+            thread.join(self.pool.timeout)
+
+            self.assertEqual(len(borrowed), 1)
+            self.assertIsNot(borrowed[0], client)
+
+    def test_close_while_waiting(self):
+        """
+        Closing the pool while a request is waiting for a connection.
+        """
+        errors = []
+
+        def borrow():
+            try:
+                with self.pool.connection():
+                    pass
+            except socket.error as e:
+                errors.append(e)
+
+        with self.pool.connection():
+            with self.pool.connection():
+                thread = threading.Thread(target=borrow)
+                thread.start()
+
+                # Give the thread a chance to start waiting.
+                thread.join(0.05)
+
+                self.pool.close()
+                thread.join(5)
+
+        self.assertEqual(len(errors), 1)
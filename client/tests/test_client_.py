@@ -2,13 +2,13 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
-from twisted.internet import testing
+from twisted.internet import defer, error, task, testing
 from twisted.python import failure
 from twisted.trial import unittest
-from ujson import dumps
+from ujson import dumps, loads
 
-from leverj_ordersigner_client import ErrorResponse, OrderSignerClient, \
-    UnprocessableResponse
+from leverj_ordersigner_client import DeadlineExceeded, ErrorResponse, \
+    OrderSignerClient, Overloaded, UnprocessableResponse
 
 
 class ClientTest(unittest.TestCase):
@@ -40,6 +40,7 @@ class ClientTest(unittest.TestCase):
                 'instrument': {'symbol': 'LEVETH'},
                 'order': {'side': 'buy'},
                 'signer': '0x1337',
+                'id': 0,
             }).encode('utf-8') + self.client.delimiter,
         )
 
@@ -75,6 +76,7 @@ class ClientTest(unittest.TestCase):
                 'instrument': {'symbol': 'LEVETH'},
                 'order': {'side': 'buy'},
                 'signer': '0x1337',
+                'id': 0,
             }).encode('utf-8') + self.client.delimiter,
         )
 
@@ -121,6 +123,60 @@ class ClientTest(unittest.TestCase):
         d.addErrback(checkFailure)
         return d
 
+    def test_deadline_exceeded(self):
+        """
+        The request expires before the daemon gets around to signing it.
+        """
+        d = self.client.sign_futures(
+            instrument={'symbol': 'LEVETH'},
+            order={'side': 'buy'},
+            signer='0x1337',
+            ttl_ms=50,
+        )
+
+        self.assertEqual(loads(self.transport.value())['ttl_ms'], 50)
+
+        # Simulate response from daemon.
+        self.client.lineReceived(dumps({
+            'id': 0,
+            'ok': False,
+
+            'error': {
+                'type': 'DeadlineExceeded',
+                'message': 'Request expired after waiting 51 ms to be signed.',
+                'context': {'waited_ms': 51},
+            },
+        }).encode('utf-8'))
+
+        self.failureResultOf(d, DeadlineExceeded)
+
+    def test_overloaded_in_batch(self):
+        """
+        Errors in batch results use the same exception classes.
+        """
+        d = self.client.sign_many([])
+
+        self.client.lineReceived(dumps({
+            'id': 0,
+            'ok': True,
+
+            'results': [{
+                'ok': False,
+
+                'error': {
+                    'type': 'Overloaded',
+                    'message': 'Too many requests are waiting to be signed.',
+                    'context': {'max_queued': 1000},
+                },
+            }],
+        }).encode('utf-8'))
+
+        [(success, error)] = self.successResultOf(d)
+
+        self.assertFalse(success)
+        self.assertIsInstance(error, Overloaded)
+        self.assertIsInstance(error, ErrorResponse)
+
     def test_unprocessable_response(self):
         """
         For some reason, the daemon sent back something that doesn't conform
@@ -147,6 +203,27 @@ class ClientTest(unittest.TestCase):
         d.addErrback(checkFailure)
         return d
 
+    def test_unprocessable_batch_response(self):
+        """
+        The daemon sends back a batch response that does not conform to the
+        protocol.
+        """
+        responses = [
+            {'id': 0, 'ok': True, 'results': [{'ok': True}]},
+            {'id': 1, 'ok': True, 'results': [{'ok': False}]},
+            {'id': 2, 'ok': True, 'results': [{'ok': False, 'error': 42}]},
+            {'id': 3, 'ok': True, 'results': ['0xb4dc0de']},
+            {'id': 4, 'ok': True, 'results': 42},
+        ]
+
+        for response in responses:
+            d = self.client.sign_many([{'type': self.client.TYPE_SPOT}])
+            self.client.lineReceived(dumps(response).encode('utf-8'))
+
+            self.failureResultOf(d, UnprocessableResponse)
+
+        self.assertEqual(self.client.outstanding, 0)
+
     def test_non_json_response(self):
         """
         Delving even further into the bizarre, the server sends back something
@@ -170,3 +247,408 @@ class ClientTest(unittest.TestCase):
 
         d.addErrback(checkFailure)
         return d
+
+    def test_out_of_order_responses(self):
+        """
+        The daemon sends back responses in a different order than the
+        requests were sent.
+        """
+        first = self.client.sign_spot(
+            instrument={'symbol': 'LEVETH'},
+            order={'side': 'buy'},
+            signer='0x1337',
+        )
+
+        second = self.client.sign_spot(
+            instrument={'symbol': 'LEVETH'},
+            order={'side': 'sell'},
+            signer='0x1337',
+        )
+
+        # Simulate responses from daemon, in reverse order.
+        self.client.lineReceived(dumps({
+            'id': 1,
+            'ok': True,
+            'signature': '0xs3ll',
+        }).encode('utf-8'))
+
+        self.client.lineReceived(dumps({
+            'id': 0,
+            'ok': True,
+            'signature': '0xb0y',
+        }).encode('utf-8'))
+
+        first.addCallback(self.assertEqual, '0xb0y')
+        second.addCallback(self.assertEqual, '0xs3ll')
+        return defer.gatherResults([first, second])
+
+    def test_response_without_id(self):
+        """
+        The daemon sends back a response without an ID; it is matched to the
+        oldest pending request.
+        """
+        first = self.client.sign_spot(
+            instrument={'symbol': 'LEVETH'},
+            order={'side': 'buy'},
+            signer='0x1337',
+        )
+
+        self.client.sign_spot(
+            instrument={'symbol': 'LEVETH'},
+            order={'side': 'sell'},
+            signer='0x1337',
+        )
+
+        self.client.lineReceived(dumps({
+            'ok': True,
+            'signature': '0xb0y',
+        }).encode('utf-8'))
+
+        first.addCallback(self.assertEqual, '0xb0y')
+        return first
+
+    def test_response_with_unknown_id(self):
+        """
+        The daemon sends back responses with IDs that don't belong to any
+        pending request; they are ignored.
+        """
+        first = self.client.sign_spot(
+            instrument={'symbol': 'LEVETH'},
+            order={'side': 'buy'},
+            signer='0x1337',
+        )
+
+        for request_id in (42, [0], {'id': 0}, '0'):
+            self.client.lineReceived(dumps({
+                'id': request_id,
+                'ok': True,
+                'signature': '0xs3ll',
+            }).encode('utf-8'))
+
+        self.assertNoResult(first)
+
+        self.client.lineReceived(dumps({
+            'id': 0,
+            'ok': True,
+            'signature': '0xb0y',
+        }).encode('utf-8'))
+
+        self.assertEqual(self.successResultOf(first), '0xb0y')
+
+    def test_sign_many(self):
+        """
+        Sending a batch of orders for signing; one of them can't be signed.
+        """
+        orders = [
+            {
+                'type': self.client.TYPE_SPOT,
+                'instrument': {'symbol': 'LEVETH'},
+                'order': {'side': 'buy'},
+                'signer': '0x1337',
+            },
+
+            {
+                'type': self.client.TYPE_FUTURES,
+                'instrument': {'symbol': 'LEVETH'},
+                'order': {'side': 'sell'},
+                'signer': '0x0',
+            },
+        ]
+
+        d = self.client.sign_many(orders)
+
+        # Check that correct request was sent by client.
+        self.assertEqual(
+            self.transport.value(),
+
+            dumps({
+                'type': self.client.TYPE_BATCH,
+                'orders': orders,
+                'id': 0,
+            }).encode('utf-8') + self.client.delimiter,
+        )
+
+        # Simulate response from daemon.
+        self.client.lineReceived(dumps({
+            'id': 0,
+            'ok': True,
+
+            'results': [
+                {
+                    'ok': True,
+                    'signature': '0xb4dc0de',
+                },
+
+                {
+                    'ok': False,
+                    'error': {
+                        'type': 'ValueError',
+                        'message': 'Invalid signer.',
+                        'context': {},
+                    },
+                },
+            ],
+        }).encode('utf-8'))
+
+        def checkResults(results):
+            # type: (list) -> None
+            self.assertEqual(results[0], (True, '0xb4dc0de'))
+
+            success, error = results[1]
+            self.assertFalse(success)
+            self.assertIsInstance(error, ErrorResponse)
+            self.assertEqual(error.message, 'Invalid signer.')
+
+        d.addCallback(checkResults)
+        return d
+
+    def test_sign_many_large_response(self):
+        """
+        The response to a batch of 1000 orders (the daemon's limit) is
+        received in chunks.
+        """
+        d = self.client.sign_many([{'type': self.client.TYPE_SPOT}] * 1000)
+
+        data = dumps({
+            'id': 0,
+            'ok': True,
+
+            'results': [
+                {
+                    'ok': True,
+                    'signature': '0x' + 'ab' * 65,
+                },
+            ] * 1000,
+        }).encode('utf-8') + self.client.delimiter
+
+        for i in range(0, len(data), 65536):
+            self.client.dataReceived(data[i:i + 65536])
+
+        self.assertFalse(self.transport.disconnecting)
+        self.assertEqual(len(self.successResultOf(d)), 1000)
+
+    def test_priority(self):
+        """
+        Sending a request with a priority.
+        """
+        self.client.sign_spot(
+            instrument={'symbol': 'LEVETH'},
+            order={'side': 'buy'},
+            signer='0x1337',
+            priority=self.client.PRIORITY_HIGH,
+        )
+
+        # Check that correct request was sent by client.
+        self.assertEqual(
+            self.transport.value(),
+
+            dumps({
+                'type': self.client.TYPE_SPOT,
+                'instrument': {'symbol': 'LEVETH'},
+                'order': {'side': 'buy'},
+                'signer': '0x1337',
+                'priority': 0,
+                'id': 0,
+            }).encode('utf-8') + self.client.delimiter,
+        )
+
+    def test_register_instrument(self):
+        """
+        Registering an instrument, so that orders can refer to it by symbol.
+        """
+        d = self.client.register_instrument({'symbol': 'LEVETH'})
+
+        # Check that correct request was sent by client.
+        self.assertEqual(
+            self.transport.value(),
+
+            dumps({
+                'type': self.client.TYPE_INSTRUMENT,
+                'instrument': {'symbol': 'LEVETH'},
+                'id': 0,
+            }).encode('utf-8') + self.client.delimiter,
+        )
+
+        # Simulate response from daemon.
+        self.client.lineReceived(dumps({
+            'id': 0,
+            'ok': True,
+        }).encode('utf-8'))
+
+        d.addCallback(self.assertIsNone)
+        return d
+
+    def test_max_in_flight(self):
+        """
+        Once ``max_in_flight`` requests are waiting for responses, new
+        requests are held back until a response is received.
+        """
+        self.client.max_in_flight = 2
+
+        deferreds = [
+            self.client.sign_spot({'side': 'buy'}, 'LEVETH', '0x1337')
+            for _ in range(3)
+        ]
+
+        # Only the first two requests are sent.
+        self.assertEqual(self.transport.value().count(b'\r\n'), 2)
+        self.transport.clear()
+
+        # Simulate response from daemon.
+        self.client.lineReceived(dumps({
+            'id': 0,
+            'ok': True,
+            'signature': '0xb4dc0de',
+        }).encode('utf-8'))
+
+        # Now there is room for the third request.
+        self.assertEqual(
+            self.transport.value(),
+
+            dumps({
+                'type': self.client.TYPE_SPOT,
+                'instrument': 'LEVETH',
+                'order': {'side': 'buy'},
+                'signer': '0x1337',
+                'id': 2,
+            }).encode('utf-8') + self.client.delimiter,
+        )
+
+        return deferreds[0]
+
+    def test_pause_producing(self):
+        """
+        The transport pauses the client while its write buffer is full.
+        """
+        self.client.pauseProducing()
+
+        d = self.client.register_instrument({'symbol': 'LEVETH'})
+
+        # The request is held back until the transport resumes the client.
+        self.assertEqual(self.transport.value(), b'')
+
+        self.client.resumeProducing()
+
+        self.assertEqual(
+            self.transport.value(),
+
+            dumps({
+                'type': self.client.TYPE_INSTRUMENT,
+                'instrument': {'symbol': 'LEVETH'},
+                'id': 0,
+            }).encode('utf-8') + self.client.delimiter,
+        )
+
+        self.client.lineReceived(dumps({
+            'id': 0,
+            'ok': True,
+        }).encode('utf-8'))
+
+        d.addCallback(self.assertIsNone)
+        return d
+
+    def test_registers_producer(self):
+        """
+        The client registers itself as a streaming producer with the
+        transport.
+        """
+        self.assertIs(self.transport.producer, self.client)
+        self.assertTrue(self.transport.streaming)
+
+    def test_timeout(self):
+        """
+        A request fails if the daemon doesn't respond in time; a late response
+        is ignored.
+        """
+        self.client.clock = task.Clock()
+
+        d = self.client.sign_spot(
+            {'side': 'buy'},
+            'LEVETH',
+            '0x1337',
+            timeout=5,
+        )
+
+        self.client.clock.advance(5)
+        self.failureResultOf(d, defer.TimeoutError)
+
+        self.client.lineReceived(dumps({
+            'id': 0,
+            'ok': True,
+            'signature': '0xl4t3',
+        }).encode('utf-8'))
+
+        self.assertEqual(self.client.outstanding, 0)
+
+    def test_default_timeout(self):
+        """
+        Requests that are held back also time out, and are never sent.
+        """
+        self.client.clock = task.Clock()
+        self.client.max_in_flight = 1
+        self.client.timeout = 1
+
+        first = self.client.register_instrument({'symbol': 'LEVETH'})
+        self.client.clock.advance(0.5)
+        second = self.client.register_instrument({'symbol': 'LEVBTC'})
+
+        self.client.clock.advance(0.5)
+        self.failureResultOf(first, defer.TimeoutError)
+        self.assertNoResult(second)
+
+        self.client.clock.advance(0.5)
+        self.failureResultOf(second, defer.TimeoutError)
+        self.assertEqual(self.client.outstanding, 1)
+
+        self.transport.clear()
+        self.client.lineReceived(dumps({'id': 0, 'ok': True}).encode('utf-8'))
+
+        self.assertEqual(self.transport.value(), b'')
+        self.assertEqual(self.client.outstanding, 0)
+
+    def test_cancel(self):
+        """
+        Cancelling a request doesn't throw off the matching of responses
+        without IDs.
+        """
+        first = self.client.sign_spot({'side': 'buy'}, 'LEVETH', '0x1337')
+        second = self.client.sign_spot({'side': 'sell'}, 'LEVETH', '0x1337')
+
+        first.cancel()
+        self.failureResultOf(first, defer.CancelledError)
+
+        # This response belongs to the first (cancelled) request.
+        self.client.lineReceived(dumps({
+            'ok': True,
+            'signature': '0xb0y',
+        }).encode('utf-8'))
+
+        self.assertNoResult(second)
+
+        self.client.lineReceived(dumps({
+            'ok': True,
+            'signature': '0xs3ll',
+        }).encode('utf-8'))
+
+        self.assertEqual(self.successResultOf(second), '0xs3ll')
+
+    def test_connection_lost(self):
+        """
+        Requests that are still waiting fail when the connection is lost, as
+        do requests made afterwards.
+        """
+        self.client.max_in_flight = 1
+
+        sent = self.client.register_instrument({'symbol': 'LEVETH'})
+        held = self.client.register_instrument({'symbol': 'LEVBTC'})
+
+        self.client.connectionLost(failure.Failure(error.ConnectionLost()))
+
+        self.failureResultOf(sent, error.ConnectionLost)
+        self.failureResultOf(held, error.ConnectionLost)
+        self.assertEqual(self.client.outstanding, 0)
+
+        self.failureResultOf(
+            self.client.register_instrument({'symbol': 'LEVUSD'}),
+            error.ConnectionLost,
+        )
@@ -0,0 +1,187 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from twisted.internet import error
+from twisted.trial import unittest
+
+from leverj_ordersigner_client import ErrorResponse, async_create_client
+
+try:
+    from ordersigner_daemon.protocol import SigningProtocolFactory
+    from ordersigner_daemon.testing import MockOrderSigner
+
+    from leverj_ordersigner_client.embedded import \
+        EmbeddedOrderSignerClient, create_embedded_client
+except (ImportError, SyntaxError):
+    # The embedded client requires Python 3 and the ``embedded`` extra.
+    EmbeddedOrderSignerClient = None
+
+
+class EmbeddedClientTest(unittest.TestCase):
+    if EmbeddedOrderSignerClient is None:
+        skip = 'The embedded client requires the ``embedded`` extra.'
+
+    def setUp(self):
+        factory = SigningProtocolFactory()
+
+        self.order_signer = MockOrderSigner()
+        factory.order_signer = self.order_signer
+
+        self.client = EmbeddedOrderSignerClient(factory)
+        self.addCleanup(self.client.close)
+
+    def test_sign_spot(self):
+        """
+        The order is signed in-process.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de'
+
+        d = self.client.sign_spot({'side': 'buy'}, {'symbol': 'LEVETH'}, '0x1')
+
+        self.assertEqual(self.successResultOf(d), '0xb4dc0de')
+        self.assertEqual(self.client.outstanding, 0)
+
+        self.assertEqual(
+            self.order_signer.spot_args,
+            ({'side': 'buy'}, {'symbol': 'LEVETH'}, '0x1'),
+        )
+
+    def test_request_from_callback(self):
+        """
+        The application sends another request as soon as a result arrives.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de'
+
+        d = self.client.sign_spot({'side': 'buy'}, {'symbol': 'LEVETH'}, '0x1')
+
+        d.addCallback(lambda _: self.client.sign_spot(
+            {'side': 'sell'},
+            {'symbol': 'LEVETH'},
+            '0x1',
+        ))
+
+        self.assertEqual(self.successResultOf(d), '0xb4dc0de')
+        self.assertEqual(self.client.outstanding, 0)
+
+    def test_signing_error(self):
+        """
+        Errors are reported the same way as by the daemon.
+        """
+        self.order_signer.futures_sig = ValueError('Invalid signer.')
+
+        d = self.client.sign_futures({'side': 'sell'}, {'symbol': 'BT'}, '0x1')
+
+        e = self.failureResultOf(d, ErrorResponse).value
+        self.assertEqual(e.type, 'ValueError')
+        self.assertEqual(e.message, 'Invalid signer.')
+
+    def test_validation_error(self):
+        """
+        Invalid requests are rejected the same way as by the daemon.
+        """
+        d = self.client.sign_spot({'side': 'buy'}, {'symbol': 'LEVETH'}, '')
+
+        e = self.failureResultOf(d, ErrorResponse).value
+        self.assertEqual(e.type, 'ValueError')
+        self.assertIn('signer', e.context)
+
+    def test_register_instrument(self):
+        """
+        Orders can refer to registered instruments by symbol.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de'
+        instrument = {'symbol': 'LEVETH', 'quote': {'decimals': 18}}
+
+        self.assertIsNone(
+            self.successResultOf(self.client.register_instrument(instrument)),
+        )
+
+        d = self.client.sign_spot({'side': 'buy'}, 'LEVETH', '0x1')
+
+        self.assertEqual(self.successResultOf(d), '0xb4dc0de')
+        self.assertEqual(self.order_signer.spot_args[1], instrument)
+
+    def test_sign_many(self):
+        """
+        Results for a batch are returned as ``(success, result)`` tuples.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de'
+        self.order_signer.futures_sig = ValueError('Invalid signer.')
+
+        d = self.client.sign_many([
+            {
+                'type': 'spot',
+                'instrument': {'symbol': 'LEVETH'},
+                'order': {'side': 'buy'},
+                'signer': '0x1',
+            },
+
+            {
+                'type': 'futures',
+                'instrument': {'symbol': 'BTC'},
+                'order': {'side': 'sell'},
+                'signer': '0x1',
+            },
+        ])
+
+        results = self.successResultOf(d)
+
+        self.assertEqual(results[0], (True, '0xb4dc0de'))
+        self.assertFalse(results[1][0])
+        self.assertIsInstance(results[1][1], ErrorResponse)
+
+    def test_close(self):
+        """
+        Closing the client disconnects it from the signing protocol.
+        """
+        self.client.close()
+
+        self.assertFalse(self.client.connected)
+        self.assertEqual(self.client.factory.metrics.connections, 0)
+
+        self.failureResultOf(
+            self.client.sign_spot({'side': 'buy'}, 'LEVETH', '0x1'),
+            error.ConnectionDone,
+        )
+
+
+class CreateEmbeddedClientTest(unittest.TestCase):
+    if EmbeddedOrderSignerClient is None:
+        skip = 'The embedded client requires the ``embedded`` extra.'
+
+    def test_interface_options(self):
+        """
+        Options are read from the interface description.
+        """
+        client = create_embedded_client(
+            'embedded:threaded=1:result_cache_size=100',
+            max_in_flight=10,
+        )
+
+        self.addCleanup(client.close)
+
+        self.assertEqual(client.max_in_flight, 10)
+        self.assertIsNotNone(client.factory.pool)
+        self.assertEqual(client.factory.order_signer.results.max_size, 100)
+
+    def test_unsupported_interface(self):
+        """
+        Only ``embedded:`` interfaces are supported.
+        """
+        with self.assertRaises(ValueError):
+            create_embedded_client('unix:/tmp/leverj-ordersigner-daemon.sock')
+
+    def test_async_create_client(self):
+        """
+        ``async_create_client`` returns an embedded client for ``embedded:``
+        interfaces, so that applications can switch via their config.
+        """
+        client = self.successResultOf(async_create_client(
+            interface='embedded:',
+        ))
+
+        self.addCleanup(client.close)
+
+        self.assertIsInstance(client, EmbeddedOrderSignerClient)
+        self.assertIsNone(client.factory.pool)
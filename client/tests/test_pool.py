@@ -0,0 +1,129 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from twisted.internet import defer, error, testing
+from twisted.trial import unittest
+from ujson import dumps, loads
+
+from leverj_ordersigner_client import OrderSignerClient
+from leverj_ordersigner_client.pool import OrderSignerClientPool, \
+    _clients_connected
+
+
+class ClientPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.transports = []
+        self.clients = []
+
+        for _ in range(3):
+            transport = testing.StringTransport()
+            client = OrderSignerClient()
+            client.makeConnection(transport)
+
+            self.transports.append(transport)
+            self.clients.append(client)
+
+        self.pool = OrderSignerClientPool(self.clients)
+
+    def sent(self, i):
+        """
+        Returns the requests that were sent over the i-th connection.
+        """
+        return [
+            loads(line)
+            for line in self.transports[i].value().splitlines()
+        ]
+
+    def test_least_outstanding(self):
+        """
+        Each request is sent to the connection with the fewest outstanding
+        requests.
+        """
+        for _ in range(3):
+            self.pool.sign_spot({'side': 'buy'}, 'LEVETH', '0x1337')
+
+        self.assertEqual([len(self.sent(i)) for i in range(3)], [1, 1, 1])
+
+        # The second connection answers its request, so it is now the least
+        # busy.
+        self.clients[1].lineReceived(dumps({
+            'id': 0,
+            'ok': True,
+            'signature': '0xb4dc0de',
+        }).encode('utf-8'))
+
+        d = self.pool.sign_futures({'side': 'sell'}, 'LEVETH', '0x1337')
+
+        self.assertEqual([len(self.sent(i)) for i in range(3)], [1, 2, 1])
+        self.assertEqual(self.sent(1)[1]['type'], OrderSignerClient.TYPE_FUTURES)
+
+        self.clients[1].lineReceived(dumps({
+            'id': 1,
+            'ok': True,
+            'signature': '0xdeadbeef',
+        }).encode('utf-8'))
+
+        d.addCallback(self.assertEqual, '0xdeadbeef')
+        return d
+
+    def test_skips_closed_connections(self):
+        """
+        Requests are not sent over connections that have been closed.
+        """
+        self.clients[0].connectionLost(error.ConnectionDone())
+
+        self.pool.sign_spot({'side': 'buy'}, 'LEVETH', '0x1337')
+
+        self.assertEqual([len(self.sent(i)) for i in range(3)], [0, 1, 0])
+
+    def test_no_open_connections(self):
+        """
+        Requests fail if every connection in the pool has been closed.
+        """
+        for client in self.clients:
+            client.connectionLost(error.ConnectionDone())
+
+        d = self.pool.sign_spot({'side': 'buy'}, 'LEVETH', '0x1337')
+        return self.assertFailure(d, error.ConnectError)
+
+    def test_register_instrument(self):
+        """
+        Instruments are registered with every daemon in the pool.
+        """
+        d = self.pool.register_instrument({'symbol': 'LEVETH'})
+
+        for i, client in enumerate(self.clients):
+            self.assertEqual(
+                self.sent(i),
+
+                [{
+                    'type': OrderSignerClient.TYPE_INSTRUMENT,
+                    'instrument': {'symbol': 'LEVETH'},
+                    'id': 0,
+                }],
+            )
+
+            client.lineReceived(dumps({'id': 0, 'ok': True}).encode('utf-8'))
+
+        d.addCallback(self.assertIsNone)
+        return d
+
+    def test_connection_failure(self):
+        """
+        If any connection in the pool fails, the others are closed.
+        """
+        results = [
+            (True, self.clients[0]),
+            (False, defer.fail(error.ConnectError()).addErrback(lambda f: f)),
+        ]
+
+        # Grab the ``Failure`` out of the deferred.
+        failures = []
+        results[1][1].addErrback(failures.append)
+        results[1] = (False, failures[0])
+
+        result = _clients_connected(results)
+
+        self.assertIs(result, failures[0])
+        self.assertTrue(self.transports[0].disconnecting)
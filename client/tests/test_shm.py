@@ -0,0 +1,186 @@
+# coding=utf-8
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import mmap
+import os
+
+from twisted.internet import error, protocol, task, testing
+from twisted.python import failure
+from twisted.trial import unittest
+from ujson import dumps, loads
+
+from leverj_ordersigner_client import OrderSignerClient
+from leverj_ordersigner_client.shm import RingBuffer, ShmClientProtocol
+
+
+class RingBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.memory = mmap.mmap(-1, RingBuffer.size(8))
+        self.ring = RingBuffer(self.memory, 0, 8)
+
+    def tearDown(self):
+        self.memory.close()
+
+    def test_wrap_around(self):
+        """
+        Writes that reach the end of the ring continue at the start.
+        """
+        self.assertEqual(self.ring.write(b'abcdef'), 6)
+        self.assertEqual(self.ring.read(), b'abcdef')
+
+        self.assertEqual(self.ring.write(b'ghijklmnop'), 8)
+        self.assertEqual(self.ring.read(), b'ghijklmn')
+        self.assertEqual(self.ring.read(), b'')
+
+
+class ShmClientProtocolTest(unittest.TestCase):
+    CAPACITY = 256
+
+    def setUp(self):
+        self.client = OrderSignerClient()
+        self.clock = task.Clock()
+
+        self.protocol = ShmClientProtocol(
+            self.client,
+            self.CAPACITY,
+            self.clock,
+        )
+
+        self.transport = FileDescriptorTransport()
+        self.protocol.makeConnection(self.transport)
+
+        # Plays the part of the daemon, which maps the shared memory via the
+        # descriptor that the client sent.
+        size = RingBuffer.size(self.CAPACITY)
+        self.memory = mmap.mmap(self.transport.descriptors[0], 2 * size)
+        self.requests = RingBuffer(self.memory, 0, self.CAPACITY)
+        self.responses = RingBuffer(self.memory, size, self.CAPACITY)
+
+    def tearDown(self):
+        self.memory.close()
+        os.close(self.transport.descriptors[0])
+
+        if self.protocol.wrappedProtocol:
+            self.protocol.connectionLost(protocol.connectionDone)
+
+    def test_handshake(self):
+        """
+        The client sends the descriptor for the shared memory, and the
+        capacity of each ring.
+        """
+        self.assertEqual(len(self.transport.descriptors), 1)
+
+        self.assertEqual(
+            loads(self.transport.value()),
+            {'capacity': self.CAPACITY},
+        )
+
+    def test_requests_and_responses(self):
+        """
+        Requests and responses are sent through shared memory.
+        """
+        self.transport.clear()
+
+        # The daemon is waiting for requests.
+        self.assertTrue(self.requests.sleep())
+
+        d = self.client.sign_spot({'side': 'buy'}, 'LEVETH', '0x1337')
+
+        self.assertEqual(loads(self.requests.read())['type'], 'spot')
+        self.assertEqual(self.transport.value(), ShmClientProtocol.DOORBELL)
+
+        self.responses.write(dumps({
+            'id': 0,
+            'ok': True,
+            'signature': '0xb4dc0de',
+        }).encode('utf-8') + b'\r\n')
+
+        # The client is waiting for responses.
+        self.assertTrue(self.responses.needs_doorbell())
+
+        self.protocol.dataReceived(ShmClientProtocol.DOORBELL)
+        self.assertEqual(self.successResultOf(d), '0xb4dc0de')
+
+    def test_doorbell(self):
+        """
+        The client only rings the doorbell when the daemon is waiting for it.
+        """
+        self.transport.clear()
+
+        # The daemon hasn't finished reading earlier requests.
+        self.client.sign_spot({'side': 'buy'}, 'LEVETH', '0x1337')
+        self.assertEqual(self.transport.value(), b'')
+
+        self.requests.read()
+        self.assertTrue(self.requests.sleep())
+
+        for side in ('sell', 'hold'):
+            # The daemon never responds, so the requests fail when the
+            # connection is closed.
+            d = self.client.sign_spot({'side': side}, 'LEVETH', '0x1337')
+            d.addErrback(lambda _: None)
+
+        self.assertEqual(self.transport.value(), ShmClientProtocol.DOORBELL)
+
+        # After reading responses, the client goes back to sleep.
+        self.responses.needs_doorbell()
+        self.responses.write(dumps({
+            'id': 0,
+            'ok': True,
+            'signature': '0xb4dc0de',
+        }).encode('utf-8') + b'\r\n')
+
+        self.protocol.dataReceived(ShmClientProtocol.DOORBELL)
+        self.assertTrue(self.responses.needs_doorbell())
+
+    def test_corrupt_response_ring(self):
+        """
+        The counters of the response ring are corrupted; the client
+        disconnects rather than reading outside the ring.
+        """
+        d = self.client.sign_spot({'side': 'buy'}, 'LEVETH', '0x1337')
+
+        self.responses._store(RingBuffer._HEAD, self.CAPACITY + 1)
+        self.protocol.dataReceived(ShmClientProtocol.DOORBELL)
+
+        self.assertTrue(self.transport.disconnecting)
+        self.assertNoResult(d)
+
+        self.protocol.connectionLost(failure.Failure(error.ConnectionDone()))
+        self.failureResultOf(d, error.ConnectionDone)
+
+    def test_request_ring_full(self):
+        """
+        The client stops sending requests while the request ring is full.
+        """
+        instrument = {'symbol': 'LEVETH', 'name': 'x' * self.CAPACITY}
+
+        for _ in range(2):
+            # The daemon never responds, so the requests fail when the
+            # connection is closed.
+            d = self.client.register_instrument(instrument)
+            d.addErrback(lambda _: None)
+
+        # The first request didn't fit, so the second was held back.
+        self.assertEqual(len(self.requests.read()), self.CAPACITY)
+        self.assertEqual(len(self.client._backlog), 1)
+
+        self.clock.advance(ShmClientProtocol.retry_delay)
+        self.requests.read()
+        self.clock.advance(ShmClientProtocol.retry_delay)
+
+        self.assertEqual(len(self.client._backlog), 0)
+
+
+class FileDescriptorTransport(testing.StringTransport):
+    """
+    Records file descriptors that are sent over the transport.
+    """
+
+    def __init__(self):
+        testing.StringTransport.__init__(self)
+        self.descriptors = []
+
+    def sendFileDescriptor(self, descriptor):
+        self.descriptors.append(os.dup(descriptor))
@@ -1,13 +1,53 @@
+import typing
 from collections import namedtuple as named_tuple
+from hashlib import blake2b
 
+from eth_keys import keys
 from leverj_ordersigner import futures, spot
+from ujson import dumps
+
+from ordersigner_daemon import signing
+from ordersigner_daemon.cache import ExpiringLruCache, LruCache
+from ordersigner_daemon.keystore import Keystore, UnknownSigner, \
+    is_private_key, parse_private_key
 
 __all__ = [
+    'Batch',
     'Order',
     'OrderSigner',
+    'PRIORITY_HIGH',
+    'PRIORITY_LOW',
+    'PRIORITY_NORMAL',
+    'RegisterInstrument',
 ]
 
-Order = named_tuple('Order', ('type', 'order', 'instrument', 'signer'))
+# Requests with a lower priority value are signed first, when more requests
+# are waiting than can be signed at once (see ``scheduler.SigningScheduler``).
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+Order = named_tuple(
+    'Order',
+    ('type', 'order', 'instrument', 'signer', 'id', 'priority', 'ttl_ms'),
+
+    # ``id`` is optional; it is only used to match responses to requests.
+    # ``priority`` is optional; ``None`` means ``PRIORITY_NORMAL``.
+    # ``ttl_ms`` is optional; ``None`` means the request never expires.
+    defaults=(None, None, None),
+)
+
+Batch = named_tuple(
+    'Batch',
+    ('orders', 'id', 'priority', 'ttl_ms'),
+    defaults=(None, None, None),
+)
+
+RegisterInstrument = named_tuple(
+    'RegisterInstrument',
+    ('instrument', 'id'),
+    defaults=(None,),
+)
 
 
 class OrderSigner:
@@ -18,10 +58,99 @@ class OrderSigner:
     TYPE_FUTURES = 'futures'
     TYPE_SPOT = 'spot'
 
+    def __init__(
+            self,
+            keystore: typing.Optional[Keystore] = None,
+            context_cache_size: int = 1000,
+            key_cache_size: int = 1000,
+            result_cache_size: int = 0,
+            result_cache_ttl: float = 60.0,
+    ) -> None:
+        """
+        :param keystore: Private keys that orders can refer to by alias or
+        address.
+
+        :param context_cache_size: Max number of instruments to keep prepared
+        signing contexts for (see :py:mod:`ordersigner_daemon.signing`).
+
+        :param key_cache_size: Max number of private keys sent in requests to
+        keep parsed key objects for.
+
+        :param result_cache_size: Max number of signatures to cache, so that
+        repeated requests for the same order don't have to be signed again.
+        If 0, signatures are not cached.
+
+        :param result_cache_ttl: Number of seconds to cache each signature
+        for.
+        """
+        self.keystore = keystore
+
+        self._contexts = LruCache(context_cache_size)
+        self._keys = LruCache(key_cache_size)
+
+        self.results: typing.Optional[ExpiringLruCache] = (
+            ExpiringLruCache(result_cache_size, result_cache_ttl)
+            if result_cache_size
+            else None
+        )
+
+    @property
+    def caches(self) -> typing.Dict[str, LruCache]:
+        """
+        Returns the caches that the order signer uses, keyed by name (e.g.,
+        to report their hit rates).
+        """
+        caches = {
+            'context': self._contexts,
+            'key': self._keys,
+        }
+
+        if self.results is not None:
+            caches['result'] = self.results
+
+        return caches
+
     def sign(self, order: Order) -> str:
         """
         Returns the correct signature for the provided order object.
         """
+        signature = self.get_cached_signature(order)
+
+        if signature is None:
+            signature = self.cache_signature(self._sign(order), order)
+
+        return signature
+
+    def get_cached_signature(self, order: Order) -> typing.Optional[str]:
+        """
+        Returns the cached signature for an order, or ``None`` if there isn't
+        one.
+        """
+        if self.results is None:
+            return None
+
+        key = self._result_key(order)
+        return None if key is None else self.results.get(key)
+
+    def cache_signature(self, signature: str, order: Order) -> str:
+        """
+        Stores the signature for an order in the cache (if enabled).
+
+        :return: The signature, so that this method can be used as a
+        callback.
+        """
+        if self.results is not None:
+            key = self._result_key(order)
+
+            if key is not None:
+                self.results.set(key, signature)
+
+        return signature
+
+    def _sign(self, order: Order) -> str:
+        """
+        Generates the signature for an order.
+        """
         if order.type == self.TYPE_FUTURES:
             return self.sign_futures(
                 order.order,
@@ -35,8 +164,101 @@ class OrderSigner:
                 order.signer,
             )
 
+    def sign_many(
+            self,
+            orders: typing.Iterable[Order],
+    ) -> typing.List[typing.Union[str, Exception]]:
+        """
+        Returns the signatures for a batch of orders.
+
+        If an order can't be signed, the exception is returned in place of its
+        signature, so that one bad order does not spoil the whole batch.
+        """
+        results = []
+
+        for order in orders:
+            try:
+                results.append(self.sign(order))
+            except Exception as e:
+                results.append(e)
+
+        return results
+
     def sign_futures(self, order: dict, instrument: dict, signer: str) -> str:
-        return futures.sign_order(order, instrument, signer)
+        return futures.sign(
+            signing.futures_hash(order, self._get_context(instrument)),
+            self._get_key(signer),
+        )
 
     def sign_spot(self, order: dict, instrument: dict, signer: str) -> str:
-        return spot.sign_order(order, instrument, signer)
+        return spot.sign(
+            signing.spot_hash(order, self._get_context(instrument)),
+            self._get_key(signer),
+        )
+
+    @staticmethod
+    def _result_key(order: Order) -> typing.Optional[bytes]:
+        """
+        Returns the key for an order in the result cache, or ``None`` if the
+        order can't be cached.
+
+        The key is a digest of everything that goes into the signature, so
+        that the cache doesn't have to store the orders (or private keys)
+        themselves.
+        """
+        instrument = order.instrument
+
+        if isinstance(instrument, signing.PreparedInstrument):
+            instrument = instrument.key
+
+        try:
+            canonical = dumps(
+                (order.type, order.order, instrument, order.signer),
+                sort_keys=True,
+            )
+        except (TypeError, OverflowError):
+            return None
+
+        return blake2b(canonical.encode('utf-8'), digest_size=16).digest()
+
+    def _get_context(self, instrument: dict) -> signing.InstrumentContext:
+        """
+        Returns the prepared signing context for an instrument.
+        """
+        if isinstance(instrument, signing.PreparedInstrument):
+            return instrument.context
+
+        # Instruments are keyed by content, since each request sends (or
+        # resolves to) its own copy of the instrument.
+        key = dumps(instrument, sort_keys=True)
+
+        context = self._contexts.get(key)
+
+        if context is None:
+            context = signing.prepare_instrument(instrument)
+            self._contexts.set(key, context)
+
+        return context
+
+    def _get_key(self, signer: str) -> keys.PrivateKey:
+        """
+        Returns the key object for a signer, which is either the alias or
+        address of a key in the keystore, or a hex-encoded private key.
+        """
+        key = self.keystore.get(signer) if self.keystore else None
+
+        if key is None:
+            key = self._keys.get(signer)
+
+            if key is None:
+                if not is_private_key(signer):
+                    raise UnknownSigner(
+                        'Signer is neither the alias or address of a key in '
+                        'the keystore, nor a 0x-prefixed hex-encoded private '
+                        'key.',
+                    )
+
+                key = parse_private_key(signer)
+                self._keys.set(signer, key)
+
+        return key
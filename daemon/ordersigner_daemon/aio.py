@@ -0,0 +1,196 @@
+"""
+Standalone server built on asyncio (optionally with uvloop), as a lighter
+alternative to the ``twistd`` plugin.
+
+Requests are processed by the same code as
+:py:class:`ordersigner_daemon.protocol.SigningProtocol`; this module only
+adapts it to asyncio's transports and event loop.
+"""
+import asyncio
+import typing
+from concurrent.futures import Executor
+from functools import partial
+
+from twisted.internet import protocol
+from twisted.python import failure
+
+from ordersigner_daemon.keystore import Keystore
+from ordersigner_daemon.protocol import SigningProtocol, \
+    SigningProtocolFactory
+
+__all__ = [
+    'AsyncioClock',
+    'AsyncioSigningProtocol',
+    'SigningServer',
+]
+
+
+class AsyncioClock:
+    """
+    Stands in for the Twisted reactor wherever the daemon schedules calls
+    (e.g., :py:class:`ordersigner_daemon.scheduler.SigningScheduler` and
+    :py:class:`ordersigner_daemon.pool.SigningPool`), so that those calls run
+    on an asyncio event loop instead.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+
+    def seconds(self) -> float:
+        return self.loop.time()
+
+    def callLater(
+            self,
+            delay: float,
+            fn: typing.Callable,
+            *args,
+            **kwargs
+    ) -> 'AsyncioDelayedCall':
+        return AsyncioDelayedCall(
+            self.loop,
+            delay,
+            partial(fn, *args, **kwargs),
+        )
+
+    def callFromThread(self, fn: typing.Callable, *args, **kwargs) -> None:
+        self.loop.call_soon_threadsafe(partial(fn, *args, **kwargs))
+
+
+class AsyncioDelayedCall:
+    """
+    Call scheduled by :py:meth:`AsyncioClock.callLater` (equivalent to
+    :py:class:`twisted.internet.base.DelayedCall`).
+    """
+
+    def __init__(
+            self,
+            loop: asyncio.AbstractEventLoop,
+            delay: float,
+            fn: typing.Callable[[], typing.Any],
+    ) -> None:
+        self.called = False
+        self._handle = loop.call_later(delay, self._run, fn)
+
+    def active(self) -> bool:
+        return not (self.called or self._handle.cancelled())
+
+    def cancel(self) -> None:
+        self._handle.cancel()
+
+    def _run(self, fn: typing.Callable[[], typing.Any]) -> None:
+        self.called = True
+        fn()
+
+
+class AsyncioTransport:
+    """
+    Wraps an asyncio transport, so that the signing protocol can use it like
+    a Twisted transport.
+    """
+
+    def __init__(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+
+    @property
+    def disconnecting(self) -> bool:
+        return self.transport.is_closing()
+
+    def write(self, data: bytes) -> None:
+        # Responses for requests that were still being signed when the client
+        # disconnected have nowhere to go.
+        if not self.transport.is_closing():
+            self.transport.write(data)
+
+    def writeSequence(self, data: typing.Iterable[bytes]) -> None:
+        if not self.transport.is_closing():
+            self.transport.writelines(data)
+
+    def loseConnection(self) -> None:
+        self.transport.close()
+
+
+class AsyncioSigningProtocol(SigningProtocol, asyncio.Protocol):
+    """
+    Processes requests from a single client connection, which asyncio
+    delivers to the ``snake_case`` methods.
+    """
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.makeConnection(AsyncioTransport(transport))
+
+    def data_received(self, data: bytes) -> None:
+        self.dataReceived(data)
+
+    def connection_lost(self, exc: typing.Optional[Exception]) -> None:
+        self.connectionLost(
+            protocol.connectionDone
+            if exc is None
+            else failure.Failure(exc),
+        )
+
+
+class SigningServer(SigningProtocolFactory):
+    """
+    State that is shared by every client connection (equivalent to the
+    factory that the ``twistd`` plugin uses).
+
+    Instances can be passed to ``loop.create_server`` as the protocol
+    factory.
+    """
+    protocol = AsyncioSigningProtocol
+
+    def __init__(
+            self,
+            workers: int = 0,
+            keystore: typing.Optional[Keystore] = None,
+            result_cache_size: int = 0,
+            result_cache_ttl: float = 60.0,
+            max_queued: int = 0,
+            executor: typing.Optional[Executor] = None,
+            loop: typing.Optional[asyncio.AbstractEventLoop] = None,
+    ) -> None:
+        """
+        :param workers: Number of worker processes to sign orders in.  If 0,
+        orders are signed on the event loop thread.
+
+        :param keystore: Private keys that requests can refer to by alias or
+        address.
+
+        :param result_cache_size: Max number of signatures to cache (0 =
+        disabled).
+
+        :param result_cache_ttl: Number of seconds to cache each signature
+        for.
+
+        :param max_queued: Max number of requests that can wait to be signed;
+        once reached, new requests are rejected with an ``Overloaded`` error
+        (0 = no limit).
+
+        :param executor: Allows injecting a different executor (e.g., for
+        unit tests).
+
+        :param loop: The event loop that the server will run on.  Defaults
+        to the running event loop, so the server must be created in a
+        coroutine unless ``loop`` is specified.
+        """
+        super().__init__(
+            workers=workers,
+            keystore=keystore,
+            result_cache_size=result_cache_size,
+            result_cache_ttl=result_cache_ttl,
+            max_queued=max_queued,
+            use_reactor=AsyncioClock(loop or asyncio.get_running_loop()),
+            executor=executor,
+        )
+
+    def __call__(self) -> AsyncioSigningProtocol:
+        """
+        Creates a protocol instance for a new client connection.
+        """
+        return self.buildProtocol(None)
+
+    def shutdown(self) -> None:
+        """
+        Stops the worker processes.
+        """
+        self.stopFactory()
@@ -0,0 +1,177 @@
+"""
+Runs the daemon as a standalone asyncio server (installed as the
+``ordersigner-daemon`` console script).
+
+This is a lighter alternative to ``twistd leverj-ordersigner``; it speaks the
+same protocol, but doesn't daemonise itself (use a process supervisor).
+"""
+import asyncio
+import signal
+import typing
+from argparse import ArgumentParser
+
+from ordersigner_daemon.aio import SigningServer
+from ordersigner_daemon.keystore import Keystore
+
+__all__ = [
+    'main',
+]
+
+DEFAULT_INTERFACE = 'unix:/tmp/leverj-ordersigner-daemon.sock'
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> None:
+    parser = ArgumentParser(
+        description='Daemon for signing Leverj transactions via '
+                    'leverj-ordersigner-client.',
+    )
+
+    parser.add_argument(
+        '-i', '--interface',
+        default=DEFAULT_INTERFACE,
+        help='Interface to listen for client connections, e.g. '
+             '"unix:/path/to/socket" or "tcp:12345:interface=127.0.0.1" '
+             '(default: %(default)s).',
+    )
+
+    parser.add_argument(
+        '-w', '--workers',
+        default=0,
+        type=int,
+        help='Number of worker processes to sign orders in '
+             '(0 = sign on the event loop thread).',
+    )
+
+    parser.add_argument(
+        '-k', '--keystore',
+        help='JSON file or directory of private keys that requests can '
+             'refer to by alias or address.',
+    )
+
+    parser.add_argument(
+        '--result-cache-size',
+        default=0,
+        type=int,
+        help='Max number of signatures to cache, so that repeated requests '
+             'for the same order are not signed again (0 = disabled).',
+    )
+
+    parser.add_argument(
+        '--result-cache-ttl',
+        default=60.0,
+        type=float,
+        help='Number of seconds to cache each signature for.',
+    )
+
+    parser.add_argument(
+        '--max-queued',
+        default=0,
+        type=int,
+        help='Max number of requests that can wait to be signed; once '
+             'reached, new requests are rejected with an "Overloaded" error '
+             '(0 = no limit).',
+    )
+
+    parser.add_argument(
+        '--uvloop',
+        action='store_true',
+        help='Use uvloop instead of the default asyncio event loop '
+             '(requires the "uvloop" extra).',
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.uvloop:
+        import uvloop
+        uvloop.install()
+
+    # The server schedules calls on the loop (e.g., to deliver results from
+    # worker processes), so the loop has to exist first.
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    server = SigningServer(
+        workers=args.workers,
+
+        keystore=(
+            Keystore.load(args.keystore)
+            if args.keystore
+            else None
+        ),
+
+        result_cache_size=args.result_cache_size,
+        result_cache_ttl=args.result_cache_ttl,
+        max_queued=args.max_queued,
+        loop=loop,
+    )
+
+    try:
+        loop.run_until_complete(serve(server, args.interface))
+    finally:
+        server.shutdown()
+        loop.close()
+
+
+async def serve(server: SigningServer, interface: str) -> None:
+    """
+    Listens for client connections until the process receives SIGINT or
+    SIGTERM.
+    """
+    loop = asyncio.get_running_loop()
+    scheme, args = _parse_interface(interface)
+
+    if scheme == 'unix':
+        listener = await loop.create_unix_server(
+            server,
+            args.get('address') or args[0],
+        )
+    elif scheme == 'tcp':
+        listener = await loop.create_server(
+            server,
+            args.get('interface'),
+            int(args.get('port') or args[0]),
+        )
+    else:
+        raise ValueError(
+            'Unsupported interface {interface!r} '
+            '(must start with "unix:" or "tcp:").'.format(interface=interface),
+        )
+
+    stopped = loop.create_future()
+
+    def stop() -> None:
+        if not stopped.done():
+            stopped.set_result(None)
+
+    for signal_ in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_, stop)
+
+    print('Listening on {interface!r}'.format(interface=interface))
+
+    async with listener:
+        await stopped
+
+
+def _parse_interface(interface: str) -> typing.Tuple[str, dict]:
+    """
+    Splits an interface description (in the same format that Twisted's
+    ``serverFromString`` uses) into its scheme and arguments.
+
+    Positional arguments are stored by index, and keyword arguments by name.
+    """
+    scheme, _, rest = interface.partition(':')
+
+    args = {}
+    for i, arg in enumerate(rest.split(':')):
+        key, sep, value = arg.partition('=')
+
+        if sep:
+            args[key] = value
+        else:
+            args[i] = arg
+
+    return scheme, args
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Binary variant of the signing protocol, for clients that want to avoid the
+cost of JSON encoding and hex-encoded signatures.
+
+Each request and response is a msgpack-encoded map, prefixed with its length
+as a 32-bit big-endian unsigned int.  Requests have the same structure as in
+the JSON protocol, and signatures in responses are sent as raw (65-byte)
+binary strings instead of hex.
+
+Requires the ``binary`` extra (``pip install leverj-ordersigner-daemon[binary]``).
+"""
+import struct
+import typing
+
+import filters as f
+import msgpack
+from eth_utils import to_bytes
+from twisted.protocols import basic
+
+from ordersigner_daemon.protocol import BaseSigningProtocol, ParsedRequest
+from ordersigner_daemon.validation import MAX_REQUEST_LENGTH, \
+    OrderSignerPayload, parse_payload
+
+__all__ = [
+    'BinaryOrderSignerRequest',
+    'BinarySigningProtocol',
+    'MsgpackDecode',
+]
+
+
+class MsgpackDecode(f.BaseFilter):
+    """
+    Interprets the value as msgpack.
+    """
+    CODE_INVALID = 'not_msgpack'
+
+    templates = {
+        CODE_INVALID: 'This value is not valid msgpack.',
+    }
+
+    def _apply(self, value):
+        value = self._filter(value, f.Type(bytes))  # type: bytes
+
+        if self._has_errors:
+            return None
+
+        try:
+            return unpack(value)
+        except (ValueError, TypeError, msgpack.UnpackException):
+            return self._invalid_value(value, self.CODE_INVALID, exc_info=True)
+
+
+class BinaryOrderSignerRequest(f.BaseFilter):
+    """
+    Validates an incoming (msgpack-encoded) request for the OrderSigner.
+    """
+
+    def _apply(self, value: bytes) -> ParsedRequest:
+        return self._filter(
+            value,
+            f.Required | MsgpackDecode | OrderSignerPayload,
+        )
+
+
+def pack(value: typing.Any) -> bytes:
+    """
+    Encodes a value as msgpack.
+    """
+    # ``default`` takes care of any values in error contexts that msgpack
+    # doesn't know how to serialise.
+    return msgpack.packb(value, use_bin_type=True, default=str)
+
+
+def unpack(data: bytes) -> typing.Any:
+    """
+    Decodes a msgpack value.
+    """
+    return msgpack.unpackb(data, raw=False)
+
+
+# Cache an instance of the filter in the module, so that we don't have to
+# re-initialise it every time a new request is received.
+request_filter = BinaryOrderSignerRequest()
+
+
+class BinarySigningProtocol(BaseSigningProtocol, basic.Int32StringReceiver):
+    """
+    Processes requests sent as length-prefixed msgpack frames.
+    """
+
+    MAX_LENGTH = MAX_REQUEST_LENGTH
+
+    def stringReceived(self, data: bytes) -> None:
+        self._request_received(data)
+
+    def _parse_request(self, data: bytes) -> typing.Tuple[ParsedRequest, dict]:
+        try:
+            request = parse_payload(unpack(data))
+        except (ValueError, TypeError, msgpack.UnpackException):
+            request = None
+
+        if request is not None:
+            return request, {}
+
+        # Run the request through the full filter chain to find out what's
+        # wrong with it.
+        filter_runner = f.FilterRunner(request_filter, data)
+
+        if filter_runner.is_valid():
+            return filter_runner.cleaned_data, {}
+
+        return None, filter_runner.get_errors()
+
+    def _signing_succeeded(self, signature: str) -> dict:
+        result = super()._signing_succeeded(signature)
+        result['signature'] = to_bytes(hexstr=signature)
+        return result
+
+    def _encode_response(self, result: dict) -> typing.Sequence[bytes]:
+        frame = pack(result)
+        return struct.pack(self.structFormat, len(frame)), frame
+
+    def _find_request_id(self, data: bytes) -> typing.Union[int, str, None]:
+        try:
+            payload = unpack(data)
+        except (ValueError, TypeError, msgpack.UnpackException):
+            return None
+
+        if isinstance(payload, dict):
+            request_id = payload.get('id')
+
+            if type(request_id) in (int, str):
+                return request_id
+
+        return None
@@ -0,0 +1,102 @@
+import time
+import typing
+from collections import OrderedDict
+
+__all__ = [
+    'ExpiringLruCache',
+    'LruCache',
+]
+
+
+class LruCache:
+    """
+    Mapping with a maximum size, which evicts the least-recently-used entry
+    when it is full.
+
+    Keeps count of cache hits and misses in :py:meth:`get`.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: typing.MutableMapping[typing.Hashable, typing.Any] = \
+            OrderedDict()
+
+    def __contains__(self, key: typing.Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(
+            self,
+            key: typing.Hashable,
+            default: typing.Any = None,
+    ) -> typing.Any:
+        """
+        Returns the value for the key, marking it as recently used.
+        """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: typing.Hashable, value: typing.Any) -> None:
+        """
+        Stores a value, evicting the least-recently-used entry if the cache
+        is full.
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+class ExpiringLruCache(LruCache):
+    """
+    :py:class:`LruCache` where entries also expire after a fixed amount of
+    time.
+    """
+
+    def __init__(
+            self,
+            max_size: int,
+            ttl: float,
+            clock: typing.Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        :param ttl: Number of seconds after which entries expire.
+
+        :param clock: Allows injecting a different clock (e.g., for unit
+        tests).
+        """
+        super().__init__(max_size)
+
+        self.ttl = ttl
+        self.clock = clock
+
+    def get(
+            self,
+            key: typing.Hashable,
+            default: typing.Any = None,
+    ) -> typing.Any:
+        entry = self._entries.get(key)
+
+        # Expired entries are removed, so that they count as a miss.
+        if entry is not None and entry[1] <= self.clock():
+            del self._entries[key]
+
+        entry = super().get(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key: typing.Hashable, value: typing.Any) -> None:
+        super().set(key, (value, self.clock() + self.ttl))
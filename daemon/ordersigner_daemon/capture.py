@@ -0,0 +1,167 @@
+import os
+import random
+import time
+import typing
+from hashlib import blake2b
+
+from ujson import dumps, loads
+
+__all__ = [
+    'REDACTED_PREFIX',
+    'TrafficCapture',
+    'redact_signers',
+]
+
+# Signers in captured requests are replaced with this prefix, followed by a
+# digest of the signer (so that requests from the same signer can still be
+# told apart).
+REDACTED_PREFIX = 'redacted:'
+
+
+class TrafficCapture:
+    """
+    Appends incoming requests (with their arrival times) to a file, so that
+    the traffic can be replayed later (e.g., for load tests).
+
+    Each line in the file contains the arrival time (seconds since the
+    epoch), a tab character, and the request as it was received.
+
+    The file is rotated once it reaches ``max_bytes``, like
+    :py:class:`logging.handlers.RotatingFileHandler`: ``path`` is renamed to
+    ``path.1``, ``path.1`` to ``path.2``, and so on, up to ``backup_count``.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            max_bytes: int = 100 * 1024 * 1024,
+            backup_count: int = 5,
+            sample_rate: float = 1.0,
+            redact: bool = True,
+            clock: typing.Callable[[], float] = time.time,
+            random_: typing.Callable[[], float] = random.random,
+    ) -> None:
+        """
+        :param path: File to write captured requests to.
+
+        :param max_bytes: Size at which the file is rotated (0 = never).
+
+        :param backup_count: Number of rotated files to keep.
+
+        :param sample_rate: Fraction of requests to capture.
+
+        :param redact: Whether to replace signers in captured requests (see
+        :py:func:`redact_signers`).  Requests that can't be parsed are not
+        captured, as they can't be checked for private keys.
+
+        :param clock: Allows injecting a different clock (e.g., for unit
+        tests).
+
+        :param random_: Allows injecting a different random number generator
+        (e.g., for unit tests).
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.sample_rate = sample_rate
+        self.redact = redact
+        self.clock = clock
+        self.random = random_
+
+        self.captured = 0
+        self.skipped = 0
+
+        self._file: typing.Optional[typing.BinaryIO] = None
+        self._size = 0
+
+    def close(self) -> None:
+        """
+        Closes the capture file.
+        """
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def record(self, line: bytes) -> None:
+        """
+        Captures a request (subject to sampling).
+        """
+        if self.sample_rate < 1 and self.random() >= self.sample_rate:
+            return
+
+        timestamp = self.clock()
+
+        if self.redact:
+            try:
+                line = redact_signers(line)
+            except ValueError:
+                self.skipped += 1
+                return
+
+        self._write(b'%.6f\t%s\n' % (timestamp, line))
+        self.captured += 1
+
+    def _write(self, record: bytes) -> None:
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+            self._size = self._file.tell()
+
+        if self.max_bytes and self._size \
+                and self._size + len(record) > self.max_bytes:
+            self._rotate()
+
+        self._file.write(record)
+        self._size += len(record)
+
+    def _rotate(self) -> None:
+        self.close()
+
+        if self.backup_count:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = '{path}.{i}'.format(path=self.path, i=i)
+
+                if os.path.exists(source):
+                    os.replace(source, '{path}.{i}'.format(
+                        path=self.path,
+                        i=i + 1,
+                    ))
+
+            os.replace(self.path, '{path}.1'.format(path=self.path))
+        else:
+            os.remove(self.path)
+
+        self._file = open(self.path, 'ab')
+        self._size = 0
+
+
+def redact_signers(line: bytes) -> bytes:
+    """
+    Replaces the signer in a request (and in each order in a batch request)
+    with a digest, so that private keys aren't written to disk.
+
+    :raise ValueError: if the request can't be parsed.
+    """
+    payload = loads(line)
+
+    if not isinstance(payload, dict):
+        raise ValueError('Request is not a JSON object.')
+
+    _redact(payload)
+
+    orders = payload.get('orders')
+    if isinstance(orders, list):
+        for order in orders:
+            if isinstance(order, dict):
+                _redact(order)
+
+    return dumps(payload).encode('utf-8')
+
+
+def _redact(payload: dict) -> None:
+    signer = payload.get('signer')
+
+    if isinstance(signer, str):
+        payload['signer'] = REDACTED_PREFIX + blake2b(
+            signer.encode('utf-8'),
+            digest_size=8,
+        ).hexdigest()
@@ -0,0 +1,91 @@
+"""
+Support for signing orders inside the application's own process (see
+``leverj_ordersigner_client.embedded``), using the same code that the daemon
+uses to process requests.
+"""
+import typing
+
+import filters as f
+
+from ordersigner_daemon import OrderSigner
+from ordersigner_daemon.instruments import InstrumentRegistry
+from ordersigner_daemon.metrics import Metrics
+from ordersigner_daemon.pool import SigningPool
+from ordersigner_daemon.protocol import BaseSigningProtocol, ParsedRequest
+from ordersigner_daemon.scheduler import SigningScheduler
+from ordersigner_daemon.validation import OrderSignerPayload, parse_payload
+
+__all__ = [
+    'EmbeddedSigningProtocol',
+]
+
+# Cache an instance of the filter in the module, so that we don't have to
+# re-initialise it every time a new request is received.
+payload_filter = OrderSignerPayload()
+
+
+class EmbeddedSigningProtocol(BaseSigningProtocol):
+    """
+    Processes requests that are passed in as decoded payloads, instead of
+    being read from a socket.
+
+    Responses are written to the transport as dicts (via ``writeSequence``),
+    without being encoded.
+    """
+
+    def __init__(
+            self,
+            order_signer: OrderSigner,
+            pool: typing.Optional[SigningPool] = None,
+            instruments: typing.Optional[InstrumentRegistry] = None,
+            metrics: typing.Optional[Metrics] = None,
+            scheduler: typing.Optional[SigningScheduler] = None,
+    ) -> None:
+        super().__init__(order_signer, pool, instruments, metrics, scheduler)
+
+        # Errors are passed back to the application, which can decide for
+        # itself whether to log them.
+        self.print_exceptions = False
+
+    def requestReceived(self, payload: dict) -> None:
+        """
+        Processes a single request.
+        """
+        self._receiving = True
+
+        try:
+            self._request_received(payload)
+        finally:
+            self._receiving = False
+            self.flush()
+
+    def _parse_request(
+            self,
+            payload: dict,
+    ) -> typing.Tuple[ParsedRequest, dict]:
+        request = parse_payload(payload)
+
+        if request is not None:
+            return request, {}
+
+        filter_runner = f.FilterRunner(payload_filter, payload)
+
+        if filter_runner.is_valid():
+            return filter_runner.cleaned_data, {}
+
+        return None, filter_runner.get_errors()
+
+    def _encode_response(self, result: dict) -> typing.Sequence[dict]:
+        return result,
+
+    def _find_request_id(
+            self,
+            payload: dict,
+    ) -> typing.Union[int, str, None]:
+        if isinstance(payload, dict):
+            request_id = payload.get('id')
+
+            if type(request_id) in (int, str):
+                return request_id
+
+        return None
@@ -0,0 +1,107 @@
+import typing
+
+from ordersigner_daemon import Order
+from ordersigner_daemon.signing import PreparedInstrument
+
+__all__ = [
+    'InstrumentRegistry',
+    'TooManyInstruments',
+    'UnknownInstrument',
+]
+
+
+class UnknownInstrument(ValueError):
+    """
+    Indicates that an order refers to an instrument by symbol, but no
+    instrument with that symbol has been registered.
+    """
+
+    def __init__(self, symbol: str) -> None:
+        super().__init__(
+            'Instrument {symbol!r} has not been registered.'.format(
+                symbol=symbol,
+            ),
+        )
+
+        self.context = {'symbol': symbol}
+
+
+class TooManyInstruments(ValueError):
+    """
+    Indicates that a client tried to register a new instrument, but the
+    registry is full.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        super().__init__(
+            'Cannot register more than {max_size} instruments.'.format(
+                max_size=max_size,
+            ),
+        )
+
+        self.context = {'max_size': max_size}
+
+
+class InstrumentRegistry:
+    """
+    Keeps track of instruments that clients have registered, so that orders
+    can refer to them by symbol instead of sending the full instrument every
+    time.
+
+    Instruments are prepared for signing when they are registered (see
+    :py:class:`PreparedInstrument`), so that orders that refer to them don't
+    have to pay that cost again.
+    """
+
+    def __init__(self, max_size: int = 10000) -> None:
+        """
+        :param max_size: Max number of instruments that can be registered, so
+        that clients can't use up the daemon's memory.
+        """
+        self.max_size = max_size
+
+        self._instruments: typing.Dict[str, dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._instruments)
+
+    def register(self, instrument: dict) -> None:
+        """
+        Adds an instrument to the registry, replacing any instrument that was
+        previously registered with the same symbol.
+
+        :raise TooManyInstruments: if the registry is full.
+        """
+        symbol = instrument['symbol']
+
+        if (
+                symbol not in self._instruments
+                and len(self._instruments) >= self.max_size
+        ):
+            raise TooManyInstruments(self.max_size)
+
+        try:
+            instrument = PreparedInstrument(instrument)
+        except Exception:
+            # Keep the instrument as it is; orders that use it will fail with
+            # the same error as if they had sent the instrument inline.
+            pass
+
+        self._instruments[symbol] = instrument
+
+    def resolve(self, order: Order) -> Order:
+        """
+        If the order refers to an instrument by symbol, returns a copy of the
+        order with the registered instrument filled in.
+
+        :raise UnknownInstrument: if the symbol has not been registered.
+        """
+        if not isinstance(order.instrument, str):
+            return order
+
+        try:
+            instrument = self._instruments[order.instrument]
+        except KeyError:
+            raise UnknownInstrument(order.instrument) from None
+
+        return order._replace(instrument=instrument)
@@ -0,0 +1,112 @@
+import os
+import re
+import typing
+
+from eth_keys import keys
+from eth_keys.exceptions import ValidationError
+from eth_utils import decode_hex, is_hex_address
+from ujson import loads
+
+__all__ = [
+    'Keystore',
+    'UnknownSigner',
+    'is_private_key',
+    'parse_private_key',
+]
+
+_PRIVATE_KEY = re.compile(r'0x[0-9a-fA-F]{64}')
+
+
+class UnknownSigner(ValueError):
+    """
+    Indicates that a request's signer is neither a key in the keystore nor a
+    private key.
+
+    The error deliberately doesn't include the signer, in case it is a
+    mistyped private key.
+    """
+
+
+def is_private_key(value: str) -> bool:
+    """
+    Returns whether a value looks like a hex-encoded private key (as opposed
+    to a keystore alias or address).
+    """
+    return _PRIVATE_KEY.fullmatch(value) is not None
+
+
+def parse_private_key(private_key: str) -> keys.PrivateKey:
+    """
+    Converts a hex-encoded private key into a key object.
+
+    This is relatively expensive, as it also derives the public key, so the
+    result should be reused wherever possible.
+    """
+    key_bytes = decode_hex(private_key)
+
+    try:
+        return keys.PrivateKey(key_bytes)
+    except ValidationError as e:
+        raise ValueError(
+            'The private key must be exactly 32 bytes long, '
+            'instead of {length} bytes.'.format(length=len(key_bytes)),
+        ) from e
+
+
+class Keystore:
+    """
+    Private keys that are loaded when the daemon starts, so that requests
+    can refer to them by alias or address instead of sending the private key.
+    """
+
+    def __init__(self, private_keys: typing.Mapping[str, str]) -> None:
+        """
+        :param private_keys: Hex-encoded private keys, keyed by alias.
+        """
+        self._keys: typing.Dict[str, keys.PrivateKey] = {}
+
+        for alias, private_key in private_keys.items():
+            key = parse_private_key(private_key)
+
+            self._keys[alias] = key
+            self._keys[key.public_key.to_address()] = key
+
+    @classmethod
+    def load(cls, path: str) -> 'Keystore':
+        """
+        Loads private keys from the filesystem.
+
+        :param path: Either a JSON file containing a mapping of aliases to
+        hex-encoded private keys, or a directory of files that each contain a
+        hex-encoded private key (the filename without extension is used as
+        the alias).
+        """
+        if os.path.isdir(path):
+            private_keys = {}
+
+            for filename in sorted(os.listdir(path)):
+                # Skip hidden files (e.g., ``.DS_Store``).
+                if filename.startswith('.'):
+                    continue
+
+                alias, _ = os.path.splitext(filename)
+
+                with open(os.path.join(path, filename), 'r') as f:
+                    private_keys[alias] = f.read().strip()
+        else:
+            with open(path, 'r') as f:
+                private_keys = loads(f.read())
+
+        return cls(private_keys)
+
+    def get(self, name: str) -> typing.Optional[keys.PrivateKey]:
+        """
+        Returns the private key with the specified alias or address, or
+        ``None`` if there is no such key.
+        """
+        if is_hex_address(name):
+            # Addresses are stored in lowercase, so that lookups work
+            # regardless of whether the address is checksummed.
+            name = name.lower()
+
+        return self._keys.get(name)
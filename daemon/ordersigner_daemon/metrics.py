@@ -0,0 +1,309 @@
+"""
+Counters and latency histograms for monitoring the daemon, and a web
+resource that exposes them in Prometheus text format.
+"""
+import typing
+
+from twisted.web import resource, server
+
+from ordersigner_daemon.cache import LruCache
+
+__all__ = [
+    'Histogram',
+    'Metrics',
+    'MetricsResource',
+]
+
+
+class Histogram:
+    """
+    Records the distribution of durations (in seconds), in the style of an
+    HDR histogram.
+
+    Values are counted in buckets whose width grows with the magnitude of the
+    value, so that every value is recorded with the same relative precision
+    (about 1%) using a small, fixed amount of memory.
+    """
+    # Values are recorded with nanosecond resolution.
+    UNITS_PER_SECOND = 1_000_000_000
+
+    # Each power of two is split into ``2 ** SUB_BUCKET_BITS / 2``
+    # sub-buckets.
+    SUB_BUCKET_BITS = 7
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0
+
+        self._counts: typing.Dict[int, int] = {}
+
+    def record(self, seconds: float) -> None:
+        """
+        Records a single duration.
+        """
+        value = max(int(seconds * self.UNITS_PER_SECOND), 0)
+        index = self._index(value)
+
+        self._counts[index] = self._counts.get(index, 0) + 1
+        self.count += 1
+        self.sum += seconds
+
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float:
+        """
+        Returns the duration (in seconds) that ``q`` percent of recorded
+        values are less than or equal to.
+        """
+        if not self.count:
+            return 0.0
+
+        target = max(self.count * q / 100, 1)
+        seen = 0
+
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+
+            if seen >= target:
+                return min(self._upper_bound(index), self.max) \
+                    / self.UNITS_PER_SECOND
+
+        return self.max / self.UNITS_PER_SECOND
+
+    def _index(self, value: int) -> int:
+        """
+        Returns the index of the bucket that a value is counted in.
+        """
+        shift = value.bit_length() - self.SUB_BUCKET_BITS
+
+        if shift <= 0:
+            return value
+
+        # The value has ``SUB_BUCKET_BITS`` significant bits, so the top
+        # half of the sub-buckets are used for each shift.
+        return (shift << (self.SUB_BUCKET_BITS - 1)) + (value >> shift)
+
+    def _upper_bound(self, index: int) -> int:
+        """
+        Returns the largest value that is counted in a bucket.
+        """
+        shift = (index >> (self.SUB_BUCKET_BITS - 1)) - 1
+
+        if shift <= 0:
+            return index
+
+        sub_bucket = index - (shift << (self.SUB_BUCKET_BITS - 1))
+        return ((sub_bucket + 1) << shift) - 1
+
+
+class Metrics:
+    """
+    Metrics shared by every client connection.
+    """
+    QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+    def __init__(self) -> None:
+        # Counters.
+        self.requests = 0
+        self.validation_errors = 0
+        self.signatures = 0
+        self.signing_errors = 0
+        self.expired = 0
+        self.rejected = 0
+
+        # Gauges.
+        self.connections = 0
+        self.in_flight = 0
+        self.queued = 0
+
+        # Time spent in each stage of processing a request.
+        self.decode = Histogram()
+        self.queue: typing.Dict[str, Histogram] = {
+            'high': Histogram(),
+            'normal': Histogram(),
+            'low': Histogram(),
+        }
+        self.sign: typing.Dict[str, Histogram] = {
+            'batch': Histogram(),
+            'futures': Histogram(),
+            'spot': Histogram(),
+        }
+        self.encode = Histogram()
+        self.write = Histogram()
+
+        # Caches to report hits and misses for, keyed by name.
+        self.caches: typing.Dict[str, LruCache] = {}
+
+    def render(self) -> str:
+        """
+        Returns all metrics in Prometheus text format.
+        """
+        lines = []
+
+        for name, help_, type_, value in (
+            ('requests_total', 'Requests received.', 'counter',
+             self.requests),
+            ('validation_errors_total', 'Requests that failed validation.',
+             'counter', self.validation_errors),
+            ('signatures_total', 'Orders signed successfully.', 'counter',
+             self.signatures),
+            ('signing_errors_total', 'Orders that could not be signed.',
+             'counter', self.signing_errors),
+            ('requests_expired_total',
+             'Requests dropped because they expired before being signed.',
+             'counter', self.expired),
+            ('requests_rejected_total',
+             'Requests rejected because too many were waiting to be signed.',
+             'counter', self.rejected),
+            ('connections', 'Open client connections.', 'gauge',
+             self.connections),
+            ('requests_in_flight', 'Requests waiting for a response.',
+             'gauge', self.in_flight),
+            ('requests_queued', 'Requests waiting for a turn to be signed.',
+             'gauge', self.queued),
+        ):
+            self._header(lines, name, help_, type_)
+            lines.append('ordersigner_{name} {value}'.format(
+                name=name,
+                value=value,
+            ))
+
+        self._summary(
+            lines,
+            'decode_seconds',
+            'Time spent decoding and validating requests.',
+            {'': self.decode},
+        )
+
+        self._summary(
+            lines,
+            'queue_seconds',
+            'Time spent waiting for a turn to be signed, by priority.',
+            {
+                'priority="{priority}"'.format(priority=priority): histogram
+                for priority, histogram in self.queue.items()
+            },
+        )
+
+        self._summary(
+            lines,
+            'sign_seconds',
+            'Time spent signing orders (including waiting for a turn).',
+            {
+                'type="{type}"'.format(type=type_): histogram
+                for type_, histogram in sorted(self.sign.items())
+            },
+        )
+
+        self._summary(
+            lines,
+            'encode_seconds',
+            'Time spent encoding responses.',
+            {'': self.encode},
+        )
+
+        self._summary(
+            lines,
+            'write_seconds',
+            'Time spent writing buffered responses to the transport.',
+            {'': self.write},
+        )
+
+        for name, help_, attr in (
+            ('cache_hits_total', 'Cache lookups that found an entry.',
+             'hits'),
+            ('cache_misses_total', 'Cache lookups that found no entry.',
+             'misses'),
+        ):
+            self._header(lines, name, help_, 'counter')
+
+            for cache_name, cache in sorted(self.caches.items()):
+                lines.append(
+                    'ordersigner_{name}{{cache="{cache}"}} {value}'.format(
+                        name=name,
+                        cache=cache_name,
+                        value=getattr(cache, attr),
+                    ),
+                )
+
+        lines.append('')
+        return '\n'.join(lines)
+
+    @staticmethod
+    def _header(
+            lines: typing.List[str],
+            name: str,
+            help_: str,
+            type_: str,
+    ) -> None:
+        lines.append('# HELP ordersigner_{name} {help}'.format(
+            name=name,
+            help=help_,
+        ))
+
+        lines.append('# TYPE ordersigner_{name} {type}'.format(
+            name=name,
+            type=type_,
+        ))
+
+    def _summary(
+            self,
+            lines: typing.List[str],
+            name: str,
+            help_: str,
+            histograms: typing.Dict[str, Histogram],
+    ) -> None:
+        """
+        Renders histograms as a Prometheus summary, with one series for each
+        set of labels.
+        """
+        self._header(lines, name, help_, 'summary')
+
+        for labels, histogram in histograms.items():
+            prefix = labels + ',' if labels else ''
+
+            for q in self.QUANTILES:
+                lines.append(
+                    'ordersigner_{name}{{{prefix}quantile="{q}"}} {value!r}'
+                    .format(
+                        name=name,
+                        prefix=prefix,
+                        q=q,
+                        value=histogram.percentile(q * 100),
+                    ),
+                )
+
+            suffix = '{{{labels}}}'.format(labels=labels) if labels else ''
+
+            lines.append('ordersigner_{name}_sum{suffix} {value!r}'.format(
+                name=name,
+                suffix=suffix,
+                value=histogram.sum,
+            ))
+
+            lines.append('ordersigner_{name}_count{suffix} {value}'.format(
+                name=name,
+                suffix=suffix,
+                value=histogram.count,
+            ))
+
+
+class MetricsResource(resource.Resource):
+    """
+    Serves metrics in Prometheus text format.
+    """
+    isLeaf = True
+
+    def __init__(self, metrics: Metrics) -> None:
+        super().__init__()
+        self.metrics = metrics
+
+    def render_GET(self, request: server.Request) -> bytes:
+        request.setHeader(
+            b'Content-Type',
+            b'text/plain; version=0.0.4; charset=utf-8',
+        )
+
+        return self.metrics.render().encode('utf-8')
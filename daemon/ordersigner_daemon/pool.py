@@ -0,0 +1,165 @@
+import typing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, \
+    ThreadPoolExecutor
+from itertools import chain
+from math import ceil
+
+from twisted.internet import base, defer
+
+from ordersigner_daemon import Order, OrderSigner, worker
+from ordersigner_daemon.keystore import Keystore
+
+__all__ = [
+    'SigningPool',
+    'ThreadSigningPool',
+]
+
+
+class SigningPool:
+    """
+    Distributes signing work across a pool of worker processes, so that the
+    daemon is not limited to a single core.
+
+    Results are delivered back to the reactor thread as
+    :py:class:`defer.Deferred` instances.
+    """
+
+    def __init__(
+            self,
+            workers: int,
+            order_signer_type: typing.Type[OrderSigner] = OrderSigner,
+            keystore: typing.Optional[Keystore] = None,
+            use_reactor: typing.Optional[base.ReactorBase] = None,
+            executor: typing.Optional[Executor] = None,
+    ) -> None:
+        """
+        :param workers: Number of worker processes to start.
+
+        :param order_signer_type: The ``OrderSigner`` class that each worker
+        process will use to sign orders.
+
+        :param keystore: Private keys that each worker process will load.
+
+        :param use_reactor: The reactor that results will be delivered to
+        (defaults to the global reactor).
+
+        :param executor: Allows injecting a different executor (e.g., for
+        unit tests).
+        """
+        if use_reactor is None:
+            # Imported here, as importing the reactor installs it.
+            from twisted.internet import reactor as use_reactor
+
+        self.reactor = use_reactor
+        self.workers = workers
+
+        self.executor = executor or ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=worker.initialize,
+            initargs=(order_signer_type, keystore),
+        )
+
+    def sign(self, order: Order) -> defer.Deferred:
+        """
+        Sends an order to one of the worker processes to be signed.
+
+        :return: A deferred that will resolve with the signature.
+        """
+        return self._submit(worker.sign, order)
+
+    def sign_many(self, orders: typing.List[Order]) -> defer.Deferred:
+        """
+        Splits a batch of orders into chunks, one for each worker process.
+
+        :return: A deferred that will resolve with the results of
+        :py:meth:`OrderSigner.sign_many` for the whole batch.
+        """
+        chunk_size = ceil(len(orders) / self.workers)
+
+        d = defer.gatherResults(
+            [
+                self._submit(worker.sign_many, orders[i:i + chunk_size])
+                for i in range(0, len(orders), chunk_size)
+            ],
+
+            consumeErrors=True,
+        )
+
+        d.addCallbacks(
+            lambda chunks: list(chain.from_iterable(chunks)),
+
+            # Unwrap the ``FirstError`` so that callers see the exception that
+            # actually occurred.
+            lambda failure_: failure_.value.subFailure,
+        )
+
+        return d
+
+    def shutdown(self) -> None:
+        """
+        Stops the worker processes.
+        """
+        self.executor.shutdown(wait=False)
+
+    def _submit(self, fn: typing.Callable, *args) -> defer.Deferred:
+        """
+        Runs a function in one of the worker processes.
+        """
+        d = defer.Deferred()
+
+        future = self.executor.submit(fn, *args)
+
+        # Done callbacks are invoked from the executor's management thread, so
+        # we have to hop back onto the reactor thread before firing the
+        # deferred.
+        future.add_done_callback(
+            lambda f: self.reactor.callFromThread(self._resolve, d, f),
+        )
+
+        return d
+
+    @staticmethod
+    def _resolve(d: defer.Deferred, future: Future) -> None:
+        """
+        Transfers the result of a worker future to its deferred.
+        """
+        try:
+            result = future.result()
+        except Exception as e:
+            d.errback(e)
+        else:
+            d.callback(result)
+
+
+class ThreadSigningPool(SigningPool):
+    """
+    Signs orders in a background thread instead of worker processes.
+
+    This doesn't sign orders any faster than the reactor thread could (the
+    GIL still applies), but it keeps the reactor free to do other work in
+    the meantime, without the overhead of sending orders to other processes.
+    """
+
+    def __init__(
+            self,
+            order_signer_type: typing.Type[OrderSigner] = OrderSigner,
+            keystore: typing.Optional[Keystore] = None,
+            use_reactor: typing.Optional[base.ReactorBase] = None,
+            executor: typing.Optional[Executor] = None,
+    ) -> None:
+        super().__init__(
+            workers=1,
+            use_reactor=use_reactor,
+            executor=executor or ThreadPoolExecutor(max_workers=1),
+        )
+
+        # Like a worker process, the thread gets its own order signer, so
+        # that its caches are never accessed from two threads at once.
+        self.order_signer = order_signer_type(keystore=keystore)
+
+    def sign(self, order: Order) -> defer.Deferred:
+        return self._submit(self.order_signer.sign, order)
+
+    def sign_many(self, orders: typing.List[Order]) -> defer.Deferred:
+        # There's only one thread, so there's no point splitting the batch.
+        return self._submit(self.order_signer.sign_many, orders)
@@ -1,14 +1,29 @@
-from traceback import print_exc
+import typing
+from collections import deque
+from concurrent.futures import Executor
+from copy import copy
+from time import perf_counter
 
 import filters as f
-from twisted.internet import address, protocol
+from twisted.internet import address, base, defer, protocol
 from twisted.protocols import basic
-from ujson import dumps
+from twisted.python import failure
+from ujson import dumps, loads
 
-from ordersigner_daemon import OrderSigner
-from ordersigner_daemon.validation import OrderSignerRequest
+from ordersigner_daemon import Batch, Order, OrderSigner, RegisterInstrument
+from ordersigner_daemon.capture import TrafficCapture
+from ordersigner_daemon.instruments import InstrumentRegistry, \
+    TooManyInstruments, UnknownInstrument
+from ordersigner_daemon.keystore import Keystore
+from ordersigner_daemon.metrics import Histogram, Metrics
+from ordersigner_daemon.pool import SigningPool, ThreadSigningPool
+from ordersigner_daemon.scheduler import DeadlineExceeded, Overloaded, \
+    SigningScheduler
+from ordersigner_daemon.validation import MAX_REQUEST_LENGTH, \
+    OrderSignerRequest, parse_request
 
 __all__ = [
+    'BaseSigningProtocol',
     'SigningProtocol',
     'SigningProtocolFactory',
 ]
@@ -18,51 +33,505 @@ __all__ = [
 request_filter = OrderSignerRequest()
 
 
-class SigningProtocol(basic.LineOnlyReceiver):
+# Parsed request, or ``None`` if the request is invalid.
+ParsedRequest = typing.Union[Order, Batch, RegisterInstrument, None]
+
+
+class BaseSigningProtocol(protocol.Protocol):
     """
-    Processes individual requests received by the server.
+    Processes individual requests received by the server, independently of
+    how requests and responses are framed and encoded.
+
+    Subclasses must mix in a protocol that splits incoming data into requests
+    (and call :py:meth:`_request_received` for each one), and implement the
+    methods that parse requests and encode responses.
     """
 
     MSG_VALIDATION_FAILED = 'Invalid input; see context for more info.'
 
-    def __init__(self, order_signer: OrderSigner) -> None:
+    # Responses are buffered, so that responses that are ready at the same
+    # time can be written to the transport in one go:
+    # - Once the buffer reaches ``flush_size`` bytes, it is flushed
+    #   immediately.
+    # - Responses that are ready while processing incoming data are flushed
+    #   once all of the data has been processed.
+    # - Otherwise (e.g., results from the worker pool), responses are flushed
+    #   after ``flush_delay`` seconds (0 = the next reactor iteration).
+    flush_size = 65536
+    flush_delay = 0.0
+
+    def __init__(
+            self,
+            order_signer: OrderSigner,
+            pool: typing.Optional[SigningPool] = None,
+            instruments: typing.Optional[InstrumentRegistry] = None,
+            metrics: typing.Optional[Metrics] = None,
+            scheduler: typing.Optional[SigningScheduler] = None,
+    ) -> None:
         self.order_signer = order_signer
+        self.pool = pool
+
+        self.instruments = (
+            InstrumentRegistry()
+            if instruments is None
+            else instruments
+        )
+
+        self.metrics = Metrics() if metrics is None else metrics
+
+        self.scheduler = (
+            SigningScheduler(metrics=self.metrics)
+            if scheduler is None
+            else scheduler
+        )
+
         self.print_exceptions = True
 
-    def lineReceived(self, line: bytes) -> None:
-        filter_runner = f.FilterRunner(request_filter, line)
+        # The reactor, for delaying flushes (defaults to the global reactor).
+        self.clock: typing.Optional[base.ReactorBase] = None
 
-        if filter_runner.is_valid():
-            try:
-                signature = self.order_signer.sign(filter_runner.cleaned_data)
-            except Exception as e:
-                if self.print_exceptions:
-                    print_exc()
-
-                result = {
-                    'ok': False,
-                    'error': {
-                        'type': type(e).__name__,
-                        'message': str(e),
-                        'context': getattr(e, 'context', {}),
-                    },
-                }
+        # Responses are held here until every request that arrived before
+        # them has been answered, so that the client always receives
+        # responses in the same order that it sent the requests.
+        self._responses: typing.Deque[list] = deque()
+
+        self._outbox: typing.List[bytes] = []
+        self._outbox_size = 0
+        self._flush_call: typing.Optional[base.DelayedCall] = None
+        self._receiving = False
+
+        # Results that arrive after the client disconnects (e.g., from the
+        # worker pool) are discarded.
+        self._disconnected = False
+
+    def connectionMade(self) -> None:
+        self.metrics.connections += 1
+        super().connectionMade()
+
+    def dataReceived(self, data: bytes) -> None:
+        self._receiving = True
+
+        # Queue every request in the chunk before signing any of them, so
+        # that the most urgent ones go first.
+        self.scheduler.hold()
+
+        try:
+            super().dataReceived(data)
+        finally:
+            self.scheduler.release()
+            self._receiving = False
+            self.flush()
+
+    def connectionLost(self, reason: failure.Failure = None) -> None:
+        if self._flush_call and self._flush_call.active():
+            self._flush_call.cancel()
+
+        self._flush_call = None
+        self._disconnected = True
+
+        self._outbox = []
+        self._outbox_size = 0
+
+        self.metrics.connections -= 1
+
+        super().connectionLost(reason)
+
+    def flush(self) -> None:
+        """
+        Writes all buffered responses to the transport.
+        """
+        if self._flush_call and self._flush_call.active():
+            self._flush_call.cancel()
+
+        self._flush_call = None
+
+        if self._outbox and not self._disconnected:
+            # Reset the buffer before writing, in case the transport sends
+            # more requests our way while it's writing (e.g., an embedded
+            # client that delivers results straight to the application).
+            outbox = self._outbox
+            self._outbox = []
+            self._outbox_size = 0
+
+            started = perf_counter()
+            self.transport.writeSequence(outbox)
+            self.metrics.write.record(perf_counter() - started)
+
+    def _request_received(self, data: bytes) -> None:
+        """
+        Processes a single request.
+        """
+        self.metrics.requests += 1
+        self.metrics.in_flight += 1
+
+        # Requests with a ``ttl_ms`` expire relative to when they arrived.
+        started = perf_counter()
+        request, errors = self._parse_request(data)
+        self.metrics.decode.record(perf_counter() - started)
+
+        if request is not None:
+            request_id = request.id
+
+            if isinstance(request, RegisterInstrument):
+                try:
+                    self.instruments.register(request.instrument)
+                except TooManyInstruments as e:
+                    d = defer.succeed(self._error_result(e))
+                else:
+                    d = defer.succeed({'ok': True})
+            elif isinstance(request, Batch):
+                d = self._sign_many(request, started)
+                d.addCallbacks(self._batch_signed, self._signing_failed)
             else:
-                result = {
-                    'ok': True,
-                    'signature': signature,
-                }
+                d = self._sign(request, started)
+                d.addCallbacks(self._signing_succeeded, self._signing_failed)
         else:
-            result = {
+            self.metrics.validation_errors += 1
+            request_id = self._find_request_id(data)
+
+            d = defer.succeed({
                 'ok': False,
                 'error': {
                     'type': ValueError.__name__,
                     'message': self.MSG_VALIDATION_FAILED,
-                    'context': filter_runner.get_errors(),
+                    'context': errors,
                 },
-            }
+            })
+
+        if request_id is None:
+            response = []
+            self._responses.append(response)
+            d.addCallback(self._respond, response)
+        else:
+            # The client can match the response to its request by ID, so
+            # there's no need to wait for earlier requests to finish.
+            d.addCallback(self._respond_by_id, request_id)
+
+    def _parse_request(self, data: bytes) -> typing.Tuple[ParsedRequest, dict]:
+        """
+        Parses and validates a request.
+
+        :return: The parsed request (or ``None`` if it is invalid), and the
+        validation errors.
+        """
+        raise NotImplementedError(
+            'Not implemented in {cls}.'.format(cls=type(self).__name__),
+        )
+
+    def _encode_response(self, result: dict) -> typing.Sequence[bytes]:
+        """
+        Converts a response into the chunks of bytes to send to the client.
+        """
+        raise NotImplementedError(
+            'Not implemented in {cls}.'.format(cls=type(self).__name__),
+        )
+
+    def _find_request_id(self, data: bytes) -> typing.Union[int, str, None]:
+        """
+        Attempts to extract the ID from a request that failed validation, so
+        that the client can still match the error response to its request.
+        """
+        raise NotImplementedError(
+            'Not implemented in {cls}.'.format(cls=type(self).__name__),
+        )
+
+    def _sign(
+            self,
+            order: Order,
+            received: typing.Optional[float] = None,
+    ) -> defer.Deferred:
+        """
+        Schedules the order to be signed, using the worker pool if one is
+        configured.
+
+        :param received: When the request arrived (according to
+        :py:func:`perf_counter`), for requests that have a ``ttl_ms``.
+        """
+        try:
+            order = self.instruments.resolve(order)
+        except UnknownInstrument as e:
+            return defer.fail(e)
+
+        deadline = self._deadline(order.ttl_ms, received)
+        histogram = self.metrics.sign.get(order.type)
+        started = perf_counter()
+
+        if self.pool:
+            # Check the cache before sending the order to a worker process.
+            signature = self.order_signer.get_cached_signature(order)
+
+            if signature is not None:
+                d = defer.succeed(signature)
+            else:
+                d = self.scheduler.submit(
+                    order.priority,
+                    self.pool.sign,
+                    order,
+                    deadline=deadline,
+                )
+
+                d.addCallback(self.order_signer.cache_signature, order)
+        else:
+            d = self.scheduler.submit(
+                order.priority,
+                self.order_signer.sign,
+                order,
+                deadline=deadline,
+            )
+
+        if histogram:
+            d.addBoth(self._record_time, histogram, started)
+
+        return d
+
+    def _sign_many(
+            self,
+            batch: Batch,
+            received: typing.Optional[float] = None,
+    ) -> defer.Deferred:
+        """
+        Schedules a batch of orders to be signed, using the worker pool if one
+        is configured.
+
+        :param received: See :py:meth:`_sign`.
+        """
+        try:
+            orders = [self.instruments.resolve(o) for o in batch.orders]
+        except UnknownInstrument as e:
+            return defer.fail(e)
+
+        deadline = self._deadline(batch.ttl_ms, received)
+        started = perf_counter()
+
+        if self.pool:
+            d = self._sign_many_in_pool(orders, batch.priority, deadline)
+        else:
+            d = self.scheduler.submit(
+                batch.priority,
+                self.order_signer.sign_many,
+                orders,
+                deadline=deadline,
+            )
+
+        d.addBoth(self._record_time, self.metrics.sign['batch'], started)
+        return d
+
+    def _sign_many_in_pool(
+            self,
+            orders: typing.List[Order],
+            priority: int,
+            deadline: typing.Optional[float],
+    ) -> defer.Deferred:
+        """
+        Schedules the orders in a batch that aren't in the result cache to be
+        signed by the worker pool, and caches their signatures.
+        """
+        results = [self.order_signer.get_cached_signature(o) for o in orders]
+        misses = [i for i, result in enumerate(results) if result is None]
+
+        if not misses:
+            return defer.succeed(results)
+
+        def merge(
+                signed: typing.List[typing.Union[str, Exception]],
+        ) -> typing.List[typing.Union[str, Exception]]:
+            for i, result in zip(misses, signed):
+                if not isinstance(result, Exception):
+                    self.order_signer.cache_signature(result, orders[i])
+
+                results[i] = result
+
+            return results
+
+        d = self.scheduler.submit(
+            priority,
+            self.pool.sign_many,
+            [orders[i] for i in misses],
+            deadline=deadline,
+        )
+
+        d.addCallback(merge)
+        return d
+
+    @staticmethod
+    def _deadline(
+            ttl_ms: typing.Optional[int],
+            received: typing.Optional[float],
+    ) -> typing.Optional[float]:
+        """
+        Returns the time by which a request must start signing, or ``None``
+        if it never expires.
+        """
+        if ttl_ms is None:
+            return None
+
+        if received is None:
+            received = perf_counter()
+
+        return received + ttl_ms / 1000
+
+    @staticmethod
+    def _record_time(
+            result: typing.Any,
+            histogram: Histogram,
+            started: float,
+    ) -> typing.Any:
+        """
+        Records the time since ``started``, passing the result through (so
+        that this method can be used as a callback).
+        """
+        histogram.record(perf_counter() - started)
+        return result
+
+    def _signing_succeeded(self, signature: str) -> dict:
+        self.metrics.signatures += 1
 
-        self.sendLine(dumps(result).encode('utf-8'))
+        return {
+            'ok': True,
+            'signature': signature,
+        }
+
+    def _signing_failed(self, failure_: failure.Failure) -> dict:
+        # Requests that the scheduler dropped to shed load are counted
+        # separately, and aren't worth a traceback (there could be a lot of
+        # them at once).
+        if not failure_.check(DeadlineExceeded, Overloaded):
+            self.metrics.signing_errors += 1
+
+            if self.print_exceptions:
+                failure_.printTraceback()
+
+        return self._error_result(failure_.value)
+
+    def _batch_signed(
+            self,
+            results: typing.List[typing.Union[str, Exception]],
+    ) -> dict:
+        return {
+            'ok': True,
+
+            'results': [
+                self._signing_failed(failure.Failure(result))
+                if isinstance(result, Exception)
+                else self._signing_succeeded(result)
+                for result in results
+            ],
+        }
+
+    @staticmethod
+    def _error_result(e: Exception) -> dict:
+        return {
+            'ok': False,
+            'error': {
+                'type': type(e).__name__,
+                'message': str(e),
+                'context': getattr(e, 'context', {}),
+            },
+        }
+
+    def _respond(self, result: dict, response: list) -> None:
+        """
+        Stores the result for a request, then sends every response that is
+        no longer waiting on an earlier request.
+        """
+        response.append(result)
+
+        while self._responses and self._responses[0]:
+            self._send_result(self._responses.popleft()[0])
+
+    def _respond_by_id(
+            self,
+            result: dict,
+            request_id: typing.Union[int, str],
+    ) -> None:
+        """
+        Sends the result for a request that has an ID, as soon as it is ready.
+        """
+        result['id'] = request_id
+        self._send_result(result)
+
+    def _send_result(self, result: dict) -> None:
+        """
+        Adds a response to the output buffer.
+        """
+        self.metrics.in_flight -= 1
+
+        if self._disconnected:
+            return
+
+        started = perf_counter()
+
+        for chunk in self._encode_response(result):
+            self._outbox.append(chunk)
+            self._outbox_size += len(chunk)
+
+        self.metrics.encode.record(perf_counter() - started)
+
+        if self._outbox_size >= self.flush_size:
+            self.flush()
+        elif not (self._receiving or self._flush_call):
+            self._flush_call = \
+                self._clock().callLater(self.flush_delay, self.flush)
+
+    def _clock(self) -> base.ReactorBase:
+        """
+        Returns the reactor to schedule calls with.
+        """
+        if self.clock is None:
+            # Only import the reactor when it's needed, as importing it
+            # installs it.
+            from twisted.internet import reactor
+            self.clock = reactor
+
+        return self.clock
+
+
+class SigningProtocol(BaseSigningProtocol, basic.LineOnlyReceiver):
+    """
+    Processes requests sent as newline-delimited JSON.
+    """
+    MAX_LENGTH = MAX_REQUEST_LENGTH
+
+    # If set, incoming requests are captured for replay.
+    capture: typing.Optional[TrafficCapture] = None
+
+    def lineReceived(self, line: bytes) -> None:
+        if self.capture:
+            self.capture.record(line)
+
+        self._request_received(line)
+
+    def _parse_request(self, line: bytes) -> typing.Tuple[ParsedRequest, dict]:
+        request = parse_request(line)
+
+        if request is not None:
+            return request, {}
+
+        # Either the request is invalid, or it's too complicated for the fast
+        # path; run it through the full filter chain to find out.
+        filter_runner = f.FilterRunner(request_filter, line)
+
+        if filter_runner.is_valid():
+            return filter_runner.cleaned_data, {}
+
+        return None, filter_runner.get_errors()
+
+    def _encode_response(self, result: dict) -> typing.Sequence[bytes]:
+        return dumps(result).encode('utf-8'), self.delimiter
+
+    def _find_request_id(self, line: bytes) -> typing.Union[int, str, None]:
+        try:
+            payload = loads(line)
+        except ValueError:
+            return None
+
+        if isinstance(payload, dict):
+            request_id = payload.get('id')
+
+            if type(request_id) in (int, str):
+                return request_id
+
+        return None
 
 
 class SigningProtocolFactory(protocol.Factory):
@@ -71,7 +540,166 @@ class SigningProtocolFactory(protocol.Factory):
     """
     protocol = SigningProtocol
 
-    def buildProtocol(self, addr: address.UNIXAddress) -> SigningProtocol:
-        p = self.protocol(OrderSigner())
+    def __init__(
+            self,
+            workers: int = 0,
+            keystore: typing.Optional[Keystore] = None,
+            flush_size: int = SigningProtocol.flush_size,
+            flush_delay: float = SigningProtocol.flush_delay,
+            result_cache_size: int = 0,
+            result_cache_ttl: float = 60.0,
+            capture: typing.Optional[TrafficCapture] = None,
+            threaded: bool = False,
+            priority_weights: typing.Optional[typing.Sequence[int]] = None,
+            max_queued: int = 0,
+            use_reactor: typing.Optional[base.ReactorBase] = None,
+            executor: typing.Optional[Executor] = None,
+    ) -> None:
+        """
+        :param workers: Number of worker processes to sign orders in.  If 0,
+        orders are signed on the reactor thread.
+
+        :param keystore: Private keys that requests can refer to by alias or
+        address.
+
+        :param flush_size: Number of bytes of responses to buffer before
+        writing them to the transport.
+
+        :param flush_delay: Max number of seconds to buffer responses that
+        are ready in between receiving requests.
+
+        :param result_cache_size: Max number of signatures to cache (0 =
+        disabled).
+
+        :param result_cache_ttl: Number of seconds to cache each signature
+        for.
+
+        :param capture: If set, requests received by
+        :py:class:`SigningProtocol` connections are captured for replay.
+
+        :param threaded: If set (and ``workers`` is 0), orders are signed in
+        a background thread instead of on the reactor thread.
+
+        :param priority_weights: Turns that each priority gets when requests
+        are waiting to be signed (see :py:class:`SigningScheduler`).  If not
+        set, more urgent requests always go first.
+
+        :param max_queued: Max number of requests that can wait to be signed;
+        once reached, new requests are rejected with an ``Overloaded`` error
+        (0 = no limit).
+
+        :param use_reactor: The reactor that connections, the scheduler and
+        the worker pool schedule calls with (defaults to the global reactor).
+
+        :param executor: Allows injecting a different executor for the worker
+        pool (e.g., for unit tests).
+        """
+        if use_reactor is None:
+            # Only import the reactor when it's needed, as importing it
+            # installs it (e.g., the asyncio server never needs it).
+            from twisted.internet import reactor as use_reactor
+
+        self.reactor = use_reactor
+        self.flush_size = flush_size
+        self.flush_delay = flush_delay
+        self.capture = capture
+
+        # Factories returned by :py:meth:`share` point back to the factory
+        # that owns the worker pool and capture.
+        self._owner: typing.Optional[SigningProtocolFactory] = None
+
+        # Requests from every connection share the same order signer (and its
+        # caches) and pool of workers.
+        self.order_signer = OrderSigner(
+            keystore=keystore,
+            result_cache_size=result_cache_size,
+            result_cache_ttl=result_cache_ttl,
+        )
+
+        if workers:
+            self.pool = SigningPool(
+                workers,
+                keystore=keystore,
+                use_reactor=use_reactor,
+                executor=executor,
+            )
+        elif threaded:
+            self.pool = ThreadSigningPool(
+                keystore=keystore,
+                use_reactor=use_reactor,
+                executor=executor,
+            )
+        else:
+            self.pool = None
+
+        # Instruments registered by one client can be used by all clients.
+        self.instruments = InstrumentRegistry()
+
+        self.metrics = Metrics()
+        self.metrics.caches.update(self.order_signer.caches)
+
+        # Requests from every connection compete for the same workers, so
+        # they share one scheduler.  Only enough orders to keep the workers
+        # busy are sent to the pool at a time; the rest wait in the
+        # scheduler, where more urgent requests can overtake them.
+        self.scheduler = SigningScheduler(
+            weights=priority_weights,
+            max_in_flight=self.pool.workers * 2 if self.pool else None,
+            max_queued=max_queued,
+            metrics=self.metrics,
+        )
+        self.scheduler.clock = use_reactor
+
+    def buildProtocol(
+            self,
+            addr: address.UNIXAddress,
+    ) -> BaseSigningProtocol:
+        p = self.protocol(
+            self.order_signer,
+            self.pool,
+            self.instruments,
+            self.metrics,
+            self.scheduler,
+        )
         p.factory = self
+        p.clock = self.reactor
+        p.flush_size = self.flush_size
+        p.flush_delay = self.flush_delay
+
+        if isinstance(p, SigningProtocol):
+            p.capture = self.capture
+
         return p
+
+    def share(
+            self,
+            protocol_type: typing.Type[BaseSigningProtocol],
+    ) -> 'SigningProtocolFactory':
+        """
+        Returns a factory for a different protocol (e.g., to listen on
+        another interface using the binary protocol), which shares this
+        factory's order signer, worker pool, instruments, metrics and
+        scheduler.
+        """
+        factory = copy(self)
+        factory.protocol = protocol_type
+        factory.numPorts = 0
+        factory._owner = self._owner or self
+        return factory
+
+    def startFactory(self) -> None:
+        if self._owner:
+            # Count each factory that shares the pool as a port of the owner,
+            # so that the owner only stops once all of them have stopped.
+            self._owner.doStart()
+
+    def stopFactory(self) -> None:
+        if self._owner:
+            self._owner.doStop()
+            return
+
+        if self.pool:
+            self.pool.shutdown()
+
+        if self.capture:
+            self.capture.close()
@@ -0,0 +1,299 @@
+"""
+Decides which requests to sign next, when more requests are waiting than can
+be signed at once.
+"""
+import typing
+from collections import deque
+from time import perf_counter
+
+from twisted.internet import base, defer
+
+from ordersigner_daemon import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL
+from ordersigner_daemon.metrics import Metrics
+
+__all__ = [
+    'DeadlineExceeded',
+    'Overloaded',
+    'PRIORITY_NAMES',
+    'SigningScheduler',
+]
+
+# Names of each priority, as used in metrics and command-line options.
+PRIORITY_NAMES = {
+    PRIORITY_HIGH: 'high',
+    PRIORITY_NORMAL: 'normal',
+    PRIORITY_LOW: 'low',
+}
+
+
+class DeadlineExceeded(Exception):
+    """
+    Indicates that a request expired (see its ``ttl_ms``) before it was
+    signed, so the daemon dropped it instead of wasting time on a stale
+    order.
+    """
+
+    def __init__(self, waited: float) -> None:
+        super().__init__(
+            'Request expired after waiting {waited} ms to be signed.'.format(
+                waited=int(waited * 1000),
+            ),
+        )
+
+        self.context = {'waited_ms': int(waited * 1000)}
+
+
+class Overloaded(Exception):
+    """
+    Indicates that the daemon rejected a request, because too many requests
+    are already waiting to be signed.
+    """
+
+    def __init__(self, max_queued: int) -> None:
+        super().__init__(
+            'Too many requests are waiting to be signed; try again later.',
+        )
+
+        self.context = {'max_queued': max_queued}
+
+
+class SigningScheduler:
+    """
+    Holds signing work in one queue per priority, and starts it in priority
+    order.
+
+    By default, priorities are strict: work is always taken from the most
+    urgent queue that isn't empty, so low-priority requests wait for as long
+    as there is anything more urgent to do.  If ``weights`` are set, the
+    queues take turns instead (e.g., weights of ``(8, 4, 1)`` start up to 8
+    high-priority requests for every 4 normal and 1 low), so that no queue is
+    starved.
+
+    Work only waits in the queues while the scheduler is busy:
+
+    - While it is held (see :py:meth:`hold`), e.g. while a protocol is
+      processing a chunk of incoming data, so that every request in the chunk
+      is considered before any of them is signed.
+    - While ``max_in_flight`` items are already running (e.g., enough to keep
+      every worker process busy), so that new requests don't pile up behind
+      less urgent ones in the worker pool's own (FIFO) queue.
+
+    To shed load when the daemon falls behind, work that has passed its
+    deadline by the time its turn comes is dropped (with
+    :py:class:`DeadlineExceeded`), and new work is rejected (with
+    :py:class:`Overloaded`) once ``max_queued`` items are waiting.
+    """
+
+    def __init__(
+            self,
+            weights: typing.Optional[typing.Sequence[int]] = None,
+            max_in_flight: typing.Optional[int] = None,
+            slice_duration: float = 0.001,
+            max_queued: int = 0,
+            metrics: typing.Optional[Metrics] = None,
+    ) -> None:
+        """
+        :param weights: Number of turns that each priority gets per round,
+        most urgent first.  If not set, priorities are strict.
+
+        :param max_in_flight: Max number of items to run at once (``None`` =
+        no limit).
+
+        :param slice_duration: Max number of seconds to spend starting work
+        before letting the reactor handle other events (e.g., more urgent
+        requests that arrive while orders are signed on the reactor thread).
+
+        :param max_queued: Max number of items that can wait to be started
+        (0 = no limit).
+
+        :param metrics: Metrics to record queueing times in.
+        """
+        if weights is not None and (
+                len(weights) != len(PRIORITY_NAMES)
+                or not all(type(w) is int and w > 0 for w in weights)
+        ):
+            raise ValueError(
+                'Expected {count} positive integer weights, '
+                'got {weights!r}.'.format(
+                    count=len(PRIORITY_NAMES),
+                    weights=weights,
+                ),
+            )
+
+        self.weights = weights
+        self.max_in_flight = max_in_flight
+        self.slice_duration = slice_duration
+        self.max_queued = max_queued
+        self.metrics = Metrics() if metrics is None else metrics
+
+        # The reactor, for yielding to other events (defaults to the global
+        # reactor).
+        self.clock: typing.Optional[base.ReactorBase] = None
+        self.in_flight = 0
+
+        self._queues: typing.List[typing.Deque[tuple]] = [
+            deque() for _ in PRIORITY_NAMES
+        ]
+        self._size = 0
+
+        # Turns left in the current round, for each priority (weighted mode
+        # only).
+        self._turns = list(weights or ())
+
+        self._held = 0
+        self._running = False
+        self._run_call: typing.Optional[base.DelayedCall] = None
+
+    def __len__(self) -> int:
+        """
+        Returns the number of items waiting to be started.
+        """
+        return self._size
+
+    def submit(
+            self,
+            priority: typing.Optional[int],
+            fn: typing.Callable,
+            *args: typing.Any,
+            deadline: typing.Optional[float] = None,
+    ) -> defer.Deferred:
+        """
+        Schedules a call to ``fn(*args)`` (which may return a deferred).
+
+        :param priority: One of the ``PRIORITY_*`` constants (``None`` =
+        ``PRIORITY_NORMAL``).
+
+        :param deadline: If set, the call is dropped if it hasn't started by
+        this time (according to :py:func:`time.perf_counter`).
+
+        :return: A deferred that will resolve with the result of the call,
+        or fail with :py:class:`Overloaded` or :py:class:`DeadlineExceeded`.
+        """
+        if self.max_queued and self._size >= self.max_queued:
+            self.metrics.rejected += 1
+            return defer.fail(Overloaded(self.max_queued))
+
+        if priority is None:
+            priority = PRIORITY_NORMAL
+
+        d = defer.Deferred()
+
+        self._queues[priority].append((fn, args, d, perf_counter(), deadline))
+        self._size += 1
+        self.metrics.queued += 1
+
+        if not self._held:
+            self.run()
+
+        return d
+
+    def hold(self) -> None:
+        """
+        Queues new work without starting it, until :py:meth:`release` is
+        called.
+        """
+        self._held += 1
+
+    def release(self) -> None:
+        """
+        Starts queued work, once every :py:meth:`hold` has been released.
+        """
+        self._held -= 1
+
+        if not self._held:
+            self.run()
+
+    def run(self) -> None:
+        """
+        Starts as much queued work as ``max_in_flight`` allows.
+        """
+        if self._run_call and self._run_call.active():
+            self._run_call.cancel()
+
+        self._run_call = None
+
+        if self._running or self._held:
+            # Work that finishes straight away (e.g., signing on the reactor
+            # thread) ends up here; the loop below will carry on.  If the
+            # scheduler is held, :py:meth:`release` will carry on instead.
+            return
+
+        self._running = True
+        deadline = perf_counter() + self.slice_duration
+
+        try:
+            while self._size and not self._is_full():
+                self._start(*self._next())
+
+                if self._size and perf_counter() >= deadline:
+                    # Give the reactor a chance to read new requests (which
+                    # may be more urgent than the ones left in the queues).
+                    self._run_call = self._clock().callLater(0, self.run)
+                    break
+        finally:
+            self._running = False
+
+    def _clock(self) -> base.ReactorBase:
+        """
+        Returns the reactor to schedule calls with.
+        """
+        if self.clock is None:
+            # Importing the reactor installs it, so don't do that unless
+            # nobody provided a clock.
+            from twisted.internet import reactor
+            self.clock = reactor
+
+        return self.clock
+
+    def _is_full(self) -> bool:
+        return (
+            self.max_in_flight is not None
+            and self.in_flight >= self.max_in_flight
+        )
+
+    def _next(self) -> typing.Tuple[int, tuple]:
+        """
+        Removes the next item to start from the queues.
+        """
+        for priority, queue in enumerate(self._queues):
+            if queue and (self.weights is None or self._turns[priority]):
+                if self.weights is not None:
+                    self._turns[priority] -= 1
+
+                self._size -= 1
+                self.metrics.queued -= 1
+                return priority, queue.popleft()
+
+        # Every queue that has work waiting has used up its turns; start a
+        # new round.
+        self._turns = list(self.weights)
+        return self._next()
+
+    def _start(self, priority: int, item: tuple) -> None:
+        fn, args, d, queued, deadline = item
+        now = perf_counter()
+
+        self.metrics.queue[PRIORITY_NAMES[priority]].record(now - queued)
+
+        if deadline is not None and now > deadline:
+            self.metrics.expired += 1
+            d.errback(DeadlineExceeded(now - queued))
+            return
+
+        self.in_flight += 1
+
+        result = defer.maybeDeferred(fn, *args)
+        result.addBoth(self._finished)
+        result.chainDeferred(d)
+
+    def _finished(self, result: typing.Any) -> typing.Any:
+        """
+        Makes room for the next item, passing the result through (so that
+        this method can be used as a callback).
+        """
+        self.in_flight -= 1
+
+        if self._size:
+            self.run()
+
+        return result
@@ -0,0 +1,400 @@
+"""
+Shared-memory transport, for clients that run on the same host as the
+daemon.
+
+Each client creates a memory-mapped file that holds two ring buffers (one for
+requests, one for responses), and sends the file descriptor to the daemon
+over a unix socket.  Requests and responses are copied straight into the
+rings, in the same format as the JSON protocol.  The socket is only used to
+wake the other side up when it is waiting for new data (so under load, when
+both sides are busy, requests and responses are passed without any system
+calls), and to tell when the client disconnects.
+
+The layout of the rings must match ``leverj_ordersigner_client.shm``.
+"""
+import mmap
+import os
+import struct
+import threading
+import typing
+from collections import deque
+
+from twisted.internet import base, interfaces, reactor
+from twisted.protocols import policies
+from ujson import loads
+from zope.interface import implementer
+
+__all__ = [
+    'CorruptRingBuffer',
+    'RingBuffer',
+    'ShmServerProtocol',
+    'ShmSigningFactory',
+]
+
+# Acquiring an uncontended lock is an atomic instruction (on x86, a full
+# memory barrier) without a system call; see :py:meth:`RingBuffer.sleep`.
+_barrier = threading.Lock()
+
+
+class CorruptRingBuffer(ValueError):
+    """
+    Indicates that a ring buffer's counters are inconsistent (e.g., the
+    client wrote garbage into the shared memory).
+    """
+
+
+class RingBuffer:
+    """
+    Single-producer, single-consumer ring buffer of bytes, in shared memory.
+
+    The header holds two counters (total bytes written and read), each on
+    its own cache line; only the producer updates ``head`` and only the
+    consumer updates ``tail``, so no locks are needed.  Data is copied into
+    the ring before ``head`` is advanced, so the consumer never sees a
+    partial write.
+
+    The other process can write anything it likes into the shared memory,
+    so the counters are checked before they are used, and
+    :py:class:`CorruptRingBuffer` is raised if they don't make sense.
+
+    The header also holds a flag that the consumer sets before it waits for
+    new data (see :py:meth:`sleep`), so that the producer only has to wake it
+    up (see :py:meth:`needs_doorbell`) when it is actually waiting.
+    """
+    HEADER_SIZE = 128
+
+    _HEAD = 0
+    _TAIL = 64
+    _SLEEPING = 72
+    _COUNTER = struct.Struct('<Q')
+
+    def __init__(self, buffer: mmap.mmap, offset: int, capacity: int) -> None:
+        """
+        :param buffer: Shared memory that contains the ring.
+
+        :param offset: Position of the ring's header in ``buffer``.
+
+        :param capacity: Number of bytes of data that the ring can hold.
+        """
+        self.buffer = buffer
+        self.offset = offset
+        self.capacity = capacity
+
+        self._data = offset + self.HEADER_SIZE
+
+    @classmethod
+    def size(cls, capacity: int) -> int:
+        """
+        Returns the number of bytes of shared memory that a ring needs.
+        """
+        return cls.HEADER_SIZE + capacity
+
+    @property
+    def available(self) -> int:
+        """
+        Number of bytes that are waiting to be read.
+        """
+        return self._used(self._load(self._HEAD), self._load(self._TAIL))
+
+    def write(self, data: bytes) -> int:
+        """
+        Copies as much of ``data`` into the ring as will fit.
+
+        :return: Number of bytes written.
+        """
+        head = self._load(self._HEAD)
+        size = min(
+            len(data),
+            self.capacity - self._used(head, self._load(self._TAIL)),
+        )
+
+        if size:
+            start = head % self.capacity
+            first = min(size, self.capacity - start)
+
+            self.buffer[self._data + start:self._data + start + first] = \
+                data[:first]
+
+            if first < size:
+                # Wrap around to the start of the ring.
+                self.buffer[self._data:self._data + size - first] = \
+                    data[first:size]
+
+            self._store(self._HEAD, head + size)
+
+        return size
+
+    def read(self) -> bytes:
+        """
+        Removes and returns everything that is waiting to be read.
+        """
+        tail = self._load(self._TAIL)
+        size = self._used(self._load(self._HEAD), tail)
+
+        if not size:
+            return b''
+
+        start = tail % self.capacity
+        first = min(size, self.capacity - start)
+
+        data = self.buffer[self._data + start:self._data + start + first]
+
+        if first < size:
+            data += self.buffer[self._data:self._data + size - first]
+
+        self._store(self._TAIL, tail + size)
+        return data
+
+    def sleep(self) -> bool:
+        """
+        Called by the consumer once it has read everything, to ask the
+        producer to ring the doorbell when it writes more data.
+
+        :return: Whether the consumer can wait for the doorbell.  If
+        ``False``, the producer wrote more data before it could have seen the
+        flag, so the consumer has to read again instead.
+        """
+        self._store(self._SLEEPING, 1)
+
+        # Each side writes one field, then reads the other's; the barrier
+        # makes sure that at least one of them sees the other's write, so
+        # the consumer never sleeps through new data.
+        with _barrier:
+            pass
+
+        return not self.available
+
+    def needs_doorbell(self) -> bool:
+        """
+        Called by the producer after writing data; returns whether the
+        consumer is waiting to be woken up.
+
+        The flag is cleared, so that the doorbell is only rung once for each
+        time that the consumer goes to sleep.
+        """
+        with _barrier:
+            pass
+
+        if not self._load(self._SLEEPING):
+            return False
+
+        self._store(self._SLEEPING, 0)
+        return True
+
+    def _used(self, head: int, tail: int) -> int:
+        """
+        Returns the number of bytes between ``tail`` and ``head``, after
+        checking that the ring could actually hold that many.
+        """
+        size = head - tail
+
+        if not 0 <= size <= self.capacity:
+            raise CorruptRingBuffer(
+                'Ring buffer counters are out of range '
+                '(head={head}, tail={tail}).'.format(head=head, tail=tail),
+            )
+
+        return size
+
+    def _load(self, field: int) -> int:
+        return self._COUNTER.unpack_from(self.buffer, self.offset + field)[0]
+
+    def _store(self, field: int, value: int) -> None:
+        self._COUNTER.pack_into(self.buffer, self.offset + field, value)
+
+
+@implementer(interfaces.IFileDescriptorReceiver)
+class ShmServerProtocol(policies.ProtocolWrapper):
+    """
+    Moves requests and responses for the wrapped protocol through shared
+    memory, instead of through the socket.
+
+    The client starts by sending the file descriptor of the shared memory,
+    along with a handshake line (``{"capacity": <bytes per ring>}``).  After
+    that, each side sends a byte over the socket (the doorbell) when it
+    writes to a ring that the other side is sleeping on (see
+    :py:meth:`RingBuffer.sleep`).
+    """
+    # Max length of the handshake line.
+    MAX_HANDSHAKE_LENGTH = 1024
+
+    # Number of seconds to wait before trying again, if the client hasn't
+    # made room in the response ring yet.
+    retry_delay = 0.001
+
+    # Byte sent over the socket to wake up the other side.
+    DOORBELL = b'\x01'
+
+    def __init__(
+            self,
+            factory: policies.WrappingFactory,
+            wrappedProtocol: interfaces.IProtocol,
+    ) -> None:
+        super().__init__(factory, wrappedProtocol)
+
+        self.clock: base.ReactorBase = reactor
+
+        self.requests: typing.Optional[RingBuffer] = None
+        self.responses: typing.Optional[RingBuffer] = None
+
+        self._fd: typing.Optional[int] = None
+        self._memory: typing.Optional[mmap.mmap] = None
+        self._handshake = b''
+
+        # Responses that don't fit in the ring yet.
+        self._backlog: typing.Deque[bytes] = deque()
+        self._retry_call: typing.Optional[base.DelayedCall] = None
+
+    def fileDescriptorReceived(self, descriptor: int) -> None:
+        if self._fd is not None or self._memory is not None:
+            # Only one descriptor is expected.
+            os.close(descriptor)
+            self.transport.loseConnection()
+        else:
+            self._fd = descriptor
+
+    def dataReceived(self, data: bytes) -> None:
+        if self.requests is None:
+            self._handshake += data
+
+            line, sep, _ = self._handshake.partition(b'\n')
+
+            if not sep:
+                if len(self._handshake) > self.MAX_HANDSHAKE_LENGTH:
+                    self.transport.loseConnection()
+
+                return
+
+            try:
+                self._attach(line)
+            except (ValueError, TypeError, KeyError, OSError):
+                self.transport.loseConnection()
+                return
+
+        # Any other bytes are just wake-up calls, so read whatever is in the
+        # ring (which may include requests written after the doorbell rang).
+        try:
+            self._read_requests()
+        except CorruptRingBuffer:
+            self.transport.loseConnection()
+
+    def write(self, data: bytes) -> None:
+        self.writeSequence((data,))
+
+    def writeSequence(self, data: typing.Iterable[bytes]) -> None:
+        self._backlog.extend(data)
+        self._send_backlog()
+
+    def connectionLost(self, reason) -> None:
+        if self._retry_call and self._retry_call.active():
+            self._retry_call.cancel()
+
+        self._retry_call = None
+
+        super().connectionLost(reason)
+
+        # Responses that finish signing after the client disconnects are
+        # discarded (see :py:meth:`_send_backlog`).
+        self.requests = None
+        self.responses = None
+
+        if self._memory is not None:
+            self._memory.close()
+            self._memory = None
+
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _read_requests(self) -> None:
+        """
+        Passes requests to the wrapped protocol until the ring is empty, then
+        goes to sleep until the client rings the doorbell.
+        """
+        while self.requests is not None:
+            data = self.requests.read()
+
+            if data:
+                self.wrappedProtocol.dataReceived(data)
+            elif self.requests.sleep():
+                break
+
+    def _attach(self, handshake: bytes) -> None:
+        """
+        Maps the client's shared memory.
+        """
+        capacity = loads(handshake)['capacity']
+
+        if self._fd is None or type(capacity) is not int or capacity <= 0:
+            raise ValueError('Invalid handshake.')
+
+        size = RingBuffer.size(capacity)
+
+        if os.fstat(self._fd).st_size < 2 * size:
+            raise ValueError('Shared memory is too small.')
+
+        self._memory = mmap.mmap(self._fd, 2 * size)
+
+        # The mapping stays valid after the descriptor is closed.
+        os.close(self._fd)
+        self._fd = None
+
+        self.requests = RingBuffer(self._memory, 0, capacity)
+        self.responses = RingBuffer(self._memory, size, capacity)
+
+    def _send_backlog(self) -> None:
+        """
+        Copies as many responses into the ring as will fit, and wakes up the
+        client if it is waiting for them.
+        """
+        if self._retry_call and self._retry_call.active():
+            self._retry_call.cancel()
+
+        self._retry_call = None
+
+        if self.responses is None:
+            self._backlog.clear()
+            return
+
+        written = False
+
+        while self._backlog:
+            chunk = self._backlog[0]
+
+            try:
+                size = self.responses.write(chunk)
+            except CorruptRingBuffer:
+                self._backlog.clear()
+                self.transport.loseConnection()
+                return
+
+            if size:
+                written = True
+
+            if size < len(chunk):
+                self._backlog[0] = chunk[size:]
+                break
+
+            self._backlog.popleft()
+
+        if written and self.responses.needs_doorbell():
+            self.transport.write(self.DOORBELL)
+
+        if self._backlog:
+            # The ring is full; try again once the client has had a chance to
+            # catch up.
+            self._retry_call = self.clock.callLater(
+                self.retry_delay,
+                self._send_backlog,
+            )
+
+
+class ShmSigningFactory(policies.WrappingFactory):
+    """
+    Accepts connections from clients that use the shared-memory transport
+    (see :py:class:`ShmServerProtocol`).
+
+    Wraps a :py:class:`SigningProtocolFactory`, so that shared-memory
+    clients share its order signer, worker pool, instruments and metrics.
+    """
+    protocol = ShmServerProtocol
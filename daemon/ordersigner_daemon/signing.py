@@ -0,0 +1,189 @@
+"""
+Computes order hashes for the ``leverj_ordersigner`` lib, with the parts that
+only depend on the instrument prepared ahead of time.
+
+The hashes are identical to the ones that ``leverj_ordersigner`` computes
+(i.e., ``Web3.soliditySha3`` over the same values); we just avoid
+re-computing the instrument-specific values for every order.
+"""
+import typing
+from collections import namedtuple as named_tuple
+
+from eth_utils import keccak, to_canonical_address, to_int, to_wei
+from leverj_ordersigner import futures, spot
+from ujson import dumps
+
+__all__ = [
+    'InstrumentContext',
+    'PreparedInstrument',
+    'futures_hash',
+    'prepare_instrument',
+    'spot_hash',
+]
+
+InstrumentContext = named_tuple('InstrumentContext', (
+    # Decimal places and scaling factors for converting quantities and prices
+    # from ether units to the token's lowest denomination.
+    'base_decimals',
+    'base_scale',
+    'quote_decimals',
+    'quote_scale',
+
+    # Packed ``base`` and ``quote`` addresses, which are the last part of the
+    # hash preimage for spot orders (``None`` for futures instruments, which
+    # don't need them).
+    'spot_suffix',
+))
+
+
+class PreparedInstrument(dict):
+    """
+    An instrument that has been prepared ahead of time, e.g. when a client
+    registers it.
+
+    It behaves exactly like the original instrument dict, but also carries
+    the values that :py:class:`ordersigner_daemon.OrderSigner` would
+    otherwise compute for every order: the signing context, and the
+    canonical encoding that is used in cache keys.
+    """
+    __slots__ = ('context', 'key')
+
+    def __init__(self, instrument: dict) -> None:
+        super().__init__(instrument)
+
+        self.context = prepare_instrument(instrument)
+        self.key = dumps(instrument, sort_keys=True)
+
+
+def prepare_instrument(instrument: dict) -> InstrumentContext:
+    """
+    Computes all the values for an instrument that don't depend on the order.
+    """
+    quote_decimals = instrument['quote']['decimals']
+
+    try:
+        base_decimals = instrument['base']['decimals']
+
+        spot_suffix = (
+            to_canonical_address(instrument['base']['address'])
+            + to_canonical_address(instrument['quote']['address'])
+        )
+    except KeyError:
+        base_decimals = None
+        spot_suffix = None
+
+    return InstrumentContext(
+        base_decimals=base_decimals,
+        base_scale=_scale(base_decimals),
+        quote_decimals=quote_decimals,
+        quote_scale=_scale(quote_decimals),
+        spot_suffix=spot_suffix,
+    )
+
+
+def spot_hash(order: dict, context: InstrumentContext) -> bytes:
+    """
+    Returns the hash that needs to be signed for a spot order.
+    """
+    if context.spot_suffix is None:
+        raise ValueError(
+            'Spot instruments must specify address and decimals for both '
+            'base and quote tokens.',
+        )
+
+    return keccak(
+        _pack_common(order, spot)
+        + _pack_uint(_to_lowest_denomination(
+            order['quantity'],
+            context.base_decimals,
+            context.base_scale,
+        ), 256)
+        + _pack_uint(_to_lowest_denomination(
+            order['price'],
+            context.quote_decimals,
+            context.quote_scale,
+        ), 256)
+        + context.spot_suffix
+    )
+
+
+def futures_hash(order: dict, context: InstrumentContext) -> bytes:
+    """
+    Returns the hash that needs to be signed for a futures order.
+    """
+    numerator, denominator = _quantity_fraction(order['quantity'])
+
+    return keccak(
+        _pack_common(order, futures)
+        + _pack_uint(int(order['instrument']), 32)
+        + _pack_uint(_to_lowest_denomination(
+            order['price'],
+            context.quote_decimals,
+            context.quote_scale,
+        ), 256)
+        + _pack_uint(to_int(int(order['marginPerFraction'])), 256)
+        + to_canonical_address(order['quote'])
+        + _pack_uint(to_int(numerator), 64)
+        + _pack_uint(to_int(denominator), 64)
+    )
+
+
+def _pack_common(order: dict, module: typing.Any) -> bytes:
+    """
+    Packs the values at the start of the preimage, which are the same for
+    spot and futures orders (except for the valid order types).
+    """
+    return (
+        to_canonical_address(order['accountId'])
+        + _pack_uint(to_int(order['timestamp']), 64)
+        + _pack_uint(module._get_order_type_as_int(order['orderType']), 8)
+        + _pack_uint(module._get_side_as_int(order['side']), 8)
+    )
+
+
+def _pack_uint(value: int, bits: int) -> bytes:
+    """
+    Packs an unsigned int the same way as ``abi.encodePacked``.
+    """
+    return value.to_bytes(bits // 8, 'big')
+
+
+def _scale(decimals: typing.Optional[int]) -> typing.Optional[int]:
+    """
+    Returns the factor for converting wei into a token's lowest denomination,
+    or ``None`` if the fast path in :py:func:`_to_lowest_denomination` can't
+    be used for this token.
+    """
+    if isinstance(decimals, int) and 0 <= decimals <= 18:
+        return 10 ** (18 - decimals)
+
+    return None
+
+
+def _to_lowest_denomination(
+        number: typing.Any,
+        decimals: int,
+        scale: typing.Optional[int],
+) -> int:
+    """
+    Equivalent to ``_convert_to_unit_lowest_denomination`` in
+    ``leverj_ordersigner``, using a precomputed scaling factor.
+    """
+    wei = to_wei(number, 'ether')
+
+    if scale is None or wei < scale:
+        # The lib truncates the value as a string, which does strange things
+        # in these cases; defer to it so that we get the same result.
+        return spot._convert_to_unit_lowest_denomination(number, decimals)
+
+    return wei // scale
+
+
+def _quantity_fraction(quantity: typing.Any) -> typing.Tuple[int, int]:
+    """
+    Equivalent to ``get_quantity_numerator_and_denominator`` in
+    ``leverj_ordersigner.futures``, minus the debug output.
+    """
+    decimal_places = futures._numbers_after_decimal_point(quantity)
+    numerator = futures._strip_unnecessary_zeros(str(quantity)).replace('.', '')
+    return int(numerator), 10 ** decimal_places
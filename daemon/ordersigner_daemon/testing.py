@@ -35,13 +35,21 @@ class MockOrderSigner(OrderSigner):
         self.futures_sig: typing.Optional[typing.Union[str, Exception]] = None
         self.spot_sig: typing.Optional[typing.Union[str, Exception]] = None
 
+        # Arguments from the most recent call to each ``sign_*`` method.
+        self.futures_args: typing.Optional[tuple] = None
+        self.spot_args: typing.Optional[tuple] = None
+
     def sign_futures(self, order: dict, instrument: dict, signer: str) -> str:
+        self.futures_args = (order, instrument, signer)
+
         if isinstance(self.futures_sig, Exception):
             raise self.futures_sig
 
         return self.futures_sig
 
     def sign_spot(self, order: dict, instrument: dict, signer: str) -> str:
+        self.spot_args = (order, instrument, signer)
+
         if isinstance(self.spot_sig, Exception):
             raise self.spot_sig
 
@@ -11,25 +11,119 @@ project).
 from twisted.application import internet, service
 from twisted.internet import endpoints, reactor
 from twisted.python import usage
+from twisted.web import resource, server
 
+from ordersigner_daemon.capture import TrafficCapture
+from ordersigner_daemon.keystore import Keystore
+from ordersigner_daemon.metrics import MetricsResource
 from ordersigner_daemon.protocol import SigningProtocolFactory
+from ordersigner_daemon.shm import ShmSigningFactory
 
 name = 'leverj-ordersigner'
 
+
+def _priority_weights(value):
+    weights = tuple(int(weight) for weight in value.split(','))
+
+    if len(weights) != 3 or min(weights) < 1:
+        raise ValueError('Expected 3 positive integers, e.g. "8,4,1".')
+
+    return weights
+
+
 class Options(usage.Options):
     optParameters = [
         ['interface', 'i', 'unix:/tmp/leverj-ordersigner-daemon.sock', 'Interface to listen for client connections (see docs for twisted.internet.endpoints.serverFromString)'],
+        ['binary-interface', 'b', None, 'Additional interface to listen for client connections using the binary (msgpack) protocol; requires the "binary" extra'],
+        ['shm-interface', None, None, 'Additional unix socket to accept connections from clients that send requests and responses via shared memory (e.g. "unix:/tmp/leverj-ordersigner-daemon-shm.sock")'],
+        ['workers', 'w', 0, 'Number of worker processes to sign orders in (0 = sign on the reactor thread)', int],
+        ['keystore', 'k', None, 'JSON file or directory of private keys that requests can refer to by alias or address'],
+        ['flush-size', None, 65536, 'Number of bytes of responses to buffer before writing them to the client', int],
+        ['flush-delay', None, 0.0, 'Max number of seconds to buffer responses before writing them to the client (0 = next reactor iteration)', float],
+        ['result-cache-size', None, 0, 'Max number of signatures to cache, so that repeated requests for the same order are not signed again (0 = disabled)', int],
+        ['result-cache-ttl', None, 60.0, 'Number of seconds to cache each signature for', float],
+        ['priority-weights', None, None, 'Turns that high, normal and low priority requests each get when requests are waiting to be signed (e.g. "8,4,1"); if not set, more urgent requests always go first', _priority_weights],
+        ['max-queued', None, 0, 'Max number of requests that can wait to be signed; once reached, new requests are rejected with an "Overloaded" error (0 = no limit)', int],
+        ['capture', None, None, 'File to capture incoming JSON requests to (with arrival times), for replay; signers are redacted'],
+        ['capture-max-bytes', None, 100 * 1024 * 1024, 'Size at which the capture file is rotated', int],
+        ['capture-backups', None, 5, 'Number of rotated capture files to keep', int],
+        ['capture-sample-rate', None, 1.0, 'Fraction of requests to capture', float],
+        ['metrics-interface', 'm', None, 'Interface to serve metrics on over HTTP, in Prometheus text format (e.g. "tcp:9100:interface=127.0.0.1")'],
     ]
 
 
 def makeService(options):
-    service_ = internet.StreamServerEndpointService(
+    factory = SigningProtocolFactory(
+        workers=options['workers'],
+
+        keystore=(
+            Keystore.load(options['keystore'])
+            if options['keystore']
+            else None
+        ),
+
+        flush_size=options['flush-size'],
+        flush_delay=options['flush-delay'],
+        result_cache_size=options['result-cache-size'],
+        result_cache_ttl=options['result-cache-ttl'],
+        priority_weights=options['priority-weights'],
+        max_queued=options['max-queued'],
+
+        capture=(
+            TrafficCapture(
+                options['capture'],
+                max_bytes=options['capture-max-bytes'],
+                backup_count=options['capture-backups'],
+                sample_rate=options['capture-sample-rate'],
+            )
+            if options['capture']
+            else None
+        ),
+    )
+
+    service_ = service.MultiService()
+
+    internet.StreamServerEndpointService(
         endpoints.serverFromString(
             reactor,
             options['interface'],
         ),
-        SigningProtocolFactory(),
-    )
+        factory,
+    ).setServiceParent(service_)
+
+    if options['binary-interface']:
+        # Only import the binary protocol if it's needed, as it depends on an
+        # optional extra.
+        from ordersigner_daemon.binary import BinarySigningProtocol
+
+        internet.StreamServerEndpointService(
+            endpoints.serverFromString(
+                reactor,
+                options['binary-interface'],
+            ),
+            factory.share(BinarySigningProtocol),
+        ).setServiceParent(service_)
+
+    if options['shm-interface']:
+        internet.StreamServerEndpointService(
+            endpoints.serverFromString(
+                reactor,
+                options['shm-interface'],
+            ),
+            ShmSigningFactory(factory),
+        ).setServiceParent(service_)
+
+    if options['metrics-interface']:
+        root = resource.Resource()
+        root.putChild(b'metrics', MetricsResource(factory.metrics))
+
+        internet.StreamServerEndpointService(
+            endpoints.serverFromString(
+                reactor,
+                options['metrics-interface'],
+            ),
+            server.Site(root),
+        ).setServiceParent(service_)
 
     service_.setServiceParent(service.Application(name))
 
@@ -1,12 +1,43 @@
+import re
+import typing
+from collections.abc import Mapping
+
 import filters as f
 from ujson import loads
 
-from ordersigner_daemon import Order, OrderSigner
+from ordersigner_daemon import PRIORITY_HIGH, PRIORITY_LOW, Batch, Order, \
+    OrderSigner, RegisterInstrument
 
 __all__ = [
-    'OrderSignerRequest'
+    'OrderSignerPayload',
+    'OrderSignerRequest',
+    'parse_payload',
+    'parse_request',
 ]
 
+TYPE_BATCH = 'batch'
+TYPE_INSTRUMENT = 'instrument'
+
+# Upper limit on the number of orders in a single batch request, so that one
+# request can't tie up the daemon indefinitely.
+MAX_BATCH_SIZE = 1000
+
+# Upper limit on the size of a single JSON-encoded request, in bytes.  This
+# leaves room for a batch of ``MAX_BATCH_SIZE`` orders that each include the
+# full instrument (a little under 1 KiB per order).
+MAX_REQUEST_LENGTH = 2 * 1024 * 1024
+
+
+# Matches any byte that the ``Unicode`` filter might change (non-ASCII,
+# control characters, line endings); see :py:func:`parse_request`.
+_non_printable_ascii = re.compile(rb'[^\x20-\x7e]')
+
+_ORDER_TYPES = {OrderSigner.TYPE_FUTURES, OrderSigner.TYPE_SPOT}
+_ORDER_KEYS = {'instrument', 'order', 'signer', 'type'}
+
+# Keys that may be omitted from single-order and batch requests.
+_OPTIONAL_KEYS = {'id', 'priority', 'ttl_ms'}
+
 
 # noinspection PyUnusedLocal
 def _loads_shim(value, *args, **kwargs):
@@ -18,32 +49,290 @@ def _loads_shim(value, *args, **kwargs):
     return loads(value)
 
 
+def _request_type(request: dict) -> typing.Optional[str]:
+    """
+    Returns the type of request, or ``None`` for a request to sign a single
+    order.
+    """
+    # Note that ``type`` hasn't been validated yet (it might not even be
+    # hashable), so we can only compare it here.
+    request_type = request.get('type')
+
+    if request_type in (TYPE_BATCH, TYPE_INSTRUMENT):
+        return request_type
+
+    return None
+
+
+def _priority_filter() -> f.BaseFilter:
+    """
+    Returns the filter that is applied to the (optional) priority of a
+    request.
+    """
+    return (
+        f.Type(int, allow_subclass=False)
+        | f.Min(PRIORITY_HIGH)
+        | f.Max(PRIORITY_LOW)
+    )
+
+
+def _ttl_filter() -> f.BaseFilter:
+    """
+    Returns the filter that is applied to the (optional) number of
+    milliseconds that a request may wait to be signed.
+    """
+    return f.Type(int, allow_subclass=False) | f.Min(1)
+
+
+def _order_filters() -> dict:
+    """
+    Returns the filters that are applied to each order in a request.
+    """
+    return {
+        # Instruments can be sent in full, or referenced by symbol if they
+        # have been registered beforehand.
+        'instrument': f.Type((dict, str)) | f.Required,
+        'order': f.Type(dict) | f.Required,
+        'signer': f.Type(str) | f.Required,
+
+        'type': f.Type(str) | f.Required | f.Choice({
+            OrderSigner.TYPE_FUTURES,
+            OrderSigner.TYPE_SPOT,
+        }),
+    }
+
+
 class OrderSignerRequest(f.BaseFilter):
     """
-    Validates an incoming request for the OrderSigner.
+    Validates an incoming (JSON-encoded) request for the OrderSigner.
     """
 
-    def _apply(self, value: bytes) -> Order:
+    def _apply(
+            self,
+            value: bytes,
+    ) -> typing.Union[Order, Batch, RegisterInstrument]:
+        return self._filter(
+            value,
+            f.Unicode | f.Required | f.JsonDecode(_loads_shim)
+            | OrderSignerPayload,
+        )
+
+
+class OrderSignerPayload(f.BaseFilter):
+    """
+    Validates a decoded request for the OrderSigner.
+
+    Requests with ``type: "batch"`` contain a list of ``orders``, and requests
+    with ``type: "instrument"`` register an ``instrument``; all other requests
+    contain a single order.
+    """
+
+    def _apply_none(self) -> None:
+        # A ``null`` request has always been reported as an unexpected error
+        # (``FilterMapper`` lets ``None`` through); raising an exception keeps
+        # the error output the same.
+        raise TypeError('Request must be an object, not null.')
+
+    def _apply(
+            self,
+            value: typing.Any,
+    ) -> typing.Union[Order, Batch, RegisterInstrument]:
         parsed = self._filter(
             value,
-            f.Unicode | f.Required | f.JsonDecode(_loads_shim) | f.FilterMapper(
-                {
-                    'instrument': f.Type(dict) | f.Required,
-                    'order': f.Type(dict) | f.Required,
-                    'signer': f.Type(str) | f.Required,
-
-                    'type': f.Type(str) | f.Required | f.Choice({
-                        OrderSigner.TYPE_FUTURES,
-                        OrderSigner.TYPE_SPOT,
-                    }),
+            # Same check that ``FilterMapper`` performs, so that invalid
+            # requests get the same errors as before the switch was added.
+            f.Type(Mapping) | f.FilterSwitch(
+                getter=_request_type,
+
+                cases={
+                    TYPE_BATCH: f.FilterMapper(
+                        {
+                            'id': f.Type((int, str), allow_subclass=False),
+                            'priority': _priority_filter(),
+                            'ttl_ms': _ttl_filter(),
+                            'type': f.Required,
+
+                            'orders':
+                                f.Type(list)
+                                | f.Required
+                                | f.MaxLength(MAX_BATCH_SIZE)
+                                | f.FilterRepeater(
+                                    f.FilterMapper(
+                                        _order_filters(),
+                                        allow_missing_keys=False,
+                                        allow_extra_keys=False,
+                                    ),
+                                ),
+                        },
+
+                        allow_missing_keys=_OPTIONAL_KEYS,
+                        allow_extra_keys=False,
+                    ),
+
+                    TYPE_INSTRUMENT: f.FilterMapper(
+                        {
+                            'id': f.Type((int, str), allow_subclass=False),
+                            'type': f.Required,
+
+                            'instrument':
+                                f.Type(dict)
+                                | f.Required
+                                | f.FilterMapper(
+                                    {'symbol': f.Type(str) | f.Required},
+                                    allow_missing_keys=False,
+                                    allow_extra_keys=True,
+                                ),
+                        },
+
+                        allow_missing_keys={'id'},
+                        allow_extra_keys=False,
+                    ),
                 },
 
-                allow_missing_keys=False,
-                allow_extra_keys=False,
+                default=f.FilterMapper(
+                    {
+                        'id': f.Type((int, str), allow_subclass=False),
+                        'priority': _priority_filter(),
+                        'ttl_ms': _ttl_filter(),
+                        **_order_filters(),
+                    },
+
+                    allow_missing_keys=_OPTIONAL_KEYS,
+                    allow_extra_keys=False,
+                ),
             ),
         )
 
         if self._has_errors:
             return None
 
+        if parsed['type'] == TYPE_BATCH:
+            return Batch(
+                orders=[Order(**order) for order in parsed['orders']],
+                id=parsed['id'],
+                priority=parsed['priority'],
+                ttl_ms=parsed['ttl_ms'],
+            )
+
+        if parsed['type'] == TYPE_INSTRUMENT:
+            return RegisterInstrument(
+                instrument=parsed['instrument'],
+                id=parsed['id'],
+            )
+
         return Order(**parsed)
+
+
+def parse_request(
+        line: bytes,
+) -> typing.Union[Order, Batch, RegisterInstrument, None]:
+    """
+    Fast path for parsing requests, which performs the same checks as
+    :py:class:`OrderSignerRequest` without the overhead of the filter chain.
+
+    Returns ``None`` if the request is not valid (or if it is not simple
+    enough for the fast path to be certain), in which case the request must
+    be run through :py:class:`OrderSignerRequest`, which also generates the
+    error details.
+    """
+    # The ``Unicode`` filter normalises strings; if there is anything for it
+    # to normalise, let it do its thing.
+    if not line or _non_printable_ascii.search(line):
+        return None
+
+    try:
+        request = loads(line)
+    except ValueError:
+        return None
+
+    return parse_payload(request)
+
+
+def parse_payload(
+        request: typing.Any,
+) -> typing.Union[Order, Batch, RegisterInstrument, None]:
+    """
+    Fast path equivalent of :py:class:`OrderSignerPayload`.
+
+    Returns ``None`` if the request is not valid (or if it is not simple
+    enough for the fast path to be certain).
+    """
+    if type(request) is not dict:
+        return None
+
+    request_id = request.get('id')
+    if not (request_id is None or type(request_id) in (int, str)):
+        return None
+
+    priority = request.get('priority')
+    if not (
+            priority is None
+            or (
+                type(priority) is int
+                and PRIORITY_HIGH <= priority <= PRIORITY_LOW
+            )
+    ):
+        return None
+
+    ttl_ms = request.get('ttl_ms')
+    if not (ttl_ms is None or (type(ttl_ms) is int and ttl_ms > 0)):
+        return None
+
+    request_type = request.get('type')
+    keys = request.keys() - _OPTIONAL_KEYS
+
+    if request_type == TYPE_BATCH:
+        orders = request.get('orders')
+
+        if (
+                keys != {'orders', 'type'}
+                or type(orders) is not list
+                or not 0 < len(orders) <= MAX_BATCH_SIZE
+                or not all(
+                    type(order) is dict
+                    and order.keys() == _ORDER_KEYS
+                    and _is_valid_order(order)
+                    for order in orders
+                )
+        ):
+            return None
+
+        return Batch(
+            orders=[Order(**order) for order in orders],
+            id=request_id,
+            priority=priority,
+            ttl_ms=ttl_ms,
+        )
+
+    if request_type == TYPE_INSTRUMENT:
+        instrument = request.get('instrument')
+
+        if (
+                request.keys() - {'id'} != {'instrument', 'type'}
+                or type(instrument) is not dict
+                or type(instrument.get('symbol')) is not str
+                or not instrument['symbol']
+        ):
+            return None
+
+        return RegisterInstrument(instrument=instrument, id=request_id)
+
+    if keys != _ORDER_KEYS or not _is_valid_order(request):
+        return None
+
+    return Order(**request)
+
+
+def _is_valid_order(order: dict) -> bool:
+    """
+    Fast path equivalent of :py:func:`_order_filters`.
+
+    Note that the caller is responsible for checking the keys.
+    """
+    return (
+        type(order['type']) is str and order['type'] in _ORDER_TYPES
+        and type(order['order']) is dict and bool(order['order'])
+        and type(order['instrument']) in (dict, str)
+        and bool(order['instrument'])
+        and type(order['signer']) is str and bool(order['signer'])
+    )
@@ -0,0 +1,60 @@
+"""
+Functions that run inside worker processes.
+
+This module doesn't depend on any particular event loop, so that it can be
+shared by the Twisted and asyncio servers.
+"""
+import signal
+import typing
+
+from ordersigner_daemon import Order, OrderSigner
+from ordersigner_daemon.keystore import Keystore
+
+__all__ = [
+    'initialize',
+    'sign',
+    'sign_many',
+]
+
+# Each worker process gets its own ``OrderSigner`` instance, which is created
+# once when the process starts (see :py:func:`initialize`).
+_order_signer: typing.Optional[OrderSigner] = None
+
+
+def initialize(
+        order_signer_type: typing.Type[OrderSigner],
+        keystore: typing.Optional[Keystore],
+) -> None:
+    """
+    Initialises a worker process.
+    """
+    # Worker processes are forked from a process that is already running an
+    # event loop, so they inherit its signal handlers (which would ignore
+    # SIGTERM, or report it as the daemon shutting down) and its wakeup fd.
+    # SIGINT is ignored, as Ctrl+C is sent to the whole process group, and
+    # the daemon shuts down its workers itself.
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    if hasattr(signal, 'SIGCHLD'):
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+    global _order_signer
+    _order_signer = order_signer_type(keystore=keystore)
+
+
+def sign(order: Order) -> str:
+    """
+    Signs an order inside a worker process.
+    """
+    return _order_signer.sign(order)
+
+
+def sign_many(
+        orders: typing.List[Order],
+) -> typing.List[typing.Union[str, Exception]]:
+    """
+    Signs a chunk of a batch inside a worker process.
+    """
+    return _order_signer.sign_many(orders)
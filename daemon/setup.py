@@ -10,11 +10,18 @@ with open('README.rst', 'r', 'utf-8') as f:
 
 setup(
     extras_require={
+        'binary': [
+            'msgpack~=1.0',
+        ],
+        'uvloop': [
+            'uvloop~=0.14',
+        ],
         'dev': [
             'sphinx~=3.2',
             'sphinx-rtd-theme~=0.5',
             'tox~=3.20',
             'nose2~=0.9',
+            'msgpack~=1.0',
         ]
     },
     author='Phoenix Zerin',
@@ -34,6 +41,8 @@ setup(
     },
     install_requires=[
         'twisted~=20.3',
+        'eth-keys~=0.3',
+        'eth-utils~=1.9',
         'leverj-ordersigner~=0.9',
         'phx-filters~=2.0',
         'ujson~=3.2',
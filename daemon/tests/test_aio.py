@@ -0,0 +1,500 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import typing
+from concurrent.futures import Future
+from unittest import TestCase
+
+from ujson import dumps, loads
+
+from ordersigner_daemon import OrderSigner
+from ordersigner_daemon.aio import AsyncioSigningProtocol, SigningServer
+from ordersigner_daemon.bin.daemon import _parse_interface
+from ordersigner_daemon.protocol import SigningProtocol
+from ordersigner_daemon.testing import MockOrderSigner
+from ordersigner_daemon.validation import MAX_BATCH_SIZE
+
+
+class AsyncioSigningProtocolTest(TestCase):
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        self.order_signer = MockOrderSigner()
+        self._connect(SigningServer(loop=self.loop))
+
+    def _connect(self, server: SigningServer) -> None:
+        """
+        Simulates a client connecting to the server.
+        """
+        self.server = server
+
+        self.protocol: AsyncioSigningProtocol = self.server()
+        self.protocol.order_signer = self.order_signer
+        self.protocol.print_exceptions = False
+
+        self.transport = MockTransport()
+        self.protocol.connection_made(self.transport)
+
+    def tearDown(self) -> None:
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def _send(self, *payloads: dict) -> None:
+        """
+        Simulates sending payloads to the server.
+        """
+        self.protocol.data_received(b''.join(
+            dumps(payload).encode('utf-8') + self.protocol.delimiter
+            for payload in payloads
+        ))
+
+    def _expect(self, *payloads: dict) -> None:
+        """
+        Asserts that the server sent back the correct responses.
+        """
+        self.assertListEqual(
+            [loads(line) for line in self.transport.value().splitlines()],
+            list(payloads),
+        )
+
+    def test_spot_success(self) -> None:
+        """
+        Client sends a valid spot transaction for signing.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de'
+
+        self._send({
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        })
+
+        self._expect({
+            'ok': True,
+            'signature': self.order_signer.spot_sig,
+        })
+
+    def test_coalesce_responses(self) -> None:
+        """
+        Responses to requests that arrive together are written together.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de'
+
+        request = {
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        }
+
+        self._send(request, {**request, 'id': 'abc'}, {'type': 'spot'})
+
+        self.assertEqual(self.transport.writes, 1)
+        self.assertEqual(len(self.transport.value().splitlines()), 3)
+
+    def test_validation_error(self) -> None:
+        """
+        The input does not pass validation.
+        """
+        self._send({'id': 42, 'type': 'spot'})
+
+        response = loads(self.transport.value())
+
+        self.assertEqual(response['id'], 42)
+        self.assertFalse(response['ok'])
+        self.assertEqual(
+            response['error']['message'],
+            SigningProtocol.MSG_VALIDATION_FAILED,
+        )
+
+    def test_signing_error(self) -> None:
+        """
+        An error occurs while attempting to generate the signature.
+        """
+        self.order_signer.futures_sig = ValueError('Invalid signer.')
+
+        self._send({
+            'type': 'futures',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        })
+
+        self._expect({
+            'ok': False,
+            'error': {
+                'type': 'ValueError',
+                'message': 'Invalid signer.',
+                'context': {},
+            },
+        })
+
+    def test_register_instrument(self) -> None:
+        """
+        Client registers an instrument, then refers to it by symbol.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de'
+
+        self._send(
+            {'type': 'instrument', 'instrument': {'symbol': 'LEVETH'}},
+
+            {
+                'type': 'spot',
+                'instrument': 'LEVETH',
+                'order': {'side': 'buy'},
+                'signer': '0x1337',
+            },
+        )
+
+        self._expect(
+            {'ok': True},
+            {'ok': True, 'signature': self.order_signer.spot_sig},
+        )
+
+        self.assertEqual(
+            self.order_signer.spot_args[1],
+            {'symbol': 'LEVETH'},
+        )
+
+    def test_split_lines(self) -> None:
+        """
+        A request arrives in several chunks.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de'
+
+        data = dumps({
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        }).encode('utf-8') + self.protocol.delimiter
+
+        self.protocol.data_received(data[:10])
+        self.assertEqual(self.transport.value(), b'')
+
+        self.protocol.data_received(data[10:])
+        self._expect({'ok': True, 'signature': self.order_signer.spot_sig})
+
+    def test_request_too_long(self) -> None:
+        """
+        Client sends a request that is longer than the server allows.
+        """
+        self.protocol.data_received(b'x' * (self.protocol.MAX_LENGTH + 1))
+        self.assertTrue(self.transport.closed)
+
+    def test_metrics(self) -> None:
+        """
+        Connections and requests are counted in the server's metrics, like
+        those of the ``twistd`` plugin.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de'
+        metrics = self.server.metrics
+
+        self.assertEqual(metrics.connections, 1)
+
+        self._send({
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        })
+
+        self.assertEqual(metrics.requests, 1)
+        self.assertEqual(metrics.signatures, 1)
+        self.assertEqual(metrics.in_flight, 0)
+
+        self.protocol.connection_lost(None)
+        self.assertEqual(metrics.connections, 0)
+
+    def test_batch_max_size(self) -> None:
+        """
+        Client sends the biggest batch allowed, with the full instrument in
+        every order.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de'
+
+        order = {
+            'type': 'spot',
+
+            'instrument': {
+                'symbol': 'LEVETH',
+                'quote': {
+                    'address': '0x0000000000000000000000000000000000000000',
+                    'decimals': 18,
+                },
+                'base': {
+                    'address': '0x167cdb1aC9979A6a694B368ED3D2bF9259Fa8282',
+                    'decimals': 9,
+                },
+            },
+
+            'order': {
+                'accountId': '0x167cdb1aC9979A6a694B368ED3D2bF9259Fa8282',
+                'side': 'buy',
+                'quantity': 12.3343,
+                'price': 23.44322,
+                'orderType': 'LMT',
+                'instrument': 'LEVETH',
+                'timestamp': 12382173200872,
+                'expiryTime': 1238217320021122,
+            },
+
+            'signer':
+                '0xb98ea45b6515cbd6a5c39108612b2cd5ae184d5eb0d72b21389a1fe6'
+                'db01fe0d',
+        }
+
+        data = dumps({
+            'type': 'batch',
+            'orders': [order] * MAX_BATCH_SIZE,
+        }).encode('utf-8') + self.protocol.delimiter
+
+        for i in range(0, len(data), 65536):
+            self.protocol.data_received(data[i:i + 65536])
+
+        response = loads(self.transport.value())
+        self.assertEqual(len(response['results']), MAX_BATCH_SIZE)
+
+    def test_workers_in_request_order(self) -> None:
+        """
+        Responses from the worker pool are sent in the same order as the
+        requests, even if the signatures finish in a different order.
+        """
+        executor = MockExecutor()
+        self._connect(SigningServer(
+            workers=2,
+            executor=executor,
+            loop=self.loop,
+        ))
+
+        request = {
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        }
+
+        self._send(request, request)
+        self.assertEqual(len(executor.futures), 2)
+
+        executor.futures[1].set_result('0xdeadbeef')
+        self._run_once()
+        self.assertEqual(self.transport.value(), b'')
+
+        executor.futures[0].set_result('0xb4dc0de')
+        self._run_once()
+
+        self._expect(
+            {'ok': True, 'signature': '0xb4dc0de'},
+            {'ok': True, 'signature': '0xdeadbeef'},
+        )
+
+    def test_workers_result_cache(self) -> None:
+        """
+        Cached signatures are returned without sending the order to a worker
+        process.
+        """
+        executor = MockExecutor()
+        self.order_signer = OrderSigner(result_cache_size=10)
+        self._connect(SigningServer(
+            workers=2,
+            executor=executor,
+            loop=self.loop,
+        ))
+
+        request = {
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        }
+
+        self._send(request)
+        executor.futures[0].set_result('0xb4dc0de')
+        self._run_once()
+
+        self._send(request)
+        self.assertEqual(len(executor.futures), 1)
+
+        self._expect(
+            {'ok': True, 'signature': '0xb4dc0de'},
+            {'ok': True, 'signature': '0xb4dc0de'},
+        )
+
+    def test_deadline_exceeded(self) -> None:
+        """
+        A request expires while it waits for a worker process, so the server
+        drops it instead of signing it.
+        """
+        executor = MockExecutor()
+        self._connect(SigningServer(
+            workers=1,
+            executor=executor,
+            loop=self.loop,
+        ))
+
+        order = {
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        }
+
+        # Only 2 orders are sent to the (single) worker at a time.
+        self._send({**order, 'id': 0}, {**order, 'id': 1})
+        self._send({**order, 'id': 2, 'ttl_ms': 1})
+
+        time.sleep(0.002)
+        executor.futures[0].set_result('0xb4dc0de')
+        self._run_once()
+
+        self.assertEqual(len(executor.futures), 2)
+
+        self._expect({
+            'id': 2,
+            'ok': False,
+            'error': {
+                'type': 'DeadlineExceeded',
+                'message': self._response(2)['error']['message'],
+                'context': self._response(2)['error']['context'],
+            },
+        }, {'id': 0, 'ok': True, 'signature': '0xb4dc0de'})
+
+    def test_overloaded(self) -> None:
+        """
+        Requests are rejected while too many are waiting to be signed.
+        """
+        executor = MockExecutor()
+        self._connect(SigningServer(
+            workers=1,
+            executor=executor,
+            max_queued=1,
+            loop=self.loop,
+        ))
+
+        order = {
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        }
+
+        # 2 orders are sent to the (single) worker, and 1 waits for it.
+        for i in range(4):
+            self._send({**order, 'id': i})
+
+        self.assertEqual(len(executor.futures), 2)
+
+        self._expect({
+            'id': 3,
+            'ok': False,
+            'error': {
+                'type': 'Overloaded',
+                'message':
+                    'Too many requests are waiting to be signed; '
+                    'try again later.',
+                'context': {'max_queued': 1},
+            },
+        })
+
+    def test_no_reactor(self) -> None:
+        """
+        The server doesn't install the Twisted reactor.
+        """
+        subprocess.check_call(
+            [
+                sys.executable,
+                '-c',
+                'import asyncio, sys\n'
+                'from ordersigner_daemon.aio import SigningServer\n'
+                'async def main(): SigningServer().shutdown()\n'
+                'asyncio.run(main())\n'
+                'assert "twisted.internet.reactor" not in sys.modules, '
+                '"The reactor was installed."',
+            ],
+
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+        )
+
+    def _response(self, request_id: int) -> dict:
+        """
+        Returns the response that the server sent for a request.
+        """
+        for line in self.transport.value().splitlines():
+            response = loads(line)
+
+            if response.get('id') == request_id:
+                return response
+
+        raise AssertionError(
+            'No response for request {id!r}.'.format(id=request_id),
+        )
+
+    def _run_once(self) -> None:
+        """
+        Runs the event loop until all pending callbacks have been called.
+        """
+        for _ in range(5):
+            self.loop.run_until_complete(asyncio.sleep(0))
+
+
+class ParseInterfaceTest(TestCase):
+    def test_unix(self) -> None:
+        self.assertEqual(
+            _parse_interface('unix:/tmp/leverj-ordersigner-daemon.sock'),
+            ('unix', {0: '/tmp/leverj-ordersigner-daemon.sock'}),
+        )
+
+    def test_tcp(self) -> None:
+        self.assertEqual(
+            _parse_interface('tcp:12345:interface=127.0.0.1'),
+            ('tcp', {0: '12345', 'interface': '127.0.0.1'}),
+        )
+
+
+class MockTransport(asyncio.Transport):
+    """
+    Records data that the protocol writes.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.data: typing.List[bytes] = []
+        self.writes = 0
+        self.closed = False
+
+    def value(self) -> bytes:
+        return b''.join(self.data)
+
+    def write(self, data: bytes) -> None:
+        self.writes += 1
+        self.data.append(data)
+
+    def writelines(self, data: typing.Iterable[bytes]) -> None:
+        self.writes += 1
+        self.data.extend(data)
+
+    def is_closing(self) -> bool:
+        return self.closed
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class MockExecutor:
+    """
+    Stands in for a ``ProcessPoolExecutor``, so that tests can control when
+    each job finishes.
+    """
+
+    def __init__(self) -> None:
+        self.futures: typing.List[Future] = []
+
+    def submit(self, fn: typing.Callable, *args) -> Future:
+        future = Future()
+        self.futures.append(future)
+        return future
@@ -0,0 +1,246 @@
+import struct
+from unittest import TestCase
+
+import filters as f
+from filters.test import BaseFilterTestCase
+from twisted.internet import address, task, testing
+
+from ordersigner_daemon import Order
+from ordersigner_daemon.binary import BinaryOrderSignerRequest, \
+    BinarySigningProtocol, MsgpackDecode, pack, unpack
+from ordersigner_daemon.protocol import SigningProtocol, SigningProtocolFactory
+from ordersigner_daemon.testing import MockOrderSigner
+from ordersigner_daemon.validation import MAX_BATCH_SIZE, \
+    MAX_REQUEST_LENGTH
+
+
+class BinarySigningProtocolTest(TestCase):
+    def setUp(self) -> None:
+        factory = SigningProtocolFactory().share(BinarySigningProtocol)
+
+        self.order_signer = MockOrderSigner()
+
+        self.protocol: BinarySigningProtocol = \
+            factory.buildProtocol(address.UNIXAddress(b'test'))
+        self.protocol.order_signer = self.order_signer
+        self.protocol.print_exceptions = False
+        self.protocol.clock = task.Clock()
+
+        self.transport = testing.StringTransport()
+
+        self.protocol.makeConnection(self.transport)
+
+    def _send(self, payload: dict) -> None:
+        """
+        Simulates sending a payload to the server.
+        """
+        frame = pack(payload)
+        self.protocol.dataReceived(struct.pack('!I', len(frame)) + frame)
+
+    def _expect(self, *payloads: dict) -> None:
+        """
+        Asserts that the server sent back the correct responses.
+        """
+        data = self.transport.value()
+        responses = []
+
+        while data:
+            length, = struct.unpack('!I', data[:4])
+            responses.append(unpack(data[4:4 + length]))
+            data = data[4 + length:]
+
+        self.assertListEqual(responses, list(payloads))
+
+    def test_spot_success(self) -> None:
+        """
+        Client sends a valid spot transaction for signing; the signature is
+        sent back as raw bytes.
+        """
+        self.order_signer.spot_sig = '0x' + 'b4dc0de5' * 16 + '1b'
+
+        self._send({
+            'id': 1,
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        })
+
+        self._expect({
+            'id': 1,
+            'ok': True,
+            'signature': bytes.fromhex('b4dc0de5' * 16 + '1b'),
+        })
+
+        self.assertEqual(self.protocol.metrics.signatures, 1)
+
+    def test_batch(self) -> None:
+        """
+        Client sends a batch of orders for signing.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de5'
+        self.order_signer.futures_sig = ValueError('Invalid signer.')
+
+        self._send({
+            'type': 'batch',
+
+            'orders': [
+                {
+                    'type': 'spot',
+                    'instrument': {'symbol': 'LEVETH'},
+                    'order': {'side': 'buy'},
+                    'signer': '0x1337',
+                },
+
+                {
+                    'type': 'futures',
+                    'instrument': {'symbol': 'LEVETH'},
+                    'order': {'side': 'sell'},
+                    'signer': '0x1337',
+                },
+            ],
+        })
+
+        self._expect({
+            'ok': True,
+
+            'results': [
+                {
+                    'ok': True,
+                    'signature': b'\xb4\xdc\x0d\xe5',
+                },
+
+                {
+                    'ok': False,
+                    'error': {
+                        'type': 'ValueError',
+                        'message': 'Invalid signer.',
+                        'context': {},
+                    },
+                },
+            ],
+        })
+
+        self.assertEqual(self.protocol.metrics.signatures, 1)
+        self.assertEqual(self.protocol.metrics.signing_errors, 1)
+
+    def test_batch_max_size(self) -> None:
+        """
+        Client sends the biggest batch allowed, in a frame that is almost as
+        long as the biggest request allowed.
+        """
+        self.order_signer.spot_sig = '0x' + 'ab' * 65
+
+        order = {
+            'type': 'spot',
+
+            'instrument': {
+                'symbol': 'LEVETH',
+                'name': 'x' * (MAX_REQUEST_LENGTH // MAX_BATCH_SIZE - 200),
+            },
+
+            'order': {
+                'accountId': '0x167cdb1aC9979A6a694B368ED3D2bF9259Fa8282',
+                'side': 'buy',
+                'quantity': 12.3343,
+                'price': 23.44322,
+            },
+
+            'signer': '0x1337',
+        }
+
+        frame = pack({
+            'id': 42,
+            'type': 'batch',
+            'orders': [order] * MAX_BATCH_SIZE,
+        })
+
+        self.assertGreater(len(frame), MAX_REQUEST_LENGTH * 0.9)
+        self.assertLessEqual(len(frame), MAX_REQUEST_LENGTH)
+
+        data = struct.pack('!I', len(frame)) + frame
+
+        for i in range(0, len(data), 65536):
+            self.protocol.dataReceived(data[i:i + 65536])
+
+        self.assertFalse(self.transport.disconnecting)
+
+        data = self.transport.value()
+        response = unpack(data[4:])
+
+        self.assertEqual(response['id'], 42)
+        self.assertEqual(len(response['results']), MAX_BATCH_SIZE)
+
+    def test_validation_error(self) -> None:
+        """
+        The input does not pass validation.
+        """
+        self._send({
+            'id': 'abc',
+            'type': 'spot',
+            'instrument': None,
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        })
+
+        self._expect({
+            'id': 'abc',
+            'ok': False,
+            'error': {
+                'type': ValueError.__name__,
+                'message': SigningProtocol.MSG_VALIDATION_FAILED,
+                'context': {
+                    'instrument': [{
+                        'code': f.Required.CODE_EMPTY,
+                        'message': f.Required.templates[f.Required.CODE_EMPTY],
+                    }]
+                }
+            }
+        })
+
+    def test_not_msgpack(self) -> None:
+        """
+        The frame does not contain valid msgpack.
+        """
+        self.protocol.dataReceived(b'\x00\x00\x00\x01\xc1')
+
+        self._expect({
+            'ok': False,
+            'error': {
+                'type': ValueError.__name__,
+                'message': SigningProtocol.MSG_VALIDATION_FAILED,
+                'context': {
+                    '': [{
+                        'code': MsgpackDecode.CODE_INVALID,
+                        'message':
+                            MsgpackDecode.templates[MsgpackDecode.CODE_INVALID],
+                    }]
+                }
+            }
+        })
+
+
+class BinaryOrderSignerRequestTest(BaseFilterTestCase):
+    filter_type = BinaryOrderSignerRequest
+
+    def test_pass_happy_path(self) -> None:
+        """
+        The request is valid.
+        """
+        request = {
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        }
+
+        self.assertFilterPasses(pack(request), Order(**request))
+
+    def test_fail_not_msgpack(self) -> None:
+        """
+        The request is not valid msgpack.
+        """
+        self.assertFilterErrors(
+            b'\xc1',
+            {'': [MsgpackDecode.CODE_INVALID]},
+        )
@@ -0,0 +1,85 @@
+from unittest import TestCase
+
+from ordersigner_daemon.cache import ExpiringLruCache, LruCache
+
+
+class LruCacheTest(TestCase):
+    def test_get_missing(self) -> None:
+        """
+        Getting a key that isn't in the cache.
+        """
+        cache = LruCache(2)
+
+        self.assertIsNone(cache.get('foo'))
+        self.assertEqual(cache.get('foo', 42), 42)
+
+    def test_evict_least_recently_used(self) -> None:
+        """
+        When the cache is full, the least-recently-used entry is evicted.
+        """
+        cache = LruCache(2)
+
+        cache.set('foo', 1)
+        cache.set('bar', 2)
+
+        # Using ``foo`` makes ``bar`` the least-recently-used entry.
+        self.assertEqual(cache.get('foo'), 1)
+
+        cache.set('baz', 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIn('foo', cache)
+        self.assertNotIn('bar', cache)
+        self.assertIn('baz', cache)
+
+    def test_hits_and_misses(self) -> None:
+        """
+        The cache keeps count of hits and misses.
+        """
+        cache = LruCache(2)
+        cache.set('foo', 1)
+
+        cache.get('foo')
+        cache.get('foo')
+        cache.get('bar')
+
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 1)
+
+
+class ExpiringLruCacheTest(TestCase):
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.cache = ExpiringLruCache(2, ttl=10.0, clock=lambda: self.now)
+
+    def test_get_before_expiry(self) -> None:
+        """
+        Getting an entry that hasn't expired yet.
+        """
+        self.cache.set('foo', 1)
+        self.now = 9.9
+
+        self.assertEqual(self.cache.get('foo'), 1)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_get_after_expiry(self) -> None:
+        """
+        Expired entries are removed, and count as a miss.
+        """
+        self.cache.set('foo', 1)
+        self.now = 10.0
+
+        self.assertEqual(self.cache.get('foo', 42), 42)
+        self.assertNotIn('foo', self.cache)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_set_resets_expiry(self) -> None:
+        """
+        Setting an entry again restarts its TTL.
+        """
+        self.cache.set('foo', 1)
+        self.now = 5.0
+        self.cache.set('foo', 2)
+        self.now = 12.0
+
+        self.assertEqual(self.cache.get('foo'), 2)
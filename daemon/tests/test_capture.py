@@ -0,0 +1,131 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from ujson import dumps, loads
+
+from ordersigner_daemon.capture import REDACTED_PREFIX, TrafficCapture, \
+    redact_signers
+
+
+class TrafficCaptureTest(TestCase):
+    def setUp(self) -> None:
+        self.dir = TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'capture.log')
+
+    def tearDown(self) -> None:
+        self.dir.cleanup()
+
+    def _read(self, path: str = None) -> list:
+        with open(path or self.path, 'rb') as f:
+            return [line.rstrip(b'\n').split(b'\t', 1) for line in f]
+
+    def test_record(self) -> None:
+        """
+        Requests are captured with their arrival times.
+        """
+        capture = TrafficCapture(self.path, redact=False, clock=lambda: 12.5)
+
+        capture.record(b'{"type":"spot"}')
+        capture.close()
+
+        self.assertEqual(self._read(), [[b'12.500000', b'{"type":"spot"}']])
+
+    def test_sample_rate(self) -> None:
+        """
+        Only a fraction of requests are captured.
+        """
+        samples = iter([0.1, 0.6, 0.3])
+
+        capture = TrafficCapture(
+            self.path,
+            redact=False,
+            sample_rate=0.5,
+            random_=lambda: next(samples),
+        )
+
+        for i in range(3):
+            capture.record(dumps({'id': i}).encode('utf-8'))
+
+        capture.close()
+
+        self.assertEqual(
+            [loads(request)['id'] for _, request in self._read()],
+            [0, 2],
+        )
+
+    def test_redact(self) -> None:
+        """
+        Signers are redacted by default; requests that can't be checked for
+        private keys are skipped.
+        """
+        capture = TrafficCapture(self.path)
+
+        capture.record(b'{"type":"spot","signer":"0x1337"}')
+        capture.record(b'not json; 0x1337')
+        capture.close()
+
+        records = self._read()
+        self.assertEqual(len(records), 1)
+        self.assertNotIn(b'0x1337', records[0][1])
+        self.assertEqual(capture.skipped, 1)
+
+    def test_rotate(self) -> None:
+        """
+        The file is rotated once it reaches ``max_bytes``.
+        """
+        capture = TrafficCapture(
+            self.path,
+            max_bytes=40,
+            backup_count=2,
+            redact=False,
+            clock=lambda: 1.0,
+        )
+
+        # Each record is 18 bytes long.
+        for i in range(7):
+            capture.record(b'{"id":%d}' % i)
+
+        capture.close()
+
+        self.assertEqual(
+            [loads(r)['id'] for _, r in self._read(self.path + '.2')],
+            [2, 3],
+        )
+
+        self.assertEqual(
+            [loads(r)['id'] for _, r in self._read(self.path + '.1')],
+            [4, 5],
+        )
+
+        self.assertEqual([loads(r)['id'] for _, r in self._read()], [6])
+        self.assertFalse(os.path.exists(self.path + '.3'))
+
+
+class RedactSignersTest(TestCase):
+    def test_batch(self) -> None:
+        """
+        Signers in batch requests are redacted, and the same signer is always
+        redacted the same way.
+        """
+        redacted = loads(redact_signers(dumps({
+            'type': 'batch',
+            'orders': [
+                {'type': 'spot', 'signer': '0x1337'},
+                {'type': 'spot', 'signer': '0x1337'},
+                {'type': 'spot', 'signer': '0xbeef'},
+            ],
+        }).encode('utf-8')))
+
+        signers = [order['signer'] for order in redacted['orders']]
+
+        self.assertTrue(signers[0].startswith(REDACTED_PREFIX))
+        self.assertEqual(signers[0], signers[1])
+        self.assertNotEqual(signers[0], signers[2])
+
+    def test_invalid(self) -> None:
+        """
+        Attempting to redact a request that isn't a JSON object.
+        """
+        with self.assertRaises(ValueError):
+            redact_signers(b'[1, 2, 3]')
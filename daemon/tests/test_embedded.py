@@ -0,0 +1,102 @@
+from unittest import TestCase
+
+from twisted.internet import task
+
+from ordersigner_daemon.embedded import EmbeddedSigningProtocol
+from ordersigner_daemon.protocol import SigningProtocolFactory
+from ordersigner_daemon.testing import MockOrderSigner
+
+
+class EmbeddedSigningProtocolTest(TestCase):
+    def setUp(self) -> None:
+        factory = SigningProtocolFactory().share(EmbeddedSigningProtocol)
+
+        self.order_signer = MockOrderSigner()
+
+        self.protocol: EmbeddedSigningProtocol = factory.buildProtocol(None)
+        self.protocol.order_signer = self.order_signer
+        self.protocol.clock = task.Clock()
+
+        self.transport = ListTransport()
+        self.protocol.makeConnection(self.transport)
+
+    def test_success(self) -> None:
+        """
+        The payload is signed, and the result is written without being
+        encoded.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de'
+
+        self.protocol.requestReceived({
+            'id': 1,
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        })
+
+        self.assertEqual(self.transport.results, [{
+            'id': 1,
+            'ok': True,
+            'signature': '0xb4dc0de',
+        }])
+
+        self.assertEqual(
+            self.order_signer.spot_args,
+            ({'side': 'buy'}, {'symbol': 'LEVETH'}, '0x1337'),
+        )
+
+    def test_validation_error(self) -> None:
+        """
+        The payload is invalid; the error response includes the request ID.
+        """
+        self.protocol.requestReceived({
+            'id': 2,
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+        })
+
+        self.assertEqual(len(self.transport.results), 1)
+
+        result = self.transport.results[0]
+        self.assertEqual(result['id'], 2)
+        self.assertFalse(result['ok'])
+        self.assertEqual(result['error']['type'], 'ValueError')
+        self.assertIn('signer', result['error']['context'])
+
+    def test_signing_error(self) -> None:
+        """
+        The order can't be signed.
+        """
+        self.order_signer.futures_sig = ValueError('Invalid signer.')
+
+        self.protocol.requestReceived({
+            'id': 3,
+            'type': 'futures',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'sell'},
+            'signer': '0x1337',
+        })
+
+        self.assertEqual(self.transport.results, [{
+            'id': 3,
+            'ok': False,
+            'error': {
+                'type': 'ValueError',
+                'message': 'Invalid signer.',
+                'context': {},
+            },
+        }])
+
+
+class ListTransport:
+    """
+    Collects the results that the protocol writes.
+    """
+
+    def __init__(self) -> None:
+        self.results = []
+
+    def writeSequence(self, results) -> None:
+        self.results.extend(results)
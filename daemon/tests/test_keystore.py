@@ -0,0 +1,82 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from ujson import dumps
+
+from ordersigner_daemon.keystore import Keystore
+
+PRIVATE_KEY = \
+    '0xb98ea45b6515cbd6a5c39108612b2cd5ae184d5eb0d72b21389a1fe6db01fe0d'
+
+ADDRESS = '0x202a093BEaa3b1e52C393Ea2c4e2C935B48c0b8e'
+
+
+class KeystoreTest(TestCase):
+    def test_get_by_alias(self) -> None:
+        """
+        Looking up a key by its alias.
+        """
+        keystore = Keystore({'market-maker': PRIVATE_KEY})
+
+        self.assertEqual(
+            keystore.get('market-maker').to_hex(),
+            PRIVATE_KEY,
+        )
+
+    def test_get_by_address(self) -> None:
+        """
+        Looking up a key by its address, with or without checksum.
+        """
+        keystore = Keystore({'market-maker': PRIVATE_KEY})
+
+        self.assertEqual(keystore.get(ADDRESS).to_hex(), PRIVATE_KEY)
+        self.assertEqual(keystore.get(ADDRESS.lower()).to_hex(), PRIVATE_KEY)
+
+    def test_get_missing(self) -> None:
+        """
+        Looking up a key that isn't in the keystore.
+        """
+        keystore = Keystore({'market-maker': PRIVATE_KEY})
+
+        self.assertIsNone(keystore.get('arbitrage'))
+        self.assertIsNone(keystore.get(PRIVATE_KEY))
+
+    def test_invalid_key(self) -> None:
+        """
+        The keystore contains an invalid private key.
+        """
+        with self.assertRaises(ValueError):
+            Keystore({'market-maker': '0x1337'})
+
+    def test_load_file(self) -> None:
+        """
+        Loading keys from a JSON file.
+        """
+        with TemporaryDirectory() as path:
+            filename = os.path.join(path, 'keys.json')
+
+            with open(filename, 'w') as f:
+                f.write(dumps({'market-maker': PRIVATE_KEY}))
+
+            keystore = Keystore.load(filename)
+
+        self.assertEqual(
+            keystore.get('market-maker').to_hex(),
+            PRIVATE_KEY,
+        )
+
+    def test_load_directory(self) -> None:
+        """
+        Loading keys from a directory.
+        """
+        with TemporaryDirectory() as path:
+            with open(os.path.join(path, 'market-maker.key'), 'w') as f:
+                f.write(PRIVATE_KEY + '\n')
+
+            keystore = Keystore.load(path)
+
+        self.assertEqual(
+            keystore.get('market-maker').to_hex(),
+            PRIVATE_KEY,
+        )
@@ -0,0 +1,104 @@
+from unittest import TestCase
+
+from twisted.web.test.requesthelper import DummyRequest
+
+from ordersigner_daemon.cache import LruCache
+from ordersigner_daemon.metrics import Histogram, Metrics, MetricsResource
+
+
+class HistogramTest(TestCase):
+    def test_empty(self) -> None:
+        """
+        Getting a percentile from an empty histogram.
+        """
+        self.assertEqual(Histogram().percentile(99), 0.0)
+
+    def test_percentile(self) -> None:
+        """
+        Percentiles are accurate to within about 1%.
+        """
+        histogram = Histogram()
+
+        # 1 to 1000 microseconds.
+        for i in range(1, 1001):
+            histogram.record(i / 1_000_000)
+
+        self.assertEqual(histogram.count, 1000)
+        self.assertAlmostEqual(histogram.sum, 0.5005)
+
+        for q, expected in ((50, 0.0005), (99, 0.00099), (100, 0.001)):
+            self.assertAlmostEqual(
+                histogram.percentile(q),
+                expected,
+                delta=expected * 0.01,
+            )
+
+    def test_max(self) -> None:
+        """
+        Percentiles never exceed the largest recorded value.
+        """
+        histogram = Histogram()
+        histogram.record(0.123456)
+
+        self.assertEqual(histogram.percentile(100), 0.123456)
+
+    def test_buckets(self) -> None:
+        """
+        Every value falls into a bucket whose bounds contain it.
+        """
+        histogram = Histogram()
+
+        for value in range(0, 100000, 7):
+            index = histogram._index(value)
+
+            self.assertGreaterEqual(histogram._upper_bound(index), value)
+
+            if index:
+                self.assertLess(histogram._upper_bound(index - 1), value)
+
+
+class MetricsTest(TestCase):
+    def test_render(self) -> None:
+        """
+        Rendering metrics in Prometheus text format.
+        """
+        metrics = Metrics()
+        metrics.requests = 3
+        metrics.in_flight = 1
+        metrics.sign['spot'].record(0.25)
+
+        cache = LruCache(1)
+        cache.get('foo')
+        metrics.caches['result'] = cache
+
+        lines = metrics.render().splitlines()
+
+        self.assertIn('# TYPE ordersigner_requests_total counter', lines)
+        self.assertIn('ordersigner_requests_total 3', lines)
+        self.assertIn('ordersigner_requests_in_flight 1', lines)
+
+        self.assertIn(
+            'ordersigner_sign_seconds{type="spot",quantile="0.99"} 0.25',
+            lines,
+        )
+        self.assertIn('ordersigner_sign_seconds_sum{type="spot"} 0.25', lines)
+        self.assertIn('ordersigner_sign_seconds_count{type="spot"} 1', lines)
+        self.assertIn('ordersigner_decode_seconds_count 0', lines)
+
+        self.assertIn('ordersigner_cache_misses_total{cache="result"} 1', lines)
+
+    def test_resource(self) -> None:
+        """
+        Serving metrics over HTTP.
+        """
+        metrics = Metrics()
+        request = DummyRequest([b''])
+
+        body = MetricsResource(metrics).render_GET(request)
+
+        self.assertEqual(body, metrics.render().encode('utf-8'))
+
+        self.assertEqual(
+            request.responseHeaders.getRawHeaders(b'Content-Type'),
+            [b'text/plain; version=0.0.4; charset=utf-8'],
+        )
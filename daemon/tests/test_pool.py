@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+import signal
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest import TestCase
+
+from ordersigner_daemon import Order, OrderSigner, worker
+from ordersigner_daemon.pool import SigningPool, ThreadSigningPool
+
+
+class SigningPoolTest(TestCase):
+    def setUp(self) -> None:
+        self.executor = MockExecutor()
+        self.pool = SigningPool(
+            workers=2,
+            use_reactor=MockReactor(),
+            executor=self.executor,
+        )
+
+        self.order = Order(
+            type='spot',
+            instrument={'symbol': 'LEVETH'},
+            order={'side': 'buy'},
+            signer='0x1337',
+        )
+
+    def test_success(self) -> None:
+        """
+        The worker process returns a signature.
+        """
+        d = self.pool.sign(self.order)
+
+        self.assertEqual(self.executor.submitted, [(worker.sign, self.order)])
+
+        results = []
+        d.addCallback(results.append)
+
+        self.executor.futures[0].set_result('0xb4dc0de')
+        self.assertEqual(results, ['0xb4dc0de'])
+
+    def test_failure(self) -> None:
+        """
+        The worker process raises an exception.
+        """
+        d = self.pool.sign(self.order)
+
+        failures = []
+        d.addErrback(failures.append)
+
+        error = ValueError('The private key must be exactly 32 bytes long.')
+        self.executor.futures[0].set_exception(error)
+
+        self.assertEqual(len(failures), 1)
+        self.assertIs(failures[0].value, error)
+
+    def test_sign_many(self) -> None:
+        """
+        A batch of orders is split between the worker processes.
+        """
+        orders = [self.order] * 3
+        d = self.pool.sign_many(orders)
+
+        self.assertEqual(
+            self.executor.submitted,
+
+            [
+                (worker.sign_many, orders[:2]),
+                (worker.sign_many, orders[2:]),
+            ],
+        )
+
+        results = []
+        d.addCallback(results.append)
+
+        error = ValueError('Invalid signer.')
+        self.executor.futures[1].set_result([error])
+        self.executor.futures[0].set_result(['0xb4dc0de', '0xb4dc0de'])
+
+        self.assertEqual(results, [['0xb4dc0de', '0xb4dc0de', error]])
+
+
+class ThreadSigningPoolTest(TestCase):
+    def setUp(self) -> None:
+        self.executor = MockExecutor()
+        self.pool = ThreadSigningPool(
+            use_reactor=MockReactor(),
+            executor=self.executor,
+        )
+
+        self.order = Order(
+            type='spot',
+            instrument={'symbol': 'LEVETH'},
+            order={'side': 'buy'},
+            signer='0x1337',
+        )
+
+    def test_sign(self) -> None:
+        """
+        The order is signed by the thread's own order signer.
+        """
+        d = self.pool.sign(self.order)
+
+        self.assertEqual(
+            self.executor.submitted,
+            [(self.pool.order_signer.sign, self.order)],
+        )
+
+        results = []
+        d.addCallback(results.append)
+
+        self.executor.futures[0].set_result('0xb4dc0de')
+        self.assertEqual(results, ['0xb4dc0de'])
+
+    def test_sign_many(self) -> None:
+        """
+        A batch of orders is signed in one go.
+        """
+        orders = [self.order] * 3
+        self.pool.sign_many(orders)
+
+        self.assertEqual(
+            self.executor.submitted,
+            [(self.pool.order_signer.sign_many, orders)],
+        )
+
+
+class WorkerTest(TestCase):
+    def test_signal_handlers(self) -> None:
+        """
+        Worker processes don't inherit the daemon's signal handlers, so that
+        they can be stopped with SIGTERM.
+        """
+        # Simulate the handler that the reactor installs.
+        previous = signal.signal(signal.SIGTERM, lambda *_: None)
+        self.addCleanup(signal.signal, signal.SIGTERM, previous)
+
+        executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=worker.initialize,
+            initargs=(OrderSigner, None),
+        )
+        self.addCleanup(executor.shutdown)
+
+        pid = executor.submit(os.getpid).result(timeout=10)
+        os.kill(pid, signal.SIGTERM)
+
+        with self.assertRaises(BrokenProcessPool):
+            executor.submit(os.getpid).result(timeout=10)
+
+
+class MockExecutor:
+    """
+    Executor that never runs anything; tests resolve the futures manually.
+    """
+
+    def __init__(self) -> None:
+        self.futures = []
+        self.submitted = []
+
+    def submit(self, fn, *args) -> Future:
+        future = Future()
+        self.futures.append(future)
+        self.submitted.append((fn, *args))
+        return future
+
+    def shutdown(self, wait: bool = True) -> None:
+        pass
+
+
+class MockReactor:
+    """
+    Runs thread callbacks immediately.
+    """
+
+    def callFromThread(self, fn, *args) -> None:
+        fn(*args)
@@ -0,0 +1,185 @@
+from unittest import TestCase
+
+from twisted.internet import defer, task
+
+from ordersigner_daemon import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL
+from ordersigner_daemon.scheduler import DeadlineExceeded, Overloaded, \
+    SigningScheduler
+
+
+class SigningSchedulerTest(TestCase):
+    def setUp(self) -> None:
+        self.started = []
+        self.clock = task.Clock()
+
+    def _scheduler(self, **kwargs) -> SigningScheduler:
+        scheduler = SigningScheduler(**kwargs)
+        scheduler.clock = self.clock
+        return scheduler
+
+    def _submit(
+            self,
+            scheduler: SigningScheduler,
+            priority: int,
+            name: str,
+            **kwargs,
+    ) -> defer.Deferred:
+        return scheduler.submit(priority, self.started.append, name, **kwargs)
+
+    def test_start_immediately(self) -> None:
+        """
+        Work starts as soon as it is submitted, if the scheduler is idle.
+        """
+        scheduler = self._scheduler()
+
+        d = scheduler.submit(None, lambda x: x * 2, 21)
+
+        self.assertEqual(d.result, 42)
+        self.assertEqual(len(scheduler), 0)
+        self.assertEqual(scheduler.in_flight, 0)
+
+    def test_strict(self) -> None:
+        """
+        More urgent work always goes first.
+        """
+        scheduler = self._scheduler()
+
+        scheduler.hold()
+        self._submit(scheduler, PRIORITY_LOW, 'low')
+        self._submit(scheduler, PRIORITY_NORMAL, 'normal')
+        self._submit(scheduler, PRIORITY_HIGH, 'high 1')
+        self._submit(scheduler, PRIORITY_HIGH, 'high 2')
+
+        self.assertEqual(self.started, [])
+        self.assertEqual(scheduler.metrics.queued, 4)
+
+        scheduler.release()
+
+        self.assertEqual(self.started, ['high 1', 'high 2', 'normal', 'low'])
+        self.assertEqual(scheduler.metrics.queued, 0)
+        self.assertEqual(scheduler.metrics.queue['low'].count, 1)
+
+    def test_weighted(self) -> None:
+        """
+        Each priority gets its share of turns, so that less urgent work is
+        not starved.
+        """
+        scheduler = self._scheduler(weights=(2, 1, 1))
+
+        scheduler.hold()
+
+        for _ in range(3):
+            self._submit(scheduler, PRIORITY_LOW, 'low')
+            self._submit(scheduler, PRIORITY_HIGH, 'high')
+
+        scheduler.release()
+
+        self.assertEqual(
+            self.started,
+            ['high', 'high', 'low', 'high', 'low', 'low'],
+        )
+
+    def test_max_in_flight(self) -> None:
+        """
+        Work waits for a free slot, and urgent work can overtake work that
+        is already waiting.
+        """
+        scheduler = self._scheduler(max_in_flight=1)
+        pending = []
+
+        def start(name: str) -> defer.Deferred:
+            self.started.append(name)
+            pending.append(defer.Deferred())
+            return pending[-1]
+
+        first = scheduler.submit(PRIORITY_NORMAL, start, 'first')
+        scheduler.submit(PRIORITY_LOW, start, 'low')
+        scheduler.submit(PRIORITY_HIGH, start, 'high')
+
+        self.assertEqual(self.started, ['first'])
+
+        pending[0].callback('0xf1rst')
+
+        self.assertEqual(first.result, '0xf1rst')
+        self.assertEqual(self.started, ['first', 'high'])
+
+        pending[1].callback('0xh1gh')
+        self.assertEqual(self.started, ['first', 'high', 'low'])
+
+    def test_slice_duration(self) -> None:
+        """
+        The scheduler gives the reactor a turn once it has been starting work
+        for too long.
+        """
+        scheduler = self._scheduler(slice_duration=0)
+
+        scheduler.hold()
+        self._submit(scheduler, PRIORITY_NORMAL, 'normal')
+        self._submit(scheduler, PRIORITY_LOW, 'low')
+        scheduler.release()
+
+        self.assertEqual(self.started, ['normal'])
+
+        # A more urgent request arrives in the meantime.
+        self._submit(scheduler, PRIORITY_HIGH, 'high')
+        self.assertEqual(self.started, ['normal', 'high'])
+
+        self.clock.advance(0)
+        self.assertEqual(self.started, ['normal', 'high', 'low'])
+
+    def test_errors(self) -> None:
+        """
+        Errors are passed through to the caller, and free up the slot.
+        """
+        scheduler = self._scheduler(max_in_flight=1)
+
+        d = scheduler.submit(PRIORITY_NORMAL, lambda: 1 / 0)
+
+        self.assertIsInstance(d.result.value, ZeroDivisionError)
+        self.assertEqual(scheduler.in_flight, 0)
+        d.addErrback(lambda _: None)
+
+    def test_deadline_exceeded(self) -> None:
+        """
+        Work that is still waiting when its deadline passes is dropped.
+        """
+        scheduler = self._scheduler(max_in_flight=1)
+        pending = defer.Deferred()
+
+        scheduler.submit(PRIORITY_NORMAL, lambda: pending)
+        d = self._submit(scheduler, PRIORITY_NORMAL, 'stale', deadline=0.0)
+
+        pending.callback(None)
+
+        self.assertIsInstance(d.result.value, DeadlineExceeded)
+        self.assertEqual(self.started, [])
+        self.assertEqual(scheduler.metrics.expired, 1)
+        self.assertEqual(scheduler.in_flight, 0)
+        d.addErrback(lambda _: None)
+
+    def test_overloaded(self) -> None:
+        """
+        New work is rejected once too much is waiting.
+        """
+        scheduler = self._scheduler(max_queued=2)
+
+        scheduler.hold()
+        self._submit(scheduler, PRIORITY_NORMAL, 'first')
+        self._submit(scheduler, PRIORITY_NORMAL, 'second')
+        d = self._submit(scheduler, PRIORITY_HIGH, 'third')
+
+        self.assertIsInstance(d.result.value, Overloaded)
+        self.assertEqual(d.result.value.context, {'max_queued': 2})
+        self.assertEqual(scheduler.metrics.rejected, 1)
+        d.addErrback(lambda _: None)
+
+        scheduler.release()
+        self.assertEqual(self.started, ['first', 'second'])
+
+    def test_invalid_weights(self) -> None:
+        """
+        There must be exactly one (positive) weight for each priority.
+        """
+        for weights in ((1, 1), (1, 0, 1), (1, 1, 1.5)):
+            with self.assertRaises(ValueError):
+                SigningScheduler(weights=weights)
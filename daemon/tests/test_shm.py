@@ -0,0 +1,232 @@
+import mmap
+import os
+import tempfile
+from unittest import TestCase
+
+from twisted.internet import protocol, task, testing
+
+from ordersigner_daemon.shm import CorruptRingBuffer, RingBuffer, \
+    ShmServerProtocol, ShmSigningFactory
+
+
+class RingBufferTest(TestCase):
+    def setUp(self) -> None:
+        self.memory = mmap.mmap(-1, RingBuffer.size(8))
+        self.ring = RingBuffer(self.memory, 0, 8)
+
+    def tearDown(self) -> None:
+        self.memory.close()
+
+    def test_write_read(self) -> None:
+        """
+        Data is read back in the order it was written.
+        """
+        self.assertEqual(self.ring.write(b'abc'), 3)
+        self.assertEqual(self.ring.write(b'de'), 2)
+
+        self.assertEqual(self.ring.available, 5)
+        self.assertEqual(self.ring.read(), b'abcde')
+        self.assertEqual(self.ring.read(), b'')
+
+    def test_wrap_around(self) -> None:
+        """
+        Writes that reach the end of the ring continue at the start.
+        """
+        self.ring.write(b'abcdef')
+        self.ring.read()
+
+        self.assertEqual(self.ring.write(b'ghijk'), 5)
+        self.assertEqual(self.ring.read(), b'ghijk')
+
+    def test_full(self) -> None:
+        """
+        Only as much data as fits is written.
+        """
+        self.assertEqual(self.ring.write(b'abcdefghij'), 8)
+        self.assertEqual(self.ring.write(b'k'), 0)
+
+        self.assertEqual(self.ring.read(), b'abcdefgh')
+        self.assertEqual(self.ring.write(b'k'), 1)
+
+    def test_sleep(self) -> None:
+        """
+        The producer only needs to ring the doorbell once the consumer has
+        gone to sleep, and only once each time.
+        """
+        self.ring.write(b'abc')
+        self.assertFalse(self.ring.needs_doorbell())
+
+        # Data arrived before the consumer went to sleep.
+        self.assertFalse(self.ring.sleep())
+        self.ring.read()
+        self.assertTrue(self.ring.sleep())
+
+        self.ring.write(b'de')
+        self.assertTrue(self.ring.needs_doorbell())
+
+        self.ring.write(b'f')
+        self.assertFalse(self.ring.needs_doorbell())
+
+    def test_corrupt_counters(self) -> None:
+        """
+        The other process wrote counters that the ring can't hold.
+        """
+        # More data than the ring can hold.
+        self.ring._store(RingBuffer._HEAD, 9)
+
+        with self.assertRaises(CorruptRingBuffer):
+            self.ring.read()
+
+        # Less than no data.
+        self.ring._store(RingBuffer._HEAD, 0)
+        self.ring._store(RingBuffer._TAIL, 1)
+
+        with self.assertRaises(CorruptRingBuffer):
+            self.ring.write(b'abc')
+
+
+class ShmServerProtocolTest(TestCase):
+    CAPACITY = 64
+
+    def setUp(self) -> None:
+        self.wrapped = RecordingProtocol()
+
+        factory = ShmSigningFactory(protocol.Factory.forProtocol(
+            lambda: self.wrapped,
+        ))
+
+        self.protocol: ShmServerProtocol = factory.buildProtocol(None)
+
+        self.clock = task.Clock()
+        self.protocol.clock = self.clock
+
+        self.transport = testing.StringTransport()
+        self.protocol.makeConnection(self.transport)
+
+        # Plays the part of the client's shared memory.
+        size = RingBuffer.size(self.CAPACITY)
+
+        fd, path = tempfile.mkstemp()
+        os.unlink(path)
+        os.ftruncate(fd, 2 * size)
+
+        self.memory = mmap.mmap(fd, 2 * size)
+        self.requests = RingBuffer(self.memory, 0, self.CAPACITY)
+        self.responses = RingBuffer(self.memory, size, self.CAPACITY)
+
+        self.protocol.fileDescriptorReceived(fd)
+
+    def tearDown(self) -> None:
+        self.protocol.connectionLost(None)
+        self.memory.close()
+
+    def test_requests_and_responses(self) -> None:
+        """
+        Requests are read from shared memory, and responses written to it.
+        """
+        # The client may write requests before the daemon has mapped the
+        # shared memory.
+        self.requests.write(b'{"type": "spot"}\n')
+        self.protocol.dataReceived(b'{"capacity": 64}\n\x01')
+
+        self.assertEqual(self.wrapped.received, b'{"type": "spot"}\n')
+
+        self.requests.write(b'{"type": "futures"}\n')
+        self.protocol.dataReceived(ShmServerProtocol.DOORBELL)
+
+        self.assertEqual(
+            self.wrapped.received,
+            b'{"type": "spot"}\n{"type": "futures"}\n',
+        )
+
+        # The client is waiting for responses.
+        self.assertTrue(self.responses.sleep())
+        self.wrapped.transport.writeSequence((b'{"ok": true}', b'\n'))
+
+        self.assertEqual(self.responses.read(), b'{"ok": true}\n')
+        self.assertEqual(self.transport.value(), ShmServerProtocol.DOORBELL)
+
+    def test_doorbell(self) -> None:
+        """
+        The doorbell is only rung when the other side is waiting for it.
+        """
+        self.protocol.dataReceived(b'{"capacity": 64}\n')
+
+        # The daemon read every request, then went to sleep.
+        self.requests.write(b'{"type": "spot"}\n')
+        self.assertTrue(self.requests.needs_doorbell())
+
+        self.protocol.dataReceived(ShmServerProtocol.DOORBELL)
+        self.assertEqual(self.wrapped.received, b'{"type": "spot"}\n')
+
+        # The client is busy, so it will find the responses without being
+        # woken up.
+        self.wrapped.transport.write(b'{"ok": true}\n')
+        self.assertEqual(self.transport.value(), b'')
+
+        # Once it goes to sleep, only the next response rings the doorbell.
+        self.responses.read()
+        self.assertTrue(self.responses.sleep())
+
+        self.wrapped.transport.write(b'{"ok": true}\n')
+        self.wrapped.transport.write(b'{"ok": false}\n')
+
+        self.assertEqual(self.transport.value(), ShmServerProtocol.DOORBELL)
+
+    def test_response_ring_full(self) -> None:
+        """
+        Responses that don't fit in the ring are sent once the client makes
+        room.
+        """
+        self.protocol.dataReceived(b'{"capacity": 64}\n')
+
+        self.wrapped.transport.write(b'x' * 100)
+        self.assertEqual(self.responses.read(), b'x' * 64)
+
+        self.clock.advance(ShmServerProtocol.retry_delay)
+        self.assertEqual(self.responses.read(), b'x' * 36)
+
+    def test_corrupt_request_ring(self) -> None:
+        """
+        The client corrupts the counters of the request ring.
+        """
+        self.protocol.dataReceived(b'{"capacity": 64}\n')
+
+        self.requests._store(RingBuffer._HEAD, 2 ** 40)
+        self.protocol.dataReceived(ShmServerProtocol.DOORBELL)
+
+        self.assertTrue(self.transport.disconnecting)
+        self.assertEqual(self.wrapped.received, b'')
+
+    def test_corrupt_response_ring(self) -> None:
+        """
+        The client corrupts the counters of the response ring.
+        """
+        self.protocol.dataReceived(b'{"capacity": 64}\n')
+
+        self.responses._store(RingBuffer._TAIL, 1)
+        self.wrapped.transport.write(b'{"ok": true}\n')
+
+        self.assertTrue(self.transport.disconnecting)
+        self.assertEqual(self.transport.value(), b'')
+
+    def test_invalid_handshake(self) -> None:
+        """
+        The client sends a handshake that doesn't fit the shared memory.
+        """
+        self.protocol.dataReceived(b'{"capacity": 1048576}\n')
+
+        self.assertTrue(self.transport.disconnecting)
+        self.assertIsNone(self.protocol.requests)
+
+
+class RecordingProtocol(protocol.Protocol):
+    """
+    Records the data that it receives.
+    """
+
+    def __init__(self) -> None:
+        self.received = b''
+
+    def dataReceived(self, data: bytes) -> None:
+        self.received += data
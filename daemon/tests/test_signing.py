@@ -0,0 +1,254 @@
+import pickle
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import TestCase
+from unittest.mock import patch
+
+from leverj_ordersigner import futures, spot
+from web3 import Web3
+
+from ordersigner_daemon import Order, OrderSigner, signing
+from ordersigner_daemon.keystore import Keystore, UnknownSigner
+
+# Taken from the tests for the ``leverj_ordersigner`` project.
+SPOT_INSTRUMENT = {
+    'symbol': 'LEVETH',
+    'quote': {
+        'address': '0x0000000000000000000000000000000000000000',
+        'decimals': 18,
+    },
+    'base': {
+        'address': '0x167cdb1aC9979A6a694B368ED3D2bF9259Fa8282',
+        'decimals': 9,
+    },
+}
+
+SPOT_ORDER = {
+    'accountId': '0x167cdb1aC9979A6a694B368ED3D2bF9259Fa8282',
+    'side': 'buy',
+    'quantity': 12.3343,
+    'price': 23.44322,
+    'orderType': 'LMT',
+    'instrument': 'LEVETH',
+    'timestamp': 12382173200872,
+    'expiryTime': 1238217320021122,
+}
+
+FUTURES_INSTRUMENT = {
+    'symbol': 'BTCDAI',
+    'quote': {
+        'address': '0x1D7e3a1A65a367db1D1D3F51A54aC01a2c4C92ff',
+        'decimals': 18,
+    },
+}
+
+FUTURES_ORDER = {
+    'accountId': '0x167cdb1aC9979A6a694B368ED3D2bF9259Fa8282',
+    'side': 'sell',
+    'quantity': 0.125,
+    'price': 9321.5,
+    'orderType': 'LMT',
+    'instrument': '1',
+    'marginPerFraction': '4660750000000000000',
+    'quote': '0x1D7e3a1A65a367db1D1D3F51A54aC01a2c4C92ff',
+    'timestamp': 12382173200872,
+}
+
+SIGNER = '0xb98ea45b6515cbd6a5c39108612b2cd5ae184d5eb0d72b21389a1fe6db01fe0d'
+
+SIGNATURE = '0xaad62800f307299a33dae10908c559bd7cd4658a3803e6b587e0f5bf95a052c17783324ec07b629c30e3a41eb20b4ace2787304c50a00b5cdcbd6bc22dbbded11b'
+
+
+class SigningTest(TestCase):
+    def test_spot_hash(self) -> None:
+        """
+        The spot hash matches the one computed by ``leverj_ordersigner``.
+        """
+        self.assertEqual(
+            signing.spot_hash(
+                SPOT_ORDER,
+                signing.prepare_instrument(SPOT_INSTRUMENT),
+            ),
+
+            Web3.soliditySha3(*spot._get_evm_parameters(
+                SPOT_ORDER,
+                SPOT_INSTRUMENT,
+                SIGNER,
+            )),
+        )
+
+    def test_futures_hash(self) -> None:
+        """
+        The futures hash matches the one computed by ``leverj_ordersigner``.
+        """
+        with redirect_stdout(StringIO()):
+            expected = Web3.soliditySha3(*futures._get_evm_parameters(
+                FUTURES_ORDER,
+                FUTURES_INSTRUMENT,
+                SIGNER,
+            ))
+
+        self.assertEqual(
+            signing.futures_hash(
+                FUTURES_ORDER,
+                signing.prepare_instrument(FUTURES_INSTRUMENT),
+            ),
+
+            expected,
+        )
+
+    def test_spot_hash_futures_instrument(self) -> None:
+        """
+        Attempting to sign a spot order using an instrument that doesn't have
+        a base token.
+        """
+        with self.assertRaises(ValueError):
+            signing.spot_hash(
+                SPOT_ORDER,
+                signing.prepare_instrument(FUTURES_INSTRUMENT),
+            )
+
+
+class OrderSignerTest(TestCase):
+    def test_sign_spot(self) -> None:
+        """
+        Signing a spot order produces the same signature as
+        ``leverj_ordersigner``.
+        """
+        self.assertEqual(
+            OrderSigner().sign_spot(SPOT_ORDER, SPOT_INSTRUMENT, SIGNER),
+            SIGNATURE,
+        )
+
+    def test_sign_keystore_alias(self) -> None:
+        """
+        Signing an order using a key from the keystore.
+        """
+        order_signer = OrderSigner(keystore=Keystore({'default': SIGNER}))
+
+        self.assertEqual(
+            order_signer.sign_spot(SPOT_ORDER, SPOT_INSTRUMENT, 'default'),
+            SIGNATURE,
+        )
+
+    def test_sign_invalid_signer(self) -> None:
+        """
+        Signing an order using an invalid private key.
+        """
+        with self.assertRaises(ValueError):
+            OrderSigner().sign_spot(SPOT_ORDER, SPOT_INSTRUMENT, '0x1337')
+
+    def test_sign_unknown_signer(self) -> None:
+        """
+        Signing an order using a signer that is neither in the keystore nor a
+        private key.
+        """
+        order_signer = OrderSigner(keystore=Keystore({'default': SIGNER}))
+
+        # The error must not echo the signer, in case it's a mistyped
+        # private key.
+        for signer in ['staging', SIGNER[2:], SIGNER + '00', '0x1337']:
+            with self.assertRaises(UnknownSigner) as context:
+                order_signer.sign_spot(SPOT_ORDER, SPOT_INSTRUMENT, signer)
+
+            self.assertNotIn(signer, str(context.exception))
+
+        # The error has to survive the trip back from a worker process.
+        error = pickle.loads(pickle.dumps(context.exception))
+        self.assertEqual(str(error), str(context.exception))
+
+    def test_context_cache(self) -> None:
+        """
+        Instruments with the same contents share a signing context.
+        """
+        order_signer = OrderSigner(context_cache_size=1)
+
+        context = order_signer._get_context(SPOT_INSTRUMENT)
+
+        self.assertIs(
+            order_signer._get_context(dict(SPOT_INSTRUMENT)),
+            context,
+        )
+
+        # The cache only has room for one instrument, so preparing another
+        # one evicts the first.
+        order_signer._get_context(FUTURES_INSTRUMENT)
+
+        self.assertIsNot(
+            order_signer._get_context(SPOT_INSTRUMENT),
+            context,
+        )
+
+    def test_prepared_instrument(self) -> None:
+        """
+        Signing an order using an instrument that was prepared ahead of time
+        (e.g., when a client registered it).
+        """
+        order_signer = OrderSigner(result_cache_size=10)
+        instrument = signing.PreparedInstrument(SPOT_INSTRUMENT)
+
+        # The instrument still looks like the original dict, so that
+        # subclasses of ``OrderSigner`` don't need to know about it.
+        self.assertEqual(instrument, SPOT_INSTRUMENT)
+
+        self.assertEqual(
+            order_signer.sign_spot(SPOT_ORDER, instrument, SIGNER),
+            SIGNATURE,
+        )
+
+        # The prepared context is used as-is, instead of going through the
+        # context cache.
+        self.assertEqual(order_signer.caches['context'].misses, 0)
+        self.assertEqual(order_signer.caches['context'].hits, 0)
+
+        order = Order(order_signer.TYPE_SPOT, SPOT_ORDER, instrument, SIGNER)
+        self.assertEqual(order_signer.sign(order), SIGNATURE)
+        self.assertEqual(order_signer.get_cached_signature(order), SIGNATURE)
+
+        # Prepared instruments can be sent to worker processes.
+        copied = pickle.loads(pickle.dumps(instrument))
+        self.assertEqual(copied, SPOT_INSTRUMENT)
+        self.assertEqual(copied.context, instrument.context)
+        self.assertEqual(copied.key, instrument.key)
+
+    def test_result_cache(self) -> None:
+        """
+        Signing the same order again returns the cached signature.
+        """
+        order_signer = OrderSigner(result_cache_size=10)
+        order = Order(
+            order_signer.TYPE_SPOT,
+            SPOT_ORDER,
+            SPOT_INSTRUMENT,
+            SIGNER,
+        )
+
+        self.assertEqual(order_signer.sign(order), SIGNATURE)
+        self.assertEqual(order_signer.results.misses, 1)
+
+        with patch.object(order_signer, '_sign') as sign:
+            self.assertEqual(order_signer.sign(order), SIGNATURE)
+
+        sign.assert_not_called()
+        self.assertEqual(order_signer.results.hits, 1)
+
+        # A different signer produces a different signature, so it must not
+        # share a cache entry.
+        other = order._replace(signer='0x' + '11' * 32)
+        self.assertIsNone(order_signer.get_cached_signature(other))
+
+    def test_result_cache_disabled(self) -> None:
+        """
+        The result cache is disabled by default.
+        """
+        order_signer = OrderSigner()
+        order = Order(
+            order_signer.TYPE_SPOT,
+            SPOT_ORDER,
+            SPOT_INSTRUMENT,
+            SIGNER,
+        )
+
+        self.assertIsNone(order_signer.results)
+        self.assertEqual(order_signer.sign(order), SIGNATURE)
+        self.assertIsNone(order_signer.get_cached_signature(order))
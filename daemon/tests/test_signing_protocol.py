@@ -1,14 +1,18 @@
+import time
+import typing
 from unittest import TestCase
 
 import filters as f
 from filters.test import BaseFilterTestCase
-from twisted.internet import address, testing
+from twisted.internet import address, defer, task, testing
 from ujson import dumps, loads
 
-from ordersigner_daemon import Order
+from ordersigner_daemon import Batch, Order, OrderSigner, RegisterInstrument
 from ordersigner_daemon.protocol import SigningProtocol, SigningProtocolFactory
+from ordersigner_daemon.scheduler import SigningScheduler
 from ordersigner_daemon.testing import MockOrderSigner
-from ordersigner_daemon.validation import OrderSignerRequest
+from ordersigner_daemon.validation import MAX_BATCH_SIZE, \
+    OrderSignerRequest, parse_request
 
 
 class SigningProtocolTest(TestCase):
@@ -22,7 +26,10 @@ class SigningProtocolTest(TestCase):
         self.protocol.order_signer = self.order_signer
         self.protocol.print_exceptions = False
 
-        self.transport = testing.StringTransport()
+        self.clock = task.Clock()
+        self.protocol.clock = self.clock
+
+        self.transport = CountingTransport()
 
         self.protocol.makeConnection(self.transport)
 
@@ -135,10 +142,728 @@ class SigningProtocolTest(TestCase):
             },
         })
 
+    def test_pool_responses_in_request_order(self) -> None:
+        """
+        The worker pool finishes signing the orders out of order, but the
+        responses are still sent back in the order the requests arrived.
+        """
+        pool = MockSigningPool()
+        self.protocol.pool = pool
+
+        for side in ('buy', 'sell'):
+            self._send({
+                'type': 'spot',
+                'instrument': {'symbol': 'LEVETH'},
+                'order': {'side': side},
+                'signer': '0x1337',
+            })
+
+        # The second order finishes first, but it has to wait for the first.
+        pool.pending[1].callback('0xs3ll')
+        self.clock.advance(0)
+        self.assertEqual(self.transport.value(), b'')
+
+        pool.pending[0].callback('0xb0y')
+        self.clock.advance(0)
+        self.assertEqual(
+            [loads(line) for line in self.transport.value().splitlines()],
+
+            [
+                {'ok': True, 'signature': '0xb0y'},
+                {'ok': True, 'signature': '0xs3ll'},
+            ],
+        )
+
+    def test_pool_signing_error(self) -> None:
+        """
+        An error occurs in a worker process while signing the order.
+        """
+        pool = MockSigningPool()
+        self.protocol.pool = pool
+
+        self._send({
+            'type': 'futures',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        })
+
+        pool.pending[0].errback(RuntimeError('Worker died.'))
+        self.clock.advance(0)
+
+        self._expect({
+            'ok': False,
+            'error': {
+                'type': 'RuntimeError',
+                'message': 'Worker died.',
+                'context': {},
+            },
+        })
+
+    def test_priority(self) -> None:
+        """
+        Requests that arrive together are sent to the worker pool in order of
+        priority.
+        """
+        pool = MockSigningPool()
+        self.protocol.pool = pool
+        self.protocol.scheduler = SigningScheduler(max_in_flight=1)
+
+        self.protocol.dataReceived(b''.join(
+            dumps({
+                'id': side,
+                'priority': priority,
+                'type': 'spot',
+                'instrument': {'symbol': 'LEVETH'},
+                'order': {'side': side},
+                'signer': '0x1337',
+            }).encode('utf-8') + self.protocol.delimiter
+            for side, priority in (('normal', 1), ('low', 2), ('high', 0))
+        ))
+
+        # Only one order is sent to the pool at a time, so the rest can still
+        # be reordered.
+        self.assertEqual([o.order['side'] for o in pool.orders], ['high'])
+
+        pool.pending[0].callback('0xh1gh')
+        pool.pending[1].callback('0xn0rmal')
+
+        self.assertEqual(
+            [o.order['side'] for o in pool.orders],
+            ['high', 'normal', 'low'],
+        )
+
+    def test_deadline_exceeded(self) -> None:
+        """
+        A request expires while it waits for the worker pool, so the daemon
+        drops it instead of signing it.
+        """
+        pool = MockSigningPool()
+        self.protocol.pool = pool
+        self.protocol.scheduler = SigningScheduler(max_in_flight=1)
+
+        order = {
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        }
+
+        self._send({**order, 'id': 0})
+        self._send({**order, 'id': 1, 'ttl_ms': 1})
+
+        time.sleep(0.002)
+        pool.pending[0].callback('0xb4dc0de')
+        self.clock.advance(0)
+
+        responses = {
+            response['id']: response
+            for response in map(loads, self.transport.value().splitlines())
+        }
+
+        self.assertEqual(len(pool.orders), 1)
+        self.assertEqual(responses[1]['error']['type'], 'DeadlineExceeded')
+        self.assertEqual(self.protocol.metrics.signing_errors, 0)
+
+    def test_overloaded(self) -> None:
+        """
+        Requests are rejected while too many are waiting to be signed.
+        """
+        pool = MockSigningPool()
+        self.protocol.pool = pool
+        self.protocol.scheduler = SigningScheduler(
+            max_in_flight=1,
+            max_queued=1,
+        )
+
+        for side in ('buy', 'sell', 'hold'):
+            self._send({
+                'id': side,
+                'type': 'spot',
+                'instrument': {'symbol': 'LEVETH'},
+                'order': {'side': side},
+                'signer': '0x1337',
+            })
+
+        self._expect({
+            'id': 'hold',
+            'ok': False,
+            'error': {
+                'type': 'Overloaded',
+                'message':
+                    'Too many requests are waiting to be signed; '
+                    'try again later.',
+                'context': {'max_queued': 1},
+            },
+        })
+
+    def test_pool_batch_result_cache(self) -> None:
+        """
+        Orders in a batch that have cached signatures aren't sent to the
+        worker pool again.
+        """
+        pool = MockSigningPool()
+        self.protocol.pool = pool
+        self.protocol.order_signer = OrderSigner(result_cache_size=10)
+
+        def batch(*sides: str) -> dict:
+            return {
+                'type': 'batch',
+                'orders': [
+                    {
+                        'type': 'spot',
+                        'instrument': {'symbol': 'LEVETH'},
+                        'order': {'side': side},
+                        'signer': '0x1337',
+                    }
+                    for side in sides
+                ],
+            }
+
+        self._send(batch('buy', 'sell'))
+        pool.pending[0].callback(['0xb0y', ValueError('Invalid signer.')])
+        self.clock.advance(0)
+        self.transport.clear()
+
+        # Only the signature that succeeded was cached.
+        self._send(batch('buy', 'sell', 'hold'))
+        self.assertEqual(
+            [o.order['side'] for o in pool.orders[1]],
+            ['sell', 'hold'],
+        )
+
+        pool.pending[1].callback(['0xs3ll', '0xh0ld'])
+        self.clock.advance(0)
+
+        self._expect({
+            'ok': True,
+            'results': [
+                {'ok': True, 'signature': '0xb0y'},
+                {'ok': True, 'signature': '0xs3ll'},
+                {'ok': True, 'signature': '0xh0ld'},
+            ],
+        })
+        self.transport.clear()
+
+        # Batches that are completely cached don't go to the pool at all.
+        self._send(batch('hold', 'buy'))
+        self.assertEqual(len(pool.orders), 2)
+
+        self._expect({
+            'ok': True,
+            'results': [
+                {'ok': True, 'signature': '0xh0ld'},
+                {'ok': True, 'signature': '0xb0y'},
+            ],
+        })
+
+    def test_request_id_echoed(self) -> None:
+        """
+        The request includes an ID, which is included in the response.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de'
+
+        self._send({
+            'id': 42,
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        })
+
+        self._expect({
+            'id': 42,
+            'ok': True,
+            'signature': self.order_signer.spot_sig,
+        })
+
+    def test_request_id_validation_error(self) -> None:
+        """
+        A request with an ID fails validation; the ID is still included in
+        the response.
+        """
+        self._send({
+            'id': 'abc',
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': None,
+        })
+
+        self._expect({
+            'id': 'abc',
+            'ok': False,
+            'error': {
+                'type': ValueError.__name__,
+                'message': SigningProtocol.MSG_VALIDATION_FAILED,
+                'context': {
+                    'signer': [{
+                        'code': f.Required.CODE_EMPTY,
+                        'message': f.Required.templates[f.Required.CODE_EMPTY],
+                    }]
+                }
+            }
+        })
+
+    def test_pool_responses_by_id(self) -> None:
+        """
+        Requests with IDs are answered as soon as they are ready, without
+        waiting for earlier requests.
+        """
+        pool = MockSigningPool()
+        self.protocol.pool = pool
+
+        for request_id, side in enumerate(('buy', 'sell')):
+            self._send({
+                'id': request_id,
+                'type': 'spot',
+                'instrument': {'symbol': 'LEVETH'},
+                'order': {'side': side},
+                'signer': '0x1337',
+            })
+
+        pool.pending[1].callback('0xs3ll')
+        self.clock.advance(0)
+        self._expect({'id': 1, 'ok': True, 'signature': '0xs3ll'})
+
+    def test_batch(self) -> None:
+        """
+        Client sends a batch of orders for signing; one of them can't be
+        signed.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de'
+        self.order_signer.futures_sig = ValueError('Invalid signer.')
+
+        self._send({
+            'id': 42,
+            'type': 'batch',
+
+            'orders': [
+                {
+                    'type': 'spot',
+                    'instrument': {'symbol': 'LEVETH'},
+                    'order': {'side': 'buy'},
+                    'signer': '0x1337',
+                },
+
+                {
+                    'type': 'futures',
+                    'instrument': {'symbol': 'LEVETH'},
+                    'order': {'side': 'sell'},
+                    'signer': '0x1337',
+                },
+            ],
+        })
+
+        self._expect({
+            'id': 42,
+            'ok': True,
+
+            'results': [
+                {
+                    'ok': True,
+                    'signature': self.order_signer.spot_sig,
+                },
+
+                {
+                    'ok': False,
+                    'error': {
+                        'type': 'ValueError',
+                        'message': 'Invalid signer.',
+                        'context': {},
+                    },
+                },
+            ],
+        })
+
+    def test_batch_max_size(self) -> None:
+        """
+        Client sends the biggest batch allowed, with the full instrument in
+        every order, in chunks (as it would arrive over a socket).
+        """
+        self.order_signer.spot_sig = '0x' + 'ab' * 65
+
+        order = {
+            'type': 'spot',
+
+            'instrument': {
+                'symbol': 'LEVETH',
+                'quote': {
+                    'address': '0x0000000000000000000000000000000000000000',
+                    'decimals': 18,
+                },
+                'base': {
+                    'address': '0x167cdb1aC9979A6a694B368ED3D2bF9259Fa8282',
+                    'decimals': 9,
+                },
+            },
+
+            'order': {
+                'accountId': '0x167cdb1aC9979A6a694B368ED3D2bF9259Fa8282',
+                'side': 'buy',
+                'quantity': 12.3343,
+                'price': 23.44322,
+                'orderType': 'LMT',
+                'instrument': 'LEVETH',
+                'timestamp': 12382173200872,
+                'expiryTime': 1238217320021122,
+            },
+
+            'signer':
+                '0xb98ea45b6515cbd6a5c39108612b2cd5ae184d5eb0d72b21389a1fe6'
+                'db01fe0d',
+        }
+
+        data = dumps({
+            'id': 42,
+            'type': 'batch',
+            'orders': [order] * MAX_BATCH_SIZE,
+        }).encode('utf-8') + self.protocol.delimiter
+
+        for i in range(0, len(data), 65536):
+            self.protocol.dataReceived(data[i:i + 65536])
+
+        self.assertFalse(self.transport.disconnecting)
+
+        response = loads(self.transport.value())
+        self.assertEqual(response['id'], 42)
+        self.assertEqual(len(response['results']), MAX_BATCH_SIZE)
+
+    def test_register_instrument(self) -> None:
+        """
+        Client registers an instrument, then refers to it by symbol.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de'
+
+        instrument = {
+            'symbol': 'LEVETH',
+            'quote': {'decimals': 18},
+        }
+
+        self._send({'type': 'instrument', 'instrument': instrument})
+        self._expect({'ok': True})
+        self.transport.clear()
+
+        self._send({
+            'type': 'spot',
+            'instrument': 'LEVETH',
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        })
+
+        self._expect({
+            'ok': True,
+            'signature': self.order_signer.spot_sig,
+        })
+
+        self.assertEqual(self.order_signer.spot_args[1], instrument)
+
+    def test_register_too_many_instruments(self) -> None:
+        """
+        Client tries to register a new instrument, but the registry is full.
+        """
+        self.protocol.instruments.max_size = 1
+
+        self._send({
+            'type': 'instrument',
+            'instrument': {'symbol': 'LEVETH', 'quote': {'decimals': 18}},
+        })
+        self._expect({'ok': True})
+        self.transport.clear()
+
+        self._send({
+            'type': 'instrument',
+            'instrument': {'symbol': 'BTCDAI', 'quote': {'decimals': 18}},
+        })
+
+        self._expect({
+            'ok': False,
+            'error': {
+                'type': 'TooManyInstruments',
+                'message': 'Cannot register more than 1 instruments.',
+                'context': {'max_size': 1},
+            },
+        })
+        self.transport.clear()
+
+        # Replacing an instrument that is already registered is still
+        # allowed.
+        self._send({
+            'type': 'instrument',
+            'instrument': {'symbol': 'LEVETH', 'quote': {'decimals': 8}},
+        })
+        self._expect({'ok': True})
+
+    def test_unknown_instrument(self) -> None:
+        """
+        Client refers to an instrument that has not been registered.
+        """
+        self._send({
+            'type': 'spot',
+            'instrument': 'LEVETH',
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        })
+
+        self._expect({
+            'ok': False,
+            'error': {
+                'type': 'UnknownInstrument',
+                'message': "Instrument 'LEVETH' has not been registered.",
+                'context': {'symbol': 'LEVETH'},
+            },
+        })
+
+    def test_coalesce_responses(self) -> None:
+        """
+        Responses to requests that arrive together are written to the
+        transport in one go.
+        """
+        self.order_signer.spot_sig = '0xb4dc0de'
+
+        request = dumps({
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        }).encode('utf-8') + self.protocol.delimiter
+
+        self.protocol.dataReceived(request * 3)
+
+        self.assertEqual(self.transport.writes, 1)
+        self.assertEqual(len(self.transport.value().splitlines()), 3)
+
+    def test_flush_delay(self) -> None:
+        """
+        Responses that become ready in between requests are buffered for up
+        to ``flush_delay`` seconds.
+        """
+        pool = MockSigningPool()
+        self.protocol.pool = pool
+        self.protocol.flush_delay = 0.001
+
+        for request_id in range(2):
+            self._send({
+                'id': request_id,
+                'type': 'spot',
+                'instrument': {'symbol': 'LEVETH'},
+                'order': {'side': 'buy'},
+                'signer': '0x1337',
+            })
+
+        pool.pending[0].callback('0xb4dc0de')
+        pool.pending[1].callback('0xb4dc0de')
+
+        self.clock.advance(0.0005)
+        self.assertEqual(self.transport.value(), b'')
+
+        self.clock.advance(0.0005)
+        self.assertEqual(self.transport.writes, 1)
+        self.assertEqual(len(self.transport.value().splitlines()), 2)
+
+    def test_flush_size(self) -> None:
+        """
+        The buffer is flushed immediately once it reaches ``flush_size``.
+        """
+        pool = MockSigningPool()
+        self.protocol.pool = pool
+        self.protocol.flush_size = 1
+
+        self._send({
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        })
+
+        pool.pending[0].callback('0xb4dc0de')
+
+        self._expect({'ok': True, 'signature': '0xb4dc0de'})
+
+
+    def test_metrics(self) -> None:
+        """
+        The protocol keeps count of connections, requests and errors, and
+        records how long each stage takes.
+        """
+        metrics = self.protocol.metrics
+        self.assertEqual(metrics.connections, 1)
+
+        pool = MockSigningPool()
+        self.protocol.pool = pool
+
+        self._send({
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        })
+
+        self._send({'type': 'spot'})
+
+        self.assertEqual(metrics.requests, 2)
+        self.assertEqual(metrics.validation_errors, 1)
+
+        # The validation error is held back until the first request has been
+        # answered.
+        self.assertEqual(metrics.in_flight, 2)
+
+        pool.pending[0].callback('0xb4dc0de')
+        self.clock.advance(0)
+
+        self.assertEqual(metrics.in_flight, 0)
+        self.assertEqual(metrics.signatures, 1)
+        self.assertEqual(metrics.signing_errors, 0)
+
+        self.assertEqual(metrics.decode.count, 2)
+        self.assertEqual(metrics.sign['spot'].count, 1)
+        self.assertEqual(metrics.sign['futures'].count, 0)
+        self.assertEqual(metrics.encode.count, 2)
+
+        # Both responses were written in one go.
+        self.assertEqual(metrics.write.count, 1)
+
+        self.protocol.connectionLost()
+        self.assertEqual(metrics.connections, 0)
+
+    def test_connection_lost(self) -> None:
+        """
+        Results that arrive after the client disconnects are discarded.
+        """
+        pool = MockSigningPool()
+        self.protocol.pool = pool
+
+        order = {
+            'type': 'spot',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        }
+
+        self._send(order)
+        self._send({**order, 'id': 1})
+
+        self.protocol.connectionLost()
+
+        pool.pending[0].callback('0xb4dc0de')
+        pool.pending[1].callback('0xb4dc0de')
+
+        # No flush was scheduled for the (now closed) transport.
+        self.assertListEqual(self.clock.getDelayedCalls(), [])
+        self.protocol.flush()
+
+        self.assertEqual(self.transport.value(), b'')
+        self.assertEqual(self.protocol.metrics.in_flight, 0)
+
+
+    def test_capture(self) -> None:
+        """
+        Incoming requests are passed to the traffic capture, if configured.
+        """
+        capture = MockCapture()
+        self.protocol.capture = capture
+
+        self._send({'type': 'spot'})
+
+        self.assertEqual(capture.lines, [b'{"type":"spot"}'])
+
+
+class SigningProtocolFactoryTest(TestCase):
+    def test_share_pool(self) -> None:
+        """
+        Factories that share a worker pool only shut it down once every one
+        of them has stopped.
+        """
+        factory = SigningProtocolFactory()
+        factory.pool = MockSigningPool()
+
+        factory.doStart()
+
+        shared = factory.share(SigningProtocol)
+        shared.doStart()
+
+        # Factories shared from a shared factory use the same pool, too.
+        nested = shared.share(SigningProtocol)
+        nested.doStart()
+
+        shared.doStop()
+        factory.doStop()
+        self.assertFalse(factory.pool.shut_down)
+
+        nested.doStop()
+        self.assertTrue(factory.pool.shut_down)
+
+
+class CountingTransport(testing.StringTransport):
+    """
+    Keeps track of how many times data was written to the transport.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.writes = 0
+
+    def write(self, data: bytes) -> None:
+        self.writes += 1
+        super().write(data)
+
+    def writeSequence(self, data: typing.Iterable[bytes]) -> None:
+        self.writes += 1
+        super().write(b''.join(data))
+
+
+class MockCapture:
+    """
+    Stands in for :py:class:`TrafficCapture`.
+    """
+
+    def __init__(self) -> None:
+        self.lines = []
+
+    def record(self, line: bytes) -> None:
+        self.lines.append(line)
+
+
+class MockSigningPool:
+    """
+    Stands in for :py:class:`SigningPool`, so that tests can control when
+    (and in which order) each signature is finished.
+    """
+
+    def __init__(self) -> None:
+        self.orders = []
+        self.pending = []
+        self.shut_down = False
+
+    def shutdown(self) -> None:
+        self.shut_down = True
+
+    def sign(self, order: Order) -> defer.Deferred:
+        d = defer.Deferred()
+        self.orders.append(order)
+        self.pending.append(d)
+        return d
+
+    def sign_many(self, orders: typing.List[Order]) -> defer.Deferred:
+        d = defer.Deferred()
+        self.orders.append(orders)
+        self.pending.append(d)
+        return d
+
 
 class InputValidationTest(BaseFilterTestCase):
     filter_type = OrderSignerRequest
 
+    def _assert_errors(self, value: str, errors: dict) -> None:
+        """
+        Asserts that the filter reports exactly the specified errors
+        (including messages, which are sent to the client).
+        """
+        runner = f.FilterRunner(self.filter_type(), value)
+
+        self.assertFalse(runner.is_valid())
+        self.assertEqual(runner.get_errors(), errors)
+
     def test_pass_happy_path(self) -> None:
         """
         Valid request is valid.
@@ -185,6 +910,50 @@ class InputValidationTest(BaseFilterTestCase):
             [f.Type.CODE_WRONG_TYPE],
         )
 
+    def test_fail_empty_list(self) -> None:
+        """
+        Request is an empty list (same error as before batches were added).
+        """
+        self._assert_errors('[]', {
+            '': [{
+                'code': f.Type.CODE_WRONG_TYPE,
+                'message': 'list is not valid (allowed types: Mapping).',
+            }],
+        })
+
+    def test_fail_string(self) -> None:
+        """
+        Request is a string (same error as before batches were added).
+        """
+        self._assert_errors('"x"', {
+            '': [{
+                'code': f.Type.CODE_WRONG_TYPE,
+                'message': 'str is not valid (allowed types: Mapping).',
+            }],
+        })
+
+    def test_fail_null(self) -> None:
+        """
+        Request is ``null`` (same error as before batches were added).
+        """
+        self._assert_errors('null', {
+            '': [{
+                'code': 'exception',
+                'message': 'An error occurred while processing this value.',
+            }],
+        })
+
+    def test_fail_empty_dict(self) -> None:
+        """
+        Request is an empty dict (same error as before batches were added).
+        """
+        self.assertFilterErrors('{}', {
+            'instrument': [f.FilterMapper.CODE_MISSING_KEY],
+            'order': [f.FilterMapper.CODE_MISSING_KEY],
+            'signer': [f.FilterMapper.CODE_MISSING_KEY],
+            'type': [f.FilterMapper.CODE_MISSING_KEY],
+        })
+
     def test_fail_type_missing(self) -> None:
         """
         Request is missing ``type``.
@@ -390,6 +1159,181 @@ class InputValidationTest(BaseFilterTestCase):
             {'signer': [f.Required.CODE_EMPTY]},
         )
 
+    def test_pass_id(self) -> None:
+        """
+        Request includes an ID.
+        """
+        order = {
+            'id': 42,
+            'type': 'futures',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        }
+
+        self.assertFilterPasses(
+            dumps(order),
+            Order(**order),
+        )
+
+    def test_pass_priority(self) -> None:
+        """
+        Request includes a priority.
+        """
+        order = {
+            'priority': 0,
+            'type': 'futures',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        }
+
+        self.assertFilterPasses(
+            dumps(order),
+            Order(**order),
+        )
+
+    def test_fail_priority_invalid(self) -> None:
+        """
+        ``priority`` value is not one of the ``PRIORITY_*`` constants.
+        """
+        self.assertFilterErrors(
+            dumps({
+                'priority': 3,
+                'type': 'spot',
+                'instrument': {'symbol': 'LEVETH'},
+                'order': {'side': 'buy'},
+                'signer': '0x1337',
+            }),
+
+            {'priority': [f.Max.CODE_TOO_BIG]},
+        )
+
+    def test_fail_id_wrong_type(self) -> None:
+        """
+        ``id`` value is neither an int nor a string.
+        """
+        self.assertFilterErrors(
+            dumps({
+                'id': True,
+                'type': 'spot',
+                'instrument': {'symbol': 'LEVETH'},
+                'order': {'side': 'buy'},
+                'signer': '0x1337',
+            }),
+
+            {'id': [f.Type.CODE_WRONG_TYPE]},
+        )
+
+    def test_pass_batch(self) -> None:
+        """
+        Valid batch request is valid.
+        """
+        order = {
+            'type': 'futures',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        }
+
+        self.assertFilterPasses(
+            dumps({'type': 'batch', 'orders': [order, order]}),
+            Batch(orders=[Order(**order), Order(**order)]),
+        )
+
+    def test_fail_batch_empty(self) -> None:
+        """
+        Batch request does not contain any orders.
+        """
+        self.assertFilterErrors(
+            dumps({'type': 'batch', 'orders': []}),
+            {'orders': [f.Required.CODE_EMPTY]},
+        )
+
+    def test_fail_batch_too_big(self) -> None:
+        """
+        Batch request contains too many orders.
+        """
+        order = {
+            'type': 'futures',
+            'instrument': {'symbol': 'LEVETH'},
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        }
+
+        self.assertFilterErrors(
+            dumps({'type': 'batch', 'orders': [order] * 1001}),
+            {'orders': [f.MaxLength.CODE_TOO_LONG]},
+        )
+
+    def test_fail_batch_invalid_order(self) -> None:
+        """
+        One of the orders in a batch request is invalid.
+        """
+        self.assertFilterErrors(
+            dumps({
+                'type': 'batch',
+
+                'orders': [
+                    {
+                        'type': 'futures',
+                        'instrument': {'symbol': 'LEVETH'},
+                        'order': {'side': 'buy'},
+                        'signer': '0x1337',
+                    },
+
+                    {
+                        'type': 'batch',
+                        'instrument': {'symbol': 'LEVETH'},
+                        'order': {'side': 'buy'},
+                        'signer': '0x1337',
+                    },
+                ],
+            }),
+
+            {'orders.1.type': [f.Choice.CODE_INVALID]},
+        )
+
+    def test_pass_instrument_symbol(self) -> None:
+        """
+        Request refers to a registered instrument by symbol.
+        """
+        order = {
+            'type': 'spot',
+            'instrument': 'LEVETH',
+            'order': {'side': 'buy'},
+            'signer': '0x1337',
+        }
+
+        self.assertFilterPasses(
+            dumps(order),
+            Order(**order),
+        )
+
+    def test_pass_register_instrument(self) -> None:
+        """
+        Valid request to register an instrument is valid.
+        """
+        instrument = {'symbol': 'LEVETH', 'quote': {'decimals': 18}}
+
+        self.assertFilterPasses(
+            dumps({'type': 'instrument', 'instrument': instrument}),
+            RegisterInstrument(instrument=instrument),
+        )
+
+    def test_fail_register_instrument_no_symbol(self) -> None:
+        """
+        Request to register an instrument that has no symbol.
+        """
+        self.assertFilterErrors(
+            dumps({
+                'type': 'instrument',
+                'instrument': {'quote': {'decimals': 18}},
+            }),
+
+            {'instrument.symbol': [f.FilterMapper.CODE_MISSING_KEY]},
+        )
+
     def test_fail_extra_key(self) -> None:
         """
         Request contains an unexpected key.
@@ -405,3 +1349,134 @@ class InputValidationTest(BaseFilterTestCase):
 
             {'foo': [f.FilterMapper.CODE_EXTRA_KEY]},
         )
+
+
+class FastPathTest(TestCase):
+    """
+    Checks that :py:func:`parse_request` agrees with
+    :py:class:`OrderSignerRequest`.
+    """
+    order = {
+        'type': 'futures',
+        'instrument': {'symbol': 'LEVETH'},
+        'order': {'side': 'buy'},
+        'signer': '0x1337',
+    }
+
+    def _assert_same_result(self, payload: dict) -> None:
+        line = dumps(payload).encode('utf-8')
+
+        runner = f.FilterRunner(OrderSignerRequest(), line)
+        self.assertTrue(runner.is_valid(), runner.get_errors())
+
+        self.assertEqual(parse_request(line), runner.cleaned_data)
+
+    def _assert_fallback(self, payload: dict) -> None:
+        line = dumps(payload).encode('utf-8')
+
+        self.assertIsNone(parse_request(line))
+        self.assertFalse(f.FilterRunner(OrderSignerRequest(), line).is_valid())
+
+    def test_pass_order(self) -> None:
+        """
+        Valid requests for a single order.
+        """
+        self._assert_same_result(self.order)
+        self._assert_same_result({**self.order, 'id': 42})
+        self._assert_same_result({**self.order, 'id': 'abc'})
+        self._assert_same_result({**self.order, 'id': None})
+        self._assert_same_result({**self.order, 'instrument': 'LEVETH'})
+        self._assert_same_result({**self.order, 'priority': 0})
+        self._assert_same_result({**self.order, 'priority': None})
+        self._assert_same_result({**self.order, 'ttl_ms': 50})
+
+    def test_pass_batch(self) -> None:
+        """
+        Valid batch request.
+        """
+        self._assert_same_result({
+            'id': 42,
+            'type': 'batch',
+            'orders': [self.order, self.order],
+        })
+
+        self._assert_same_result({
+            'priority': 2,
+            'ttl_ms': 100,
+            'type': 'batch',
+            'orders': [self.order],
+        })
+
+    def test_pass_register_instrument(self) -> None:
+        """
+        Valid request to register an instrument.
+        """
+        self._assert_same_result({
+            'type': 'instrument',
+            'instrument': {'symbol': 'LEVETH', 'quote': {'decimals': 18}},
+        })
+
+    def test_fail_order(self) -> None:
+        """
+        Invalid requests for a single order.
+        """
+        self._assert_fallback({**self.order, 'id': True})
+        self._assert_fallback({**self.order, 'type': 'foo'})
+        self._assert_fallback({**self.order, 'type': ['spot']})
+        self._assert_fallback({**self.order, 'order': {}})
+        self._assert_fallback({**self.order, 'instrument': ''})
+        self._assert_fallback({**self.order, 'signer': None})
+        self._assert_fallback({**self.order, 'foo': 'bar'})
+        self._assert_fallback({**self.order, 'priority': -1})
+        self._assert_fallback({**self.order, 'priority': True})
+        self._assert_fallback({**self.order, 'priority': 'high'})
+        self._assert_fallback({**self.order, 'ttl_ms': 0})
+        self._assert_fallback({**self.order, 'ttl_ms': 1.5})
+        self._assert_fallback({'type': 'spot'})
+
+    def test_fail_batch(self) -> None:
+        """
+        Invalid batch requests.
+        """
+        self._assert_fallback({'type': 'batch', 'orders': []})
+        self._assert_fallback({'type': 'batch', 'orders': [self.order] * 1001})
+
+        self._assert_fallback({
+            'type': 'batch',
+            'orders': [{**self.order, 'id': 42}],
+        })
+
+        # Priorities apply to the whole batch, not individual orders.
+        self._assert_fallback({
+            'type': 'batch',
+            'orders': [{**self.order, 'priority': 0}],
+        })
+
+    def test_fail_register_instrument(self) -> None:
+        """
+        Invalid requests to register an instrument.
+        """
+        self._assert_fallback({'type': 'instrument', 'instrument': {}})
+
+        self._assert_fallback({
+            'type': 'instrument',
+            'instrument': {'symbol': 42},
+        })
+
+        self._assert_fallback({
+            'type': 'instrument',
+            'instrument': {'symbol': 'LEVETH'},
+            'priority': 0,
+        })
+
+    def test_fallback_non_ascii(self) -> None:
+        """
+        Requests that contain non-ASCII characters always use the filter
+        chain, which normalises the text.
+        """
+        line = dumps(
+            {**self.order, 'signer': 'caf\u0065\u0301'},
+            ensure_ascii=False,
+        ).encode('utf-8')
+
+        self.assertIsNone(parse_request(line))
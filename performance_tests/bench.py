@@ -0,0 +1,586 @@
+"""
+Benchmark harness for the daemon (and for signing in-process, as a
+baseline).
+
+Runs every combination of the scenario parameters given on the command line,
+and reports throughput and latency percentiles for each one as JSON, e.g.::
+
+    python -m performance_tests.bench \
+        --mode daemon inprocess \
+        --type spot futures \
+        --interface unix:/tmp/leverj-ordersigner-daemon.sock \
+        --connections 1 4 \
+        --depth 1 32 \
+        --output results.json
+
+Use ``--baseline`` to compare the results against an earlier run, and exit
+with a non-zero status if any scenario has regressed.
+
+.. note::
+    The daemon must already be running (on every interface that you want to
+    benchmark) for the ``daemon`` mode.
+"""
+import asyncio
+import json
+import platform
+import sys
+import typing
+from argparse import ArgumentParser
+from collections import namedtuple as named_tuple
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from io import StringIO
+from itertools import cycle, islice, product
+from time import perf_counter
+
+from leverj_ordersigner import futures, spot
+from leverj_ordersigner_client.aio import AsyncioOrderSignerClient, \
+    create_client
+
+from performance_tests.generator import OrderGenerator
+from performance_tests.resources import base_orders, futures_base_orders, \
+    futures_instruments, instruments, signer
+from performance_tests.stats import summarise_latencies
+
+__all__ = [
+    'Scenario',
+    'compare',
+    'is_correct',
+    'main',
+    'order_stream',
+    'run_scenario',
+]
+
+MODE_DAEMON = 'daemon'
+MODE_INPROCESS = 'inprocess'
+
+TYPE_FUTURES = 'futures'
+TYPE_SPOT = 'spot'
+
+# Send the full instrument with every order, or register it once and refer
+# to it by symbol.
+INSTRUMENTS_FULL = 'full'
+INSTRUMENTS_REGISTERED = 'registered'
+
+# Cycle through the orders in ``resources``, or generate new orders with
+# :py:class:`OrderGenerator`.
+ORDERS_FIXTURES = 'fixtures'
+ORDERS_GENERATED = 'generated'
+
+Scenario = named_tuple('Scenario', (
+    'mode',
+    'type',
+    'interface',
+    'connections',
+    'depth',
+    'batch_size',
+    'instruments',
+    'orders',
+))
+
+# Fixture orders and instruments for each order type.
+ORDERS = {
+    TYPE_FUTURES: (futures_base_orders, futures_instruments),
+    TYPE_SPOT: (base_orders, instruments),
+}
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> None:
+    parser = ArgumentParser(
+        description='Benchmarks the OrderSigner daemon.',
+    )
+
+    parser.add_argument(
+        '--mode',
+        choices=(MODE_DAEMON, MODE_INPROCESS),
+        default=[MODE_DAEMON],
+        nargs='+',
+        help='Sign orders via the daemon, or in-process using the '
+             'leverj-ordersigner library.',
+    )
+
+    parser.add_argument(
+        '--type',
+        choices=(TYPE_SPOT, TYPE_FUTURES),
+        default=[TYPE_SPOT],
+        nargs='+',
+        help='Type(s) of orders to sign.',
+    )
+
+    parser.add_argument(
+        '--interface',
+        default=['unix:/tmp/leverj-ordersigner-daemon.sock'],
+        nargs='+',
+        help='Interface(s) that the daemon is listening on ("unix:" or '
+             '"tcp:").',
+    )
+
+    parser.add_argument(
+        '--connections',
+        default=[1],
+        nargs='+',
+        type=int,
+        help='Number(s) of concurrent connections to the daemon.',
+    )
+
+    parser.add_argument(
+        '--depth',
+        default=[1],
+        nargs='+',
+        type=int,
+        help='Number(s) of requests to pipeline on each connection.',
+    )
+
+    parser.add_argument(
+        '--batch-size',
+        default=[1],
+        nargs='+',
+        type=int,
+        help='Number(s) of orders to send in each request (1 = one order '
+             'per request; more than 1 = batch requests).',
+    )
+
+    parser.add_argument(
+        '--instruments',
+        choices=(INSTRUMENTS_FULL, INSTRUMENTS_REGISTERED),
+        default=[INSTRUMENTS_FULL],
+        nargs='+',
+        help='Send the full instrument with every order, or register '
+             'instruments first and refer to them by symbol.',
+    )
+
+    parser.add_argument(
+        '--orders',
+        choices=(ORDERS_FIXTURES, ORDERS_GENERATED),
+        default=[ORDERS_FIXTURES],
+        nargs='+',
+        help='Cycle through a small set of known orders (and check their '
+             'signatures), or generate realistic orders with varying '
+             'instruments, prices and signers.',
+    )
+
+    parser.add_argument(
+        '--seed',
+        default=0,
+        type=int,
+        help='Random seed for generated orders (default: %(default)s).',
+    )
+
+    parser.add_argument(
+        '-n', '--requests',
+        default=1000,
+        type=int,
+        help='Number of requests to send in each scenario.',
+    )
+
+    parser.add_argument(
+        '--warmup',
+        default=100,
+        type=int,
+        help='Number of requests to send (and ignore) before each scenario.',
+    )
+
+    parser.add_argument(
+        '-o', '--output',
+        help='File to write results to (default: stdout).',
+    )
+
+    parser.add_argument(
+        '--baseline',
+        help='Results from an earlier run to compare against.',
+    )
+
+    parser.add_argument(
+        '--tolerance',
+        default=0.1,
+        type=float,
+        help='Max fraction by which throughput may drop (or p99 latency may '
+             'rise) compared to the baseline (default: %(default)s).',
+    )
+
+    args = parser.parse_args(argv)
+
+    results = []
+    for scenario in scenarios(args):
+        print('Running {scenario}'.format(scenario=scenario), file=sys.stderr)
+        results.append(run_scenario(
+            scenario,
+            args.requests,
+            args.warmup,
+            args.seed,
+        ))
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'argv': sys.argv[1:] if argv is None else argv,
+            'seed': args.seed,
+        },
+
+        'results': results,
+    }
+
+    encoded = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(encoded)
+    else:
+        print(encoded)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare(baseline, report, args.tolerance)
+
+        for regression in regressions:
+            print('REGRESSION: {regression}'.format(regression=regression),
+                  file=sys.stderr)
+
+        if regressions:
+            sys.exit(1)
+
+
+def scenarios(args) -> typing.Iterator[Scenario]:
+    """
+    Generates every combination of the scenario parameters.
+
+    Parameters that don't apply to in-process signing are set to ``None``.
+    """
+    for mode in args.mode:
+        if mode == MODE_INPROCESS:
+            for type_, batch_size, orders in product(
+                args.type,
+                args.batch_size,
+                args.orders,
+            ):
+                yield Scenario(
+                    mode,
+                    type_,
+                    None,
+                    None,
+                    None,
+                    batch_size,
+                    None,
+                    orders,
+                )
+        else:
+            for params in product(
+                args.type,
+                args.interface,
+                args.connections,
+                args.depth,
+                args.batch_size,
+                args.instruments,
+                args.orders,
+            ):
+                yield Scenario(mode, *params)
+
+
+def run_scenario(
+        scenario: Scenario,
+        requests: int,
+        warmup: int,
+        seed: int = 0,
+) -> dict:
+    """
+    Runs a single scenario, and returns its results.
+    """
+    payloads, instruments_ = \
+        order_stream(scenario.type, scenario.orders, seed)
+
+    if scenario.mode == MODE_INPROCESS:
+        run = lambda n: run_inprocess(scenario, payloads, n)
+    else:
+        run = lambda n: asyncio.run(
+            run_daemon(scenario, payloads, instruments_, n),
+        )
+
+    if warmup:
+        run(warmup)
+
+    elapsed, latencies, errors = run(requests)
+    orders = requests * scenario.batch_size
+
+    return {
+        'scenario': scenario._asdict(),
+        'requests': requests,
+        'orders': orders,
+        'errors': errors,
+        'elapsed': elapsed,
+        'requests_per_second': requests / elapsed,
+        'orders_per_second': orders / elapsed,
+        'latency_ms': summarise_latencies(latencies),
+    }
+
+
+def order_stream(
+        type_: str,
+        orders: str,
+        seed: int,
+) -> typing.Tuple[typing.Iterator[dict], typing.List[dict]]:
+    """
+    Returns an endless stream of request payloads, and the instruments that
+    they refer to.
+
+    :param type_: Type of orders (``spot`` or ``futures``).
+
+    :param orders: Where to get orders from (``fixtures`` or
+    ``generated``).
+
+    :param seed: Random seed for generated orders.
+
+    Payloads for fixture orders include the expected signature (in
+    ``order['signature']``).
+    """
+    if orders == ORDERS_GENERATED:
+        generator = OrderGenerator(
+            seed=seed,
+            futures_ratio=1.0 if type_ == TYPE_FUTURES else 0.0,
+        )
+
+        return iter(generator), generator.instruments
+
+    base, instruments_ = ORDERS[type_]
+
+    payloads = (
+        {
+            'type': type_,
+            'instrument': instruments_[order['instrument']],
+            'order': order,
+            'signer': signer,
+        }
+        for order in cycle(base)
+    )
+
+    return payloads, list(instruments_.values())
+
+
+def is_correct(signature: typing.Optional[str], payload: dict) -> bool:
+    """
+    Returns whether an order was signed correctly (or at all, if the
+    expected signature is not known).
+    """
+    if signature is None:
+        return False
+
+    expected = payload['order'].get('signature')
+    return expected is None or signature == expected
+
+
+def run_inprocess(
+        scenario: Scenario,
+        payloads: typing.Iterator[dict],
+        requests: int,
+) -> typing.Tuple[float, typing.List[float], int]:
+    """
+    Signs orders directly using the ``leverj_ordersigner`` library.
+
+    :return: Elapsed time, latency of each request, and number of errors.
+    """
+    latencies = []
+    errors = 0
+
+    # ``leverj_ordersigner.futures`` prints debugging info for every order.
+    with redirect_stdout(StringIO()):
+        started = perf_counter()
+
+        for _ in range(requests):
+            request_started = perf_counter()
+
+            for payload in islice(payloads, scenario.batch_size):
+                module = (
+                    futures
+                    if payload['type'] == TYPE_FUTURES
+                    else spot
+                )
+
+                signature = module.sign_order(
+                    order=payload['order'],
+                    order_instrument=payload['instrument'],
+                    signer=payload['signer'],
+                )
+
+                if not is_correct(signature, payload):
+                    errors += 1
+
+            latencies.append(perf_counter() - request_started)
+
+        elapsed = perf_counter() - started
+
+    return elapsed, latencies, errors
+
+
+async def run_daemon(
+        scenario: Scenario,
+        payloads: typing.Iterator[dict],
+        instruments_: typing.List[dict],
+        requests: int,
+) -> typing.Tuple[float, typing.List[float], int]:
+    """
+    Signs orders via the daemon.
+
+    Each connection runs ``depth`` loops that each send a request and wait
+    for its response, so that up to ``connections * depth`` requests are in
+    flight at any time.
+
+    :return: Elapsed time, latency of each request, and number of errors.
+    """
+    registered = scenario.instruments == INSTRUMENTS_REGISTERED
+
+    clients = [
+        await create_client(scenario.interface)
+        for _ in range(scenario.connections)
+    ]
+
+    if registered:
+        # Registered instruments are shared by every connection.
+        await asyncio.gather(*(
+            clients[0].register_instrument(instrument)
+            for instrument in instruments_
+        ))
+
+    def batches() -> typing.Iterator[typing.List[dict]]:
+        for _ in range(requests):
+            batch = list(islice(payloads, scenario.batch_size))
+
+            if registered:
+                batch = [
+                    {**payload, 'instrument': payload['instrument']['symbol']}
+                    for payload in batch
+                ]
+
+            yield batch
+
+    # Every loop takes the next request from the same iterator.
+    pending = batches()
+    latencies = []
+    errors = 0
+
+    async def loop(client: AsyncioOrderSignerClient) -> None:
+        nonlocal errors
+
+        for batch in pending:
+            request_started = perf_counter()
+
+            try:
+                signatures = await send(client, batch)
+            except Exception:
+                errors += len(batch)
+                continue
+            finally:
+                latencies.append(perf_counter() - request_started)
+
+            errors += sum(
+                not is_correct(signature, payload)
+                for signature, payload in zip(signatures, batch)
+            )
+
+    started = perf_counter()
+
+    try:
+        await asyncio.gather(*(
+            loop(client)
+            for client in clients
+            for _ in range(scenario.depth)
+        ))
+    finally:
+        elapsed = perf_counter() - started
+
+        for client in clients:
+            await client.close()
+
+    return elapsed, latencies, errors
+
+
+async def send(
+        client: AsyncioOrderSignerClient,
+        batch: typing.List[dict],
+) -> typing.List[typing.Optional[str]]:
+    """
+    Sends a request for a batch of orders (as a single order request if the
+    batch only contains one order).
+
+    :return: The signature for each order (``None`` if it failed).
+    """
+    if len(batch) == 1:
+        payload = batch[0]
+
+        sign = (
+            client.sign_futures
+            if payload['type'] == TYPE_FUTURES
+            else client.sign_spot
+        )
+
+        return [
+            await sign(
+                payload['order'],
+                payload['instrument'],
+                payload['signer'],
+            ),
+        ]
+
+    return [
+        result if success else None
+        for success, result in await client.sign_many(batch)
+    ]
+
+
+def compare(
+        baseline: dict,
+        report: dict,
+        tolerance: float,
+) -> typing.List[str]:
+    """
+    Compares results against a baseline.
+
+    :return: A description of each scenario whose throughput dropped, or
+    whose p99 latency rose, by more than ``tolerance``.
+    """
+    previous = {
+        Scenario(**result['scenario']): result
+        for result in baseline['results']
+    }
+
+    regressions = []
+
+    for result in report['results']:
+        scenario = Scenario(**result['scenario'])
+        before = previous.get(scenario)
+
+        if before is None:
+            continue
+
+        if result['orders_per_second'] < \
+                before['orders_per_second'] * (1 - tolerance):
+            regressions.append(
+                '{scenario}: throughput {after:.1f} orders/s '
+                '(was {before:.1f})'.format(
+                    scenario=scenario,
+                    after=result['orders_per_second'],
+                    before=before['orders_per_second'],
+                ),
+            )
+
+        p99_before = before['latency_ms']['p99']
+        p99_after = result['latency_ms']['p99']
+
+        if p99_before is not None and p99_after is not None \
+                and p99_after > p99_before * (1 + tolerance):
+            regressions.append(
+                '{scenario}: p99 latency {after:.3f}ms '
+                '(was {before:.3f}ms)'.format(
+                    scenario=scenario,
+                    after=p99_after,
+                    before=p99_before,
+                ),
+            )
+
+    return regressions
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,455 @@
+"""
+Generates a stream of synthetic (but realistic) orders for load tests.
+
+Orders are generated lazily, so you can generate millions of them without
+holding them all in memory, and the same seed always produces the same
+stream, e.g.::
+
+    generator = OrderGenerator(seed=42, futures_ratio=0.3)
+
+    for request in islice(generator, 1000000):
+        ...
+
+Each item is a request payload (``type``, ``instrument``, ``order`` and
+``signer``), in the same format that the daemon accepts.
+
+To write orders to disk for replay::
+
+    python -m performance_tests.generator -n 1000000 --seed 42 \
+        -o orders.jsonl.gz
+"""
+import gzip
+import json
+import math
+import random
+import sys
+import typing
+from argparse import ArgumentParser
+from bisect import bisect
+from itertools import accumulate, islice
+
+from eth_keys import keys
+
+from performance_tests import resources
+
+__all__ = [
+    'OrderGenerator',
+    'read_requests',
+    'write_requests',
+]
+
+DISTRIBUTION_NORMAL = 'normal'
+DISTRIBUTION_UNIFORM = 'uniform'
+
+# Starting prices for the instruments in ``resources``, keyed by symbol.
+DEFAULT_PRICES = {
+    'BTCDAI': 9300.0,
+    'DAIUSDC': 1.0,
+    'ETHDAI': 147.5,
+    'ETHSAI': 148.0,
+    'FEEETH': 0.000012,
+    'LEVDAI': 0.035,
+    'LEVETH': 0.00024,
+    'REPDAI': 10.5,
+}
+
+# Arbitrary start time (in microseconds, like order timestamps).
+DEFAULT_START_TIME = 1575332212506984
+
+
+class OrderGenerator:
+    """
+    Generates an endless, reproducible stream of spot and futures orders.
+
+    Each instrument's price follows a random walk, and orders are placed
+    around the current price (buy orders below it and sell orders above it),
+    so that prices vary the way they would in a real order book.
+    """
+
+    def __init__(
+            self,
+            seed: typing.Optional[int] = None,
+            spot_instruments: typing.Optional[dict] = None,
+            futures_instruments: typing.Optional[dict] = None,
+            prices: typing.Optional[typing.Dict[str, float]] = None,
+            futures_ratio: float = 0.5,
+            buy_ratio: float = 0.5,
+            market_ratio: float = 0.0,
+            signers: typing.Union[int, typing.Sequence[str]] = 10,
+            skew: float = 1.0,
+            distribution: str = DISTRIBUTION_NORMAL,
+            volatility: float = 0.0005,
+            spread: float = 0.01,
+            leverage: float = 2.0,
+            orders_per_second: float = 1000.0,
+    ) -> None:
+        """
+        :param seed: Seed for the random number generator.  The same seed
+        (and parameters) always produces the same orders.
+
+        :param spot_instruments: Spot instruments, keyed by symbol (default:
+        instruments from ``resources``).
+
+        :param futures_instruments: Futures instruments, keyed by ID
+        (default: futures instruments from ``resources``).
+
+        :param prices: Starting price for each instrument, keyed by symbol.
+
+        :param futures_ratio: Fraction of orders that are futures orders.
+
+        :param buy_ratio: Fraction of orders that are buy orders.
+
+        :param market_ratio: Fraction of orders that are market orders.
+
+        :param signers: Private keys to sign orders with, or the number of
+        private keys to generate.
+
+        :param skew: How much more often popular instruments are traded
+        (Zipf exponent; 0 = every instrument equally often).
+
+        :param distribution: Distribution of order prices around the current
+        price (``normal`` or ``uniform``).
+
+        :param volatility: Standard deviation of the change in an
+        instrument's price with each order (as a fraction of the price).
+
+        :param spread: Typical distance of order prices from the current
+        price (as a fraction of the price).
+
+        :param leverage: Leverage of futures orders (determines
+        ``marginPerFraction``).
+
+        :param orders_per_second: Average rate at which order timestamps
+        advance.
+        """
+        if distribution not in (DISTRIBUTION_NORMAL, DISTRIBUTION_UNIFORM):
+            raise ValueError(
+                'Unsupported distribution {distribution!r}.'.format(
+                    distribution=distribution,
+                ),
+            )
+
+        self.random = random.Random(seed)
+
+        self.spot_instruments = (
+            resources.instruments
+            if spot_instruments is None
+            else spot_instruments
+        )
+
+        self.futures_instruments = (
+            resources.futures_instruments
+            if futures_instruments is None
+            else futures_instruments
+        )
+
+        self.futures_ratio = futures_ratio if self.futures_instruments else 0
+        self.buy_ratio = buy_ratio
+        self.market_ratio = market_ratio
+        self.distribution = distribution
+        self.volatility = volatility
+        self.spread = spread
+        self.leverage = leverage
+        self.orders_per_second = orders_per_second
+
+        if isinstance(signers, int):
+            signers = [
+                '0x' + self.random.getrandbits(256).to_bytes(32, 'big').hex()
+                for _ in range(signers)
+            ]
+
+        # Each signer places orders for its own account.
+        self.signers = [
+            (signer, keys.PrivateKey(bytes.fromhex(signer[2:]))
+             .public_key.to_checksum_address())
+            for signer in signers
+        ]
+
+        self.prices = {
+            instrument['symbol']: DEFAULT_PRICES.get(instrument['symbol'], 1.0)
+            for instrument in self._all_instruments()
+        }
+        self.prices.update(prices or {})
+
+        # Cumulative Zipf weights, so that instruments can be picked with
+        # ``bisect``.
+        self._spot_weights = self._weights(len(self.spot_instruments), skew)
+        self._futures_weights = \
+            self._weights(len(self.futures_instruments), skew)
+
+        self._spot_keys = list(self.spot_instruments)
+        self._futures_keys = list(self.futures_instruments)
+
+        self._timestamp = DEFAULT_START_TIME
+
+    def __iter__(self) -> typing.Iterator[dict]:
+        while True:
+            yield self.next_request()
+
+    @property
+    def instruments(self) -> typing.List[dict]:
+        """
+        Returns every instrument that orders can refer to (e.g., to register
+        them with the daemon).
+        """
+        return list(self._all_instruments())
+
+    def next_request(self) -> dict:
+        """
+        Generates the next request payload.
+        """
+        if self.random.random() < self.futures_ratio:
+            return self._futures_request()
+
+        return self._spot_request()
+
+    def _spot_request(self) -> dict:
+        instrument = self.spot_instruments[
+            self._pick(self._spot_keys, self._spot_weights)
+        ]
+
+        order, signer = self._order(
+            instrument,
+            price_decimals=instrument.get('ticksize', 6),
+            quantity_decimals=instrument.get('baseSignificantDigits', 4),
+        )
+
+        return {
+            'type': 'spot',
+            'instrument': instrument,
+            'order': order,
+            'signer': signer,
+        }
+
+    def _futures_request(self) -> dict:
+        instrument_id = self._pick(self._futures_keys, self._futures_weights)
+        instrument = self.futures_instruments[instrument_id]
+
+        order, signer = self._order(
+            instrument,
+            price_decimals=instrument.get('ticksize', 2),
+            quantity_decimals=3,
+        )
+
+        order['instrument'] = instrument_id
+        order['quote'] = instrument['quote']['address']
+        order['marginPerFraction'] = str(int(
+            order['price']
+            * 10 ** instrument['quote']['decimals']
+            / self.leverage
+        ))
+
+        return {
+            'type': 'futures',
+            'instrument': instrument,
+            'order': order,
+            'signer': signer,
+        }
+
+    def _order(
+            self,
+            instrument: dict,
+            price_decimals: int,
+            quantity_decimals: int,
+    ) -> typing.Tuple[dict, str]:
+        """
+        Generates the fields that spot and futures orders have in common.
+
+        :return: The order, and the private key to sign it with.
+        """
+        rand = self.random
+        symbol = instrument['symbol']
+
+        # Move the instrument's price a little with each order.
+        price = self.prices[symbol] * math.exp(rand.gauss(0, self.volatility))
+        self.prices[symbol] = price
+
+        if self.distribution == DISTRIBUTION_NORMAL:
+            offset = abs(rand.gauss(0, self.spread))
+        else:
+            offset = rand.uniform(0, 2 * self.spread)
+
+        side = 'buy' if rand.random() < self.buy_ratio else 'sell'
+        price *= (1 - offset) if side == 'buy' else (1 + offset)
+
+        # Most orders are small, but a few are much larger.
+        quantity = rand.lognormvariate(0, 1.5)
+
+        self._timestamp += max(
+            int(rand.expovariate(self.orders_per_second) * 1000000),
+            1,
+        )
+
+        signer, account_id = rand.choice(self.signers)
+
+        order = {
+            'orderType': 'MKT' if rand.random() < self.market_ratio else 'LMT',
+            'side': side,
+            'price': max(round(price, price_decimals), 10 ** -price_decimals),
+            'quantity': max(
+                round(quantity, quantity_decimals),
+                10 ** -quantity_decimals,
+            ),
+            'timestamp': self._timestamp,
+            'accountId': account_id,
+            'instrument': symbol,
+        }
+
+        return order, signer
+
+    def _pick(
+            self,
+            keys_: typing.List[str],
+            weights: typing.List[float],
+    ) -> str:
+        return keys_[bisect(weights, self.random.random() * weights[-1])]
+
+    def _all_instruments(self) -> typing.Iterator[dict]:
+        yield from self.spot_instruments.values()
+        yield from self.futures_instruments.values()
+
+    @staticmethod
+    def _weights(count: int, skew: float) -> typing.List[float]:
+        return list(accumulate(
+            1 / (rank ** skew)
+            for rank in range(1, count + 1)
+        ))
+
+
+def write_requests(path: str, requests: typing.Iterable[dict]) -> int:
+    """
+    Writes request payloads to a file, one JSON object per line (gzipped if
+    the filename ends with ``.gz``).
+
+    :return: Number of requests written.
+    """
+    count = 0
+
+    with _open(path, 'wt') as f:
+        for request in requests:
+            f.write(json.dumps(request))
+            f.write('\n')
+            count += 1
+
+    return count
+
+
+def read_requests(path: str) -> typing.Iterator[dict]:
+    """
+    Lazily reads request payloads that were written by
+    :py:func:`write_requests`.
+    """
+    with _open(path, 'rt') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _open(path: str, mode: str) -> typing.TextIO:
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf-8')
+
+    return open(path, mode, encoding='utf-8')
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> None:
+    parser = ArgumentParser(
+        description='Generates synthetic orders for load tests.',
+    )
+
+    parser.add_argument(
+        '-n', '--count',
+        default=1000000,
+        type=int,
+        help='Number of orders to generate.',
+    )
+
+    parser.add_argument(
+        '-o', '--output',
+        help='File to write orders to (gzipped if the filename ends with '
+             '".gz"; default: stdout).',
+    )
+
+    parser.add_argument('--seed', type=int, help='Random seed.')
+
+    parser.add_argument(
+        '--futures-ratio',
+        default=0.5,
+        type=float,
+        help='Fraction of orders that are futures orders.',
+    )
+
+    parser.add_argument(
+        '--buy-ratio',
+        default=0.5,
+        type=float,
+        help='Fraction of orders that are buy orders.',
+    )
+
+    parser.add_argument(
+        '--market-ratio',
+        default=0.0,
+        type=float,
+        help='Fraction of orders that are market orders.',
+    )
+
+    parser.add_argument(
+        '--signers',
+        default=10,
+        type=int,
+        help='Number of private keys to sign orders with.',
+    )
+
+    parser.add_argument(
+        '--skew',
+        default=1.0,
+        type=float,
+        help='How much more often popular instruments are traded (0 = every '
+             'instrument equally often).',
+    )
+
+    parser.add_argument(
+        '--distribution',
+        choices=(DISTRIBUTION_NORMAL, DISTRIBUTION_UNIFORM),
+        default=DISTRIBUTION_NORMAL,
+        help='Distribution of order prices around the current price.',
+    )
+
+    parser.add_argument(
+        '--volatility',
+        default=0.0005,
+        type=float,
+        help='Standard deviation of price changes with each order.',
+    )
+
+    parser.add_argument(
+        '--spread',
+        default=0.01,
+        type=float,
+        help='Typical distance of order prices from the current price.',
+    )
+
+    args = parser.parse_args(argv)
+
+    generator = OrderGenerator(
+        seed=args.seed,
+        futures_ratio=args.futures_ratio,
+        buy_ratio=args.buy_ratio,
+        market_ratio=args.market_ratio,
+        signers=args.signers,
+        skew=args.skew,
+        distribution=args.distribution,
+        volatility=args.volatility,
+        spread=args.spread,
+    )
+
+    requests = islice(generator, args.count)
+
+    if args.output:
+        write_requests(args.output, requests)
+    else:
+        for request in requests:
+            print(json.dumps(request), file=sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""
+Open-loop load generator for the daemon.
+
+Unlike ``bench.py`` (which waits for responses before sending more
+requests), this sends requests at a fixed rate regardless of how quickly the
+daemon responds, the way independent users would.  Latency is measured from
+the time that each request was *supposed* to be sent, so that if the daemon
+(or the load generator) falls behind, the queueing delay shows up in the
+results, instead of being hidden by sending fewer requests (coordinated
+omission).
+
+Sweep through several rates to find the point at which the daemon
+saturates, e.g.::
+
+    python -m performance_tests.loadgen --rates 100 200 400 800 1600
+
+.. note::
+    The daemon must already be running.
+"""
+import asyncio
+import json
+import random
+import sys
+import typing
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+
+from leverj_ordersigner_client.aio import AsyncioOrderSignerClient, \
+    create_client
+
+from performance_tests.bench import ORDERS_FIXTURES, ORDERS_GENERATED, \
+    TYPE_FUTURES, TYPE_SPOT, is_correct, order_stream
+from performance_tests.stats import summarise_latencies
+
+__all__ = [
+    'main',
+    'run_rate',
+]
+
+ARRIVAL_CONSTANT = 'constant'
+ARRIVAL_POISSON = 'poisson'
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> None:
+    parser = ArgumentParser(
+        description='Sends requests to the daemon at fixed rates, to find '
+                    'its saturation point.',
+    )
+
+    parser.add_argument(
+        '--rates',
+        default=[100.0],
+        nargs='+',
+        type=float,
+        help='Request rate(s) to test, in requests per second.',
+    )
+
+    parser.add_argument(
+        '-d', '--duration',
+        default=10.0,
+        type=float,
+        help='Number of seconds to send requests at each rate.',
+    )
+
+    parser.add_argument(
+        '--warmup',
+        default=1.0,
+        type=float,
+        help='Number of seconds at the start of each rate to exclude from '
+             'the results.',
+    )
+
+    parser.add_argument(
+        '--arrival',
+        choices=(ARRIVAL_CONSTANT, ARRIVAL_POISSON),
+        default=ARRIVAL_CONSTANT,
+        help='Send requests at constant intervals, or as a Poisson process '
+             '(random intervals, like independent users).',
+    )
+
+    parser.add_argument(
+        '-i', '--interface',
+        default='unix:/tmp/leverj-ordersigner-daemon.sock',
+        help='Interface that the daemon is listening on.',
+    )
+
+    parser.add_argument(
+        '-c', '--connections',
+        default=1,
+        type=int,
+        help='Number of connections to spread requests across.',
+    )
+
+    parser.add_argument(
+        '--type',
+        choices=(TYPE_SPOT, TYPE_FUTURES),
+        default=TYPE_SPOT,
+        help='Type of orders to sign.',
+    )
+
+    parser.add_argument(
+        '--orders',
+        choices=(ORDERS_FIXTURES, ORDERS_GENERATED),
+        default=ORDERS_FIXTURES,
+        help='Where to get orders from (see bench.py).',
+    )
+
+    parser.add_argument(
+        '--seed',
+        default=0,
+        type=int,
+        help='Random seed for generated orders and Poisson arrivals.',
+    )
+
+    parser.add_argument(
+        '--slo',
+        type=float,
+        help='Max acceptable p99 latency (in milliseconds); rates that '
+             'exceed it count as saturated.',
+    )
+
+    parser.add_argument(
+        '--tolerance',
+        default=0.05,
+        type=float,
+        help='Rates where the daemon completes fewer than (1 - tolerance) of '
+             'the requests per second that were sent count as saturated.',
+    )
+
+    parser.add_argument(
+        '--drain-timeout',
+        default=30.0,
+        type=float,
+        help='Max number of seconds to wait for responses after sending '
+             'stops at each rate.',
+    )
+
+    parser.add_argument(
+        '--keep-going',
+        action='store_true',
+        help='Test every rate, instead of stopping at the first saturated '
+             'rate.',
+    )
+
+    parser.add_argument(
+        '-o', '--output',
+        help='File to write results to (default: stdout).',
+    )
+
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(sweep(args))
+
+    unsaturated = [r['target_rate'] for r in results if not r['saturated']]
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'argv': sys.argv[1:] if argv is None else argv,
+        },
+
+        # Highest rate that the daemon sustained.
+        'saturation_rate': max(unsaturated) if unsaturated else None,
+
+        'results': results,
+    }
+
+    encoded = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(encoded)
+    else:
+        print(encoded)
+
+
+async def sweep(args) -> typing.List[dict]:
+    """
+    Tests each rate in turn.
+    """
+    payloads, _ = order_stream(args.type, args.orders, args.seed)
+    rng = random.Random(args.seed)
+
+    clients = [
+        await create_client(args.interface)
+        for _ in range(args.connections)
+    ]
+
+    results = []
+
+    try:
+        for rate in sorted(args.rates):
+            print('Sending {rate} requests/s'.format(rate=rate),
+                  file=sys.stderr)
+
+            result = await run_rate(
+                clients,
+                payloads,
+                rate,
+                duration=args.duration,
+                warmup=args.warmup,
+                poisson=args.arrival == ARRIVAL_POISSON,
+                rng=rng,
+                drain_timeout=args.drain_timeout,
+            )
+
+            p99 = result['latency_ms']['p99']
+
+            result['saturated'] = bool(
+                result['timeouts']
+                or result['achieved_rate']
+                < result['offered_rate'] * (1 - args.tolerance)
+                or (args.slo is not None and p99 is not None
+                    and p99 > args.slo)
+            )
+
+            results.append(result)
+
+            if result['saturated'] and not args.keep_going:
+                break
+    finally:
+        for client in clients:
+            await client.close()
+
+    return results
+
+
+async def run_rate(
+        clients: typing.List[AsyncioOrderSignerClient],
+        payloads: typing.Iterator[dict],
+        rate: float,
+        duration: float,
+        warmup: float = 0.0,
+        poisson: bool = False,
+        rng: typing.Optional[random.Random] = None,
+        drain_timeout: float = 30.0,
+) -> dict:
+    """
+    Sends requests at a fixed rate for ``duration`` seconds, then waits for
+    the responses.
+
+    :return: Throughput and latency.  ``latency_ms`` is measured from when
+    each request should have been sent (corrected for coordinated omission);
+    ``uncorrected_latency_ms`` from when it actually was sent.
+    """
+    loop = asyncio.get_event_loop()
+    rng = rng or random.Random()
+
+    latencies = []
+    uncorrected = []
+    futures = []
+    errors = 0
+    sent = 0
+
+    start = loop.time()
+    end = start + duration
+    measure_from = start + warmup
+    intended = start
+
+    def response_received(
+            future: asyncio.Future,
+            payload: dict,
+            intended_: float,
+            sent_at: float,
+    ) -> None:
+        nonlocal errors
+        now = loop.time()
+
+        if future.cancelled() or future.exception() is not None \
+                or not is_correct(future.result(), payload):
+            errors += 1
+
+        if intended_ >= measure_from:
+            latencies.append(now - intended_)
+            uncorrected.append(now - sent_at)
+
+    while True:
+        now = loop.time()
+
+        # Send every request that is due.  If the loop has fallen behind,
+        # this sends a burst of requests (each with its original intended
+        # send time), rather than quietly sending fewer.
+        while intended <= now and intended < end:
+            payload = next(payloads)
+
+            # Send via the connection with the fewest outstanding requests.
+            client = min(clients, key=lambda c: c.outstanding)
+
+            sign = (
+                client.sign_futures
+                if payload['type'] == TYPE_FUTURES
+                else client.sign_spot
+            )
+
+            future = sign(
+                payload['order'],
+                payload['instrument'],
+                payload['signer'],
+            )
+
+            future.add_done_callback(
+                lambda f, p=payload, i=intended, s=now:
+                response_received(f, p, i, s),
+            )
+
+            futures.append(future)
+            sent += 1
+
+            intended += (
+                rng.expovariate(rate)
+                if poisson
+                else 1 / rate
+            )
+
+        if intended >= end:
+            break
+
+        await asyncio.sleep(intended - loop.time())
+
+    done, pending = await asyncio.wait(futures, timeout=drain_timeout) \
+        if futures else (set(), set())
+
+    finished = loop.time()
+
+    for future in pending:
+        future.cancel()
+
+    completed = len(done)
+
+    return {
+        'target_rate': rate,
+        'duration': duration,
+        'sent': sent,
+        'completed': completed,
+        'errors': errors,
+        'timeouts': len(pending),
+        # With Poisson arrivals, this differs slightly from the target rate.
+        'offered_rate': sent / duration,
+        'achieved_rate': completed / (finished - start),
+        'latency_ms': summarise_latencies(latencies),
+        'uncorrected_latency_ms': summarise_latencies(uncorrected),
+    }
+
+
+if __name__ == '__main__':
+    main()
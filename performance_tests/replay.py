@@ -0,0 +1,373 @@
+"""
+Replays traffic that was captured by the daemon (``--capture``) against a
+running daemon, at the original pacing (or faster), and reports latency and
+throughput as JSON, e.g.::
+
+    python -m performance_tests.replay capture.log.1 capture.log --speed 2
+
+Pass rotated capture files oldest first.
+
+Signers in captured requests are redacted, so each distinct redacted signer
+is replaced with a stand-in private key (or with ``--signer``, if
+specified).  The daemon must accept those keys, so signatures will differ
+from the original traffic.
+
+Latency is measured from the time that each request *should* have been sent
+(according to the capture), so the results include any delays caused by the
+replay falling behind.  With ``--speed 0``, requests are sent as fast as the
+daemon answers them (up to ``--max-outstanding`` at a time), and latency is
+measured from the time that each request was actually sent.
+"""
+import json
+import typing
+from argparse import ArgumentParser
+from hashlib import blake2b
+
+from leverj_ordersigner_client.pool import OrderSignerClientPool, \
+    async_create_client_pool
+from twisted.internet import base, defer, task
+from twisted.python import failure
+
+from performance_tests.stats import summarise_latencies
+
+__all__ = [
+    'Replayer',
+    'main',
+    'read_capture',
+]
+
+# Must match ``ordersigner_daemon.capture.REDACTED_PREFIX``.
+REDACTED_PREFIX = 'redacted:'
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> None:
+    parser = ArgumentParser(
+        description='Replays captured traffic against the daemon.',
+    )
+
+    parser.add_argument(
+        'files',
+        nargs='+',
+        help='Capture files to replay (oldest first).',
+    )
+
+    parser.add_argument(
+        '-i', '--interface',
+        default=['unix:/tmp/leverj-ordersigner-daemon.sock'],
+        nargs='+',
+        help='Interface(s) that the daemon is listening on.',
+    )
+
+    parser.add_argument(
+        '-c', '--connections',
+        default=1,
+        type=int,
+        help='Number of connections to open to each interface.',
+    )
+
+    parser.add_argument(
+        '--speed',
+        default=1.0,
+        type=float,
+        help='Replay N times faster than the original traffic (0 = as fast '
+             'as possible).',
+    )
+
+    parser.add_argument(
+        '--max-outstanding',
+        default=1000,
+        type=int,
+        help='With --speed 0, max number of requests to wait for responses '
+             'to at once (0 = no limit).',
+    )
+
+    parser.add_argument(
+        '--signer',
+        help='Private key to sign every order with (default: a stand-in key '
+             'for each redacted signer).',
+    )
+
+    parser.add_argument(
+        '-o', '--output',
+        help='File to write results to (default: stdout).',
+    )
+
+    args = parser.parse_args(argv)
+
+    task.react(_replay, (args,))
+
+
+@defer.inlineCallbacks
+def _replay(reactor: base.ReactorBase, args) -> typing.Generator:
+    pool = yield async_create_client_pool(
+        reactor,
+        args.interface,
+        args.connections,
+    )
+
+    replayer = Replayer(
+        reactor,
+        pool,
+        read_capture(args.files),
+        speed=args.speed,
+        max_outstanding=args.max_outstanding,
+        signer=args.signer,
+    )
+
+    try:
+        yield replayer.run()
+    finally:
+        pool.close()
+
+    report = replayer.report()
+    report['meta'] = {
+        'files': args.files,
+        'interfaces': args.interface,
+        'connections': args.connections,
+        'speed': args.speed,
+        'max_outstanding': args.max_outstanding,
+    }
+
+    encoded = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(encoded)
+    else:
+        print(encoded)
+
+
+def read_capture(
+        paths: typing.Iterable[str],
+) -> typing.Iterator[typing.Tuple[float, bytes]]:
+    """
+    Lazily reads captured requests.
+
+    :return: ``(timestamp, request)`` tuples.
+    """
+    for path in paths:
+        with open(path, 'rb') as f:
+            for line in f:
+                timestamp, _, request = line.rstrip(b'\r\n').partition(b'\t')
+                yield float(timestamp), request
+
+
+class Replayer:
+    """
+    Sends captured requests to the daemon at the times they were originally
+    received (scaled by ``speed``).
+    """
+    # Max number of requests to send before giving the reactor a chance to
+    # run (e.g., to write requests and read responses), when requests are
+    # due faster than they can be sent.
+    max_burst = 100
+
+    def __init__(
+            self,
+            reactor: base.ReactorBase,
+            pool: OrderSignerClientPool,
+            records: typing.Iterable[typing.Tuple[float, bytes]],
+            speed: float = 1.0,
+            max_outstanding: int = 1000,
+            signer: typing.Optional[str] = None,
+    ) -> None:
+        """
+        :param max_outstanding: If ``speed`` is 0, max number of requests to
+        wait for responses to at once (0 = no limit).  Otherwise, requests
+        are always sent when they are due.
+        """
+        self.reactor = reactor
+        self.pool = pool
+        self.records = iter(records)
+        self.speed = speed
+        self.max_outstanding = max_outstanding
+        self.signer = signer
+
+        self.latencies: typing.List[float] = []
+        self.errors = 0
+        self.skipped = 0
+        self.max_lag = 0.0
+
+        self._first_timestamp: typing.Optional[float] = None
+        self._last_timestamp: typing.Optional[float] = None
+        self._started: typing.Optional[float] = None
+        self._finished: typing.Optional[float] = None
+        self._outstanding = 0
+        self._sending = True
+
+        # The next record to send, once it's due (and there's room for it).
+        self._next: typing.Optional[typing.Tuple[float, bytes]] = None
+        self._waiting_for_room = False
+        self._done = defer.Deferred()
+
+    def run(self) -> defer.Deferred:
+        """
+        Replays every request.
+
+        :return: A deferred that fires once every response has been received.
+        """
+        self._started = self.reactor.seconds()
+        self._send_due()
+        return self._done
+
+    def report(self) -> dict:
+        """
+        Returns the results of the replay.
+        """
+        elapsed = (self._finished or self.reactor.seconds()) - self._started
+        requests = len(self.latencies)
+
+        return {
+            'requests': requests,
+            'errors': self.errors,
+            'skipped': self.skipped,
+            'elapsed': elapsed,
+            'captured_duration': (
+                self._last_timestamp - self._first_timestamp
+                if self._first_timestamp is not None
+                else 0.0
+            ),
+            'requests_per_second': requests / elapsed if elapsed else None,
+            'max_send_lag_ms': self.max_lag * 1000,
+            'latency_ms': summarise_latencies(self.latencies),
+        }
+
+    def _send_due(self) -> None:
+        """
+        Sends every request that is due (up to ``max_burst`` at a time), then
+        schedules the next one.
+        """
+        sent = 0
+
+        while True:
+            if self._next is None:
+                self._next = next(self.records, None)
+
+                if self._next is None:
+                    break
+
+            if self._is_full():
+                # :py:meth:`_response_received` will carry on.
+                self._waiting_for_room = True
+                return
+
+            if sent >= self.max_burst:
+                self.reactor.callLater(0, self._send_due)
+                return
+
+            timestamp, request = self._next
+            due = self._due(timestamp)
+            now = self.reactor.seconds()
+
+            if due > now:
+                self.reactor.callLater(due - now, self._send_due)
+                return
+
+            self._next = None
+            self.max_lag = max(self.max_lag, now - due)
+            self._send(due, request)
+            sent += 1
+
+        self._sending = False
+        self._check_done()
+
+    def _is_full(self) -> bool:
+        return bool(
+            not self.speed
+            and self.max_outstanding
+            and self._outstanding >= self.max_outstanding
+        )
+
+    def _due(self, timestamp: float) -> float:
+        """
+        Returns the time that a captured request should be sent.
+        """
+        if self._first_timestamp is None:
+            self._first_timestamp = timestamp
+
+        self._last_timestamp = timestamp
+
+        if not self.speed:
+            # Send straight away.
+            return self.reactor.seconds()
+
+        offset = timestamp - self._first_timestamp
+        return self._started + offset / self.speed
+
+    def _send(self, due: float, request: bytes) -> None:
+        try:
+            payload = json.loads(request)
+            d = self._dispatch(payload)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            # E.g., requests that failed validation when they were captured.
+            self.skipped += 1
+            return
+
+        self._outstanding += 1
+        d.addErrback(self._failed)
+        d.addBoth(self._response_received, due)
+
+    def _dispatch(self, payload: dict) -> defer.Deferred:
+        """
+        Sends a request via the client method for its type.
+        """
+        type_ = payload['type']
+
+        if type_ == 'instrument':
+            return self.pool.register_instrument(payload['instrument'])
+
+        if type_ == 'batch':
+            return self.pool.sign_many([
+                dict(order, signer=self._signer(order['signer']))
+                for order in payload['orders']
+            ])
+
+        sign = {
+            'futures': self.pool.sign_futures,
+            'spot': self.pool.sign_spot,
+        }[type_]
+
+        return sign(
+            payload['order'],
+            payload['instrument'],
+            self._signer(payload['signer']),
+        )
+
+    def _signer(self, signer: str) -> str:
+        """
+        Replaces a redacted signer.
+        """
+        if not signer.startswith(REDACTED_PREFIX):
+            return signer
+
+        if self.signer:
+            return self.signer
+
+        # A stand-in private key, which is always the same for the same
+        # redacted signer.
+        return '0x' + blake2b(
+            signer.encode('utf-8'),
+            digest_size=32,
+        ).hexdigest()
+
+    def _failed(self, failure_: failure.Failure) -> None:
+        self.errors += 1
+
+    def _response_received(self, _: typing.Any, due: float) -> None:
+        self.latencies.append(self.reactor.seconds() - due)
+        self._outstanding -= 1
+
+        if self._waiting_for_room and not self._is_full():
+            self._waiting_for_room = False
+            self._send_due()
+
+        self._check_done()
+
+    def _check_done(self) -> None:
+        if not (self._sending or self._outstanding or self._done.called):
+            self._finished = self.reactor.seconds()
+            self._done.callback(None)
+
+
+if __name__ == '__main__':
+    main()
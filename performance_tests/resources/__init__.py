@@ -1,7 +1,8 @@
 """
 Order data used for performance tests.
 
-https://github.com/leverj/leverj-ordersigner/blob/master/tests/spot_multi_order_tests.py
+Spot orders: https://github.com/leverj/leverj-ordersigner/blob/master/tests/spot_multi_order_tests.py
+Futures orders: signatures generated with ``leverj_ordersigner.futures``.
 """
 from itertools import cycle, islice
 
@@ -2063,3 +2064,46 @@ base_orders = [
 
 # Stretch ``base_orders`` to a standard size.
 orders = list(islice(cycle(base_orders), 1000))
+
+# Futures orders refer to instruments by ID rather than symbol.
+futures_instruments = {
+    "1": {
+        "symbol": "BTCDAI", "name": "BTC/DAI", "status": "active",
+        "quote": {"name": "DAI",
+            "address": "0x1D7e3a1A65a367db1D1D3F51A54aC01a2c4C92ff",
+            "symbol": "DAI",
+            "decimals": 18}
+    }
+}
+
+futures_base_orders = [
+    {"orderType": "LMT", "side": "sell", "price": 9321.5, "quantity": 0.125,
+        "marginPerFraction": "4660750000000000000",
+        "timestamp": 12382173200872,
+        "accountId": "0x167cdb1aC9979A6a694B368ED3D2bF9259Fa8282",
+        "quote": "0x1D7e3a1A65a367db1D1D3F51A54aC01a2c4C92ff",
+        "instrument": "1",
+        "signature": "0x9a2709b16cdab0b8cb89de6c7f10638caa2dba8e1dd1f6a1a74ba17528f074dd09eb2d47621691667b792d7c5ec89b2b1b56ae20528e5e14d65b0dc981d190421c"},
+    {"orderType": "LMT", "side": "buy", "price": 9318.0, "quantity": 0.25,
+        "marginPerFraction": "4659000000000000000",
+        "timestamp": 12382173201904,
+        "accountId": "0x167cdb1aC9979A6a694B368ED3D2bF9259Fa8282",
+        "quote": "0x1D7e3a1A65a367db1D1D3F51A54aC01a2c4C92ff",
+        "instrument": "1",
+        "signature": "0x5e172e851df7ca2a1daba2ee1d10ea5e02e5fc5cef4e6909a68479e1bff7ac2d6bda6c196b25c5d49697f3749e3bad350b08013aa3aa186bc4078c71abe38a721b"},
+    {"orderType": "LMT", "side": "buy", "price": 9300.25, "quantity": 1.5,
+        "marginPerFraction": "4650125000000000000",
+        "timestamp": 12382173203311,
+        "accountId": "0x167cdb1aC9979A6a694B368ED3D2bF9259Fa8282",
+        "quote": "0x1D7e3a1A65a367db1D1D3F51A54aC01a2c4C92ff",
+        "instrument": "1",
+        "signature": "0x2c8a2daf3c0bb61d0ef342d470c71fe081287102567b72ea1e1d62a69f835a425dfff5e8cb2c8331e361b2f07cf6652cd3a0ecac7fba843d811fb4190a9eced01b"},
+    {"orderType": "LMT", "side": "sell", "price": 9335.75, "quantity": 0.5,
+        "marginPerFraction": "4667875000000000000",
+        "timestamp": 12382173204520,
+        "accountId": "0x167cdb1aC9979A6a694B368ED3D2bF9259Fa8282",
+        "quote": "0x1D7e3a1A65a367db1D1D3F51A54aC01a2c4C92ff",
+        "instrument": "1",
+        "signature": "0xe457f33a2d7c1ec940276c0d07bf77d017cfa4fcc4a79a0a0e760d26078f3bda355ec2c818785b0ebade433fae77008a07e997a784d885a599e831551c4eaaa01c"}]
+
+futures_orders = list(islice(cycle(futures_base_orders), 1000))
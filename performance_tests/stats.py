@@ -0,0 +1,58 @@
+"""
+Helpers for summarising benchmark results.
+"""
+import math
+import typing
+
+__all__ = [
+    'PERCENTILES',
+    'percentile',
+    'summarise_latencies',
+]
+
+# Percentiles to report, and the names to report them under.
+PERCENTILES = (
+    ('p50', 50.0),
+    ('p99', 99.0),
+    ('p999', 99.9),
+)
+
+
+def percentile(
+        ordered: typing.Sequence[float],
+        q: float,
+) -> typing.Optional[float]:
+    """
+    Returns the ``q``th percentile of a sorted sequence (nearest-rank
+    method), or ``None`` if the sequence is empty.
+    """
+    if not ordered:
+        return None
+
+    rank = max(math.ceil(len(ordered) * q / 100), 1)
+    return ordered[rank - 1]
+
+
+def summarise_latencies(latencies: typing.Iterable[float]) -> dict:
+    """
+    Summarises latencies (in seconds) as milliseconds.
+
+    Values are ``None`` if there are no latencies (so that the summary can
+    be serialised as strict JSON).
+    """
+    ordered = sorted(latencies)
+
+    if not ordered:
+        return dict.fromkeys(
+            [name for name, _ in PERCENTILES] + ['max', 'mean'],
+        )
+
+    summary = {
+        name: percentile(ordered, q) * 1000
+        for name, q in PERCENTILES
+    }
+
+    summary['max'] = ordered[-1] * 1000
+    summary['mean'] = sum(ordered) / len(ordered) * 1000
+
+    return summary
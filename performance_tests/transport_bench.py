@@ -0,0 +1,294 @@
+"""
+Compares the cost of sending requests to the daemon through a unix socket
+and through shared memory (``shm:``), and reports the results as JSON, e.g.::
+
+    twistd -n leverj-ordersigner \
+        --interface unix:/tmp/leverj-ordersigner-daemon.sock \
+        --shm-interface unix:/tmp/leverj-ordersigner-daemon-shm.sock \
+        --result-cache-size 1000
+
+    python -m performance_tests.transport_bench \
+        --interface \
+            unix:/tmp/leverj-ordersigner-daemon.sock \
+            shm:/tmp/leverj-ordersigner-daemon-shm.sock \
+        --depth 1 32 \
+        --daemon-pid "$(pgrep -f 'twistd -n leverj-ordersigner')"
+
+The benchmark cycles through the same few orders, so with the daemon's
+result cache enabled, signing is nearly free and the results show the cost
+of the transport itself.
+
+Besides throughput and latency, each scenario reports, per request:
+
+- The number of socket system calls (``recv``/``send``) that the client
+  made.
+- The number of times that the client (and the daemon, if ``--daemon-pid``
+  is given) went to sleep waiting for something to happen (voluntary
+  context switches, from ``/proc/<pid>/status``; Linux only).
+"""
+import json
+import typing
+from argparse import ArgumentParser
+from itertools import product
+from time import perf_counter
+
+from leverj_ordersigner_client import OrderSignerClient
+from leverj_ordersigner_client.client import async_create_client
+from twisted.internet import base, defer, task
+from twisted.protocols import policies
+
+from performance_tests.bench import ORDERS_FIXTURES, TYPE_SPOT, is_correct, \
+    order_stream
+from performance_tests.stats import summarise_latencies
+
+__all__ = [
+    'CountingSocket',
+    'main',
+    'read_wakeups',
+    'run_scenario',
+]
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> None:
+    parser = ArgumentParser(
+        description='Compares the unix socket and shared-memory transports.',
+    )
+
+    parser.add_argument(
+        '-i', '--interface',
+        default=[
+            'unix:/tmp/leverj-ordersigner-daemon.sock',
+            'shm:/tmp/leverj-ordersigner-daemon-shm.sock',
+        ],
+        nargs='+',
+        help='Interfaces to benchmark (unix: and/or shm:).',
+    )
+
+    parser.add_argument(
+        '-d', '--depth',
+        default=[1, 32],
+        nargs='+',
+        type=int,
+        help='Number of requests to keep in flight (pipelining depth).',
+    )
+
+    parser.add_argument(
+        '-n', '--requests',
+        default=10000,
+        type=int,
+        help='Number of requests to measure in each scenario.',
+    )
+
+    parser.add_argument(
+        '--warmup',
+        default=1000,
+        type=int,
+        help='Number of requests to send before measuring.',
+    )
+
+    parser.add_argument(
+        '--daemon-pid',
+        type=int,
+        help='PID of the daemon, to count its wakeups as well.',
+    )
+
+    parser.add_argument(
+        '-o', '--output',
+        help='File to write results to (default: stdout).',
+    )
+
+    args = parser.parse_args(argv)
+
+    task.react(_run, (args,))
+
+
+@defer.inlineCallbacks
+def _run(reactor: base.ReactorBase, args) -> typing.Generator:
+    results = []
+
+    for interface, depth in product(args.interface, args.depth):
+        client = yield async_create_client(reactor, interface)
+
+        try:
+            result = yield run_scenario(
+                client,
+                depth,
+                args.requests,
+                args.warmup,
+                args.daemon_pid,
+            )
+        finally:
+            client.transport.loseConnection()
+
+        result['interface'] = interface
+        results.append(result)
+
+    encoded = json.dumps(results, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(encoded)
+    else:
+        print(encoded)
+
+
+@defer.inlineCallbacks
+def run_scenario(
+        client: OrderSignerClient,
+        depth: int,
+        requests: int,
+        warmup: int,
+        daemon_pid: typing.Optional[int] = None,
+) -> typing.Generator:
+    """
+    Sends requests through a connected client, and returns the results.
+    """
+    payloads, _ = order_stream(TYPE_SPOT, ORDERS_FIXTURES, 0)
+
+    if warmup:
+        yield _send(client, payloads, warmup, depth)
+
+    # With the shared-memory transport, the client is wrapped, and the
+    # socket belongs to the wrapper's transport.
+    transport = client.transport
+    while isinstance(transport, policies.ProtocolWrapper):
+        transport = transport.transport
+
+    socket_ = transport.socket = CountingSocket(transport.socket)
+
+    client_before = read_wakeups()
+    daemon_before = read_wakeups(daemon_pid) if daemon_pid else None
+
+    started = perf_counter()
+    latencies, errors = yield _send(client, payloads, requests, depth)
+    elapsed = perf_counter() - started
+
+    client_after = read_wakeups()
+    daemon_after = read_wakeups(daemon_pid) if daemon_pid else None
+
+    return {
+        'depth': depth,
+        'requests': requests,
+        'errors': errors,
+        'elapsed': elapsed,
+        'requests_per_second': requests / elapsed,
+        'latency_ms': summarise_latencies(latencies),
+
+        'client_socket_calls_per_request': {
+            'read': socket_.reads / requests,
+            'write': socket_.writes / requests,
+        },
+
+        'wakeups_per_request': {
+            'client': _per_request(client_before, client_after, requests),
+            'daemon': _per_request(daemon_before, daemon_after, requests),
+        },
+    }
+
+
+class CountingSocket:
+    """
+    Wraps a socket, and counts the calls that read from and write to it
+    (each of which is a system call).
+    """
+
+    def __init__(self, socket_) -> None:
+        self.socket = socket_
+        self.reads = 0
+        self.writes = 0
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self.socket, name)
+
+    def recv(self, *args) -> bytes:
+        self.reads += 1
+        return self.socket.recv(*args)
+
+    def recvmsg(self, *args) -> tuple:
+        self.reads += 1
+        return self.socket.recvmsg(*args)
+
+    def send(self, *args) -> int:
+        self.writes += 1
+        return self.socket.send(*args)
+
+    def sendmsg(self, *args) -> int:
+        self.writes += 1
+        return self.socket.sendmsg(*args)
+
+
+def read_wakeups(pid: typing.Union[int, str] = 'self') -> typing.Optional[int]:
+    """
+    Returns the number of times that a process has gone to sleep waiting for
+    something to happen (e.g., for data to arrive on a socket), or ``None``
+    if this isn't available (e.g., not on Linux).
+    """
+    try:
+        with open('/proc/{pid}/status'.format(pid=pid)) as f:
+            for line in f:
+                key, _, value = line.partition(':')
+
+                if key == 'voluntary_ctxt_switches':
+                    return int(value)
+    except (OSError, ValueError):
+        pass
+
+    return None
+
+
+def _per_request(
+        before: typing.Optional[int],
+        after: typing.Optional[int],
+        requests: int,
+) -> typing.Optional[float]:
+    if before is None or after is None:
+        return None
+
+    return (after - before) / requests
+
+
+def _send(
+        client: OrderSignerClient,
+        payloads: typing.Iterator[dict],
+        requests: int,
+        depth: int,
+) -> defer.Deferred:
+    """
+    Sends requests, keeping ``depth`` of them in flight at a time.
+
+    :return: A deferred that fires with the latency of each request, and
+    the number of errors.
+    """
+    # Every loop takes the next request from the same iterator.
+    pending = iter(range(requests))
+    latencies = []
+    errors = 0
+
+    @defer.inlineCallbacks
+    def loop() -> typing.Generator:
+        nonlocal errors
+
+        for _ in pending:
+            payload = next(payloads)
+            request_started = perf_counter()
+
+            try:
+                signature = yield client.sign_spot(
+                    payload['order'],
+                    payload['instrument'],
+                    payload['signer'],
+                )
+            except Exception:
+                errors += 1
+            else:
+                errors += not is_correct(signature, payload)
+
+            latencies.append(perf_counter() - request_started)
+
+    d = defer.gatherResults([loop() for _ in range(depth)])
+    d.addCallback(lambda _: (latencies, errors))
+    return d
+
+
+if __name__ == '__main__':
+    main()